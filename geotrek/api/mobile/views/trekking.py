@@ -1,6 +1,6 @@
 from django.conf import settings
 from django.contrib.gis.db.models.functions import Transform
-from django.db.models import Count, F, Q
+from django.db.models import Exists, F, OuterRef, Q
 from django_filters.rest_framework.backends import DjangoFilterBackend
 from rest_framework import response, viewsets, decorators
 from rest_framework.permissions import AllowAny
@@ -27,15 +27,14 @@ class TrekViewSet(DetailSerializerMixin, viewsets.ReadOnlyModelViewSet):
         if self.action != 'list':
             queryset = queryset.annotate(geom2d_transformed=Transform(F('geom'), settings.API_SRID))
         else:
-            queryset = queryset.annotate(count_parents=Count('trek_parents')).\
-                exclude(Q(count_parents__gt=0) & Q(published=False))
+            queryset = queryset.exclude(
+                Q(Exists(trekking_models.TrekStep.objects.filter(child=OuterRef('pk')))) & Q(published=False)
+            )
         if 'portal' in self.request.GET:
             queryset = queryset.filter(Q(portal__name=self.request.GET['portal']) | Q(portal=None))
         return queryset.annotate(start_point=Transform(StartPoint('geom'), settings.API_SRID),
                                  end_point=Transform(EndPoint('geom'), settings.API_SRID)). \
-            filter(Q(**{'published_{lang}'.format(lang=lang): True})
-                   | Q(**{'trek_parents__parent__published_{lang}'.format(lang=lang): True,
-                          'trek_parents__parent__deleted': False})).distinct()
+            filter(**{'visible_{lang}'.format(lang=lang): True})
 
     def get_serializer_context(self):
         return {'root_pk': self.request.GET.get('root_pk')}
@@ -1,31 +1,46 @@
+import base64
 import datetime
 from functools import partial
+import gzip
 import json
+import math
+import os
 import re
 from unittest import skipIf, mock
 
+import fiona
+import msgpack
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.geos import (LineString, MultiLineString, MultiPoint,
                                      Point, Polygon)
 from django.contrib.gis.geos.collections import GeometryCollection
+from django.core.cache import cache, caches
+from django.core.management import call_command
 from django.db import connection
+from django.db.models import Q
 from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from freezegun import freeze_time
 from mapentity.tests.factories import SuperUserFactory
 from paperclip.models import random_suffix_regexp
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APIClient, APITransactionTestCase
 
 from geotrek import __version__
+from geotrek.api.v2.decorators import compress_content
+from geotrek.api.v2.filters import get_published_filter_expression
+from geotrek.api.v2.instrumentation import QueryBudgetExceeded
 from geotrek.api.v2.views.trekking import TrekViewSet
 from geotrek.authent import models as authent_models
 from geotrek.authent.tests import factories as authent_factory
 from geotrek.authent.tests.factories import StructureFactory
+from geotrek.common.cache import bump_model_version, get_object_version
 from geotrek.common import models as common_models
 from geotrek.common.models import Attachment, FileType
+from geotrek.common.tasks import generate_thumbnails
 from geotrek.common.tests import factories as common_factory, TranslationResetMixin
 from geotrek.common.utils.testdata import (get_dummy_uploaded_document,
                                            get_dummy_uploaded_file,
@@ -885,6 +900,11 @@ class NoPaginationTestCase(BaseApiTest):
 
     def setUp(self):
         self.factory = RequestFactory()
+        caches['api_v2'].clear()
+
+    def get_streamed_json(self, response):
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
 
     def test_json_no_page(self):
         request = self.factory.get(
@@ -895,10 +915,11 @@ class NoPaginationTestCase(BaseApiTest):
         )
         response = TrekViewSet.as_view({"get": "list"})(request)
         self.assertEqual(response.status_code, 200)
-        self.assertIsInstance(response.data, list)
-        self.assertIsInstance(response.data[0], dict)
+        data = self.get_streamed_json(response)
+        self.assertIsInstance(data, list)
+        self.assertIsInstance(data[0], dict)
         self.assertEqual(
-            len(response.data[0].get("geometry").get("coordinates")[0]),
+            len(data[0].get("geometry").get("coordinates")[0]),
             3,
         )
 
@@ -912,16 +933,46 @@ class NoPaginationTestCase(BaseApiTest):
         )
         response = TrekViewSet.as_view({"get": "list"})(request)
         self.assertEqual(response.status_code, 200)
-        self.assertIsInstance(response.data, dict)
-        self.assertEqual(sorted(response.data.keys()), GEOJSON_COLLECTION_STRUCTURE)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        data = self.get_streamed_json(response)
+        self.assertIsInstance(data, dict)
+        self.assertEqual(sorted(data.keys()), GEOJSON_COLLECTION_STRUCTURE)
         self.assertEqual(
-            len(response.data.get("features")), self.nb_treks, response.data
+            len(data.get("features")), self.nb_treks, data
         )
         self.assertEqual(
-            sorted(response.data.get("features")[0].get("properties").keys()),
+            sorted(data.get("features")[0].get("properties").keys()),
             TREK_PROPERTIES_GEOJSON_STRUCTURE,
         )
 
+    @mock.patch.object(TrekViewSet, 'stream_chunk_size', 2)
+    def test_json_no_page_chunks(self):
+        request = self.factory.get(reverse("apiv2:trek-list"), {"no_page": "true"})
+        response = TrekViewSet.as_view({"get": "list"})(request)
+        data = self.get_streamed_json(response)
+        self.assertEqual(len(data), self.nb_treks)
+        self.assertEqual(len({trek['id'] for trek in data}), self.nb_treks)
+
+    def test_json_no_page_is_cached_once_streamed(self):
+        streamed = self.get_streamed_json(self.client.get(reverse("apiv2:trek-list"), {"no_page": "true"}))
+        response = self.client.get(reverse("apiv2:trek-list"), {"no_page": "true"})
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.json(), streamed)
+
+    @override_settings(API_V2_LIST_CACHE_MAX_ENTRY_SIZE=10)
+    def test_json_no_page_too_big_is_not_cached(self):
+        self.get_streamed_json(self.client.get(reverse("apiv2:trek-list"), {"no_page": "true"}))
+        response = self.client.get(reverse("apiv2:trek-list"), {"no_page": "true"})
+        self.assertTrue(response.streaming)
+
+    def test_json_no_page_same_content_as_pages(self):
+        request = self.factory.get(reverse("apiv2:trek-list"), {"page_size": 1000})
+        response = TrekViewSet.as_view({"get": "list"})(request)
+        response.render()
+        request = self.factory.get(reverse("apiv2:trek-list"), {"no_page": "true"})
+        streamed = TrekViewSet.as_view({"get": "list"})(request)
+        self.assertEqual(json.loads(response.content)['results'], self.get_streamed_json(streamed))
+
 
 class APIAccessAnonymousTestCase(BaseApiTest):
     """ TestCase for anonymous API profile """
@@ -1365,10 +1416,38 @@ class APIAccessAnonymousTestCase(BaseApiTest):
         response = self.get_trek_detail(self.child3.pk)
         self.assertEqual(response.status_code, 404)
 
+    def test_trek_child_detail_view_filters_visible_flag_without_join(self):
+        with CaptureQueriesContext(connection) as context:
+            self.get_trek_detail(self.child1.pk)
+        trek_queries = [query['sql'] for query in context.captured_queries
+                        if '"trekking_trek"."visible_en"' in query['sql'].partition(' WHERE ')[2]]
+        self.assertEqual(len(trek_queries), 1)
+        self.assertNotIn('trekking_orderedtrekchild', trek_queries[0])
+        self.assertNotIn('DISTINCT', trek_queries[0])
+
     def test_trek_child_not_published_not_in_list_view_if_ancestor_published(self):
         response = self.get_trek_list({'fields': 'id'})
         self.assertNotContains(response, str(self.child1.pk))
 
+    def test_trek_list_steps_resolved_at_once(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_trek_list({'fields': 'id,children,parents,previous,next'})
+        results = {trek['id']: trek for trek in response.json()['results']}
+        self.assertEqual(results[self.parent.pk]['children'], [self.child2.pk, self.child1.pk])
+        self.assertEqual(results[self.child2.pk]['parents'], sorted([self.parent.pk, self.treks[0].pk]))
+        self.assertEqual(results[self.child2.pk]['next'][str(self.parent.pk)], self.child1.pk)
+        step_queries = [query for query in context.captured_queries if '"trekking_trekstep"' in query['sql']]
+        self.assertEqual(len(step_queries), 1)
+
+    def test_tour_list_steps_resolved_at_once(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_tour_list()
+        steps = {tour['id']: [step['id'] for step in tour['steps']] for tour in response.json()['results']}
+        self.assertEqual(steps[self.parent.pk], [self.child2.pk, self.child1.pk])
+        # steps of tours, then steps of their children
+        step_queries = [query for query in context.captured_queries if '"trekking_trekstep"' in query['sql']]
+        self.assertEqual(len(step_queries), 2)
+
     def test_tour_list(self):
         response = self.get_tour_list()
         #  test response code
@@ -1406,6 +1485,23 @@ class APIAccessAnonymousTestCase(BaseApiTest):
         response = self.get_trek_detail(self.parent.id)
         self.assertEqual(response.status_code, 200)
 
+    @override_settings(ONLY_EXTERNAL_PUBLIC_PDF=True)
+    def test_trek_list_external_pdf_resolved_once(self):
+        common_factory.AttachmentFactory(content_object=self.treks[0],
+                                         filetype=common_models.FileType.objects.get(type='Topoguide'))
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_trek_list({'language': 'all'})
+        pdfs = {trek['id']: trek['pdf'] for trek in response.json()['results']}
+        self.assertEqual(set(pdfs[self.treks[0].pk].keys()), set(settings.MODELTRANSLATION_LANGUAGES))
+        self.assertTrue(all(pdfs[self.treks[0].pk].values()))
+        self.assertFalse(any(pdfs[self.treks[1].pk].values()))
+        filetype_queries = [query for query in context.captured_queries if '"common_filetype"."type" =' in query['sql']]
+        self.assertEqual(len(filetype_queries), 1)
+        topoguide_queries = [query for query in context.captured_queries
+                             if '"common_attachment"."object_id" IN' in query['sql']
+                             and '"common_attachment"."filetype_id" =' in query['sql']]
+        self.assertEqual(len(topoguide_queries), 1)
+
     @override_settings(SPLIT_TREKS_CATEGORIES_BY_ITINERANCY=True)
     def test_trek_detail_categories_split_itinerancy(self):
         response = self.get_trek_detail(self.parent.id)
@@ -3336,13 +3432,15 @@ class MenuItemTestCase(TestCase):
         menu_item.portals.add(portal1, portal2)
         user = authent_models.User.objects.create(username="test_user")
         file_type = FileType.objects.create(type="Photographie")
-        Attachment.objects.create(
+        attachment = Attachment.objects.create(
             content_type=ContentType.objects.get_for_model(MenuItem),
             object_id=menu_item.id,
             attachment_file=get_dummy_uploaded_image("menu_item_thumbnail.png"),
             filetype=file_type,
             creator=user,
         )
+        # thumbnails are generated in background once attachment is saved
+        generate_thumbnails('common.Attachment', attachment.pk)
         child1 = self.published_menu_item_factory()
         child2 = self.published_menu_item_factory()
         self.add_child(menu_item, child1)
@@ -5508,6 +5606,571 @@ class GenericCacheTestCase(APITestCase):
         self.assertTrue(data['pictogram'].startswith('http://'))
 
 
+class ObjectVersionCacheTestCase(APITestCase):
+    """ Object versions are stored on commit, run on_commit callbacks to use them """
+    @classmethod
+    def setUpTestData(cls):
+        cls.practice = PracticeFactory.create()
+
+    def setUp(self):
+        cache.clear()
+        caches['api_v2'].clear()
+
+    def get_practice_detail(self, pk):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(reverse('apiv2:practice-detail', args=(pk,)))
+
+    def test_cache_is_hit_without_query(self):
+        # version is read from date_update column, then object is serialized
+        with self.assertNumQueries(2):
+            self.get_practice_detail(self.practice.pk)
+        self.assertEqual(get_object_version(trek_models.Practice, self.practice.pk),
+                         trek_models.Practice.objects.get(pk=self.practice.pk).date_update.isoformat())
+        with self.assertNumQueries(0):
+            self.get_practice_detail(self.practice.pk)
+
+    def test_cache_invalidates_on_object_save(self):
+        self.get_practice_detail(self.practice.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.practice.name = "Bike"
+            self.practice.save()
+        # version is bumped, cache is not hit but version is not read from database
+        with self.assertNumQueries(1):
+            response = self.get_practice_detail(self.practice.pk)
+        self.assertEqual(response.json()['name']['en'], "Bike")
+
+    def test_cache_version_is_forgotten_until_commit(self):
+        self.get_practice_detail(self.practice.pk)
+        self.practice.save()
+        self.assertIsNone(get_object_version(trek_models.Practice, self.practice.pk))
+
+    def test_cache_version_is_deleted_with_object(self):
+        self.get_practice_detail(self.practice.pk)
+        pk = self.practice.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.practice.delete()
+        self.assertIsNone(get_object_version(trek_models.Practice, pk))
+        response = self.get_practice_detail(pk)
+        self.assertEqual(response.status_code, 404)
+
+    def get_trek_version(self, trek):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('apiv2:trek-detail', args=(trek.pk,)))
+        return get_object_version(trek_models.Trek, trek.pk)
+
+    @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+    def test_cache_version_is_bumped_on_path_split(self):
+        path = core_factory.PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        trek = trek_factory.TrekFactory.create(paths=[(path, 0.6, 1)])
+        version = self.get_trek_version(trek)
+        # trek is moved by triggers to the part of path split by the new one
+        with self.captureOnCommitCallbacks(execute=True):
+            core_factory.PathFactory.create(geom=LineString((5, -5), (5, 5)))
+        self.assertNotEqual(self.get_trek_version(trek), version)
+
+    @skipIf(not settings.TREKKING_TOPOLOGY_ENABLED, 'Test with dynamic segmentation only')
+    def test_cache_version_is_bumped_on_path_deletion(self):
+        path = core_factory.PathFactory.create(geom=LineString((0, 0), (10, 0)))
+        trek = trek_factory.TrekFactory.create(paths=[(path, 0, 1)])
+        version = self.get_trek_version(trek)
+        with self.captureOnCommitCallbacks(execute=True):
+            path.delete()
+        self.assertNotEqual(get_object_version(trek_models.Trek, trek.pk), version)
+
+
+class ListCacheTestCase(APITestCase):
+    """ Model versions are stored on commit, run on_commit callbacks to use them """
+    @classmethod
+    def setUpTestData(cls):
+        cls.trek = trek_factory.TrekFactory.create()
+
+    def setUp(self):
+        cache.clear()
+        caches['api_v2'].clear()
+
+    def get_trek_list(self, params=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(reverse('apiv2:trek-list'), params)
+
+    def test_list_cache_is_hit_without_query(self):
+        self.get_trek_list({'language': 'en'})
+        with self.assertNumQueries(0):
+            response = self.get_trek_list({'language': 'en'})
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_list_cache_key_ignores_query_params_order(self):
+        self.get_trek_list({'language': 'en', 'practices': '1,2'})
+        with self.assertNumQueries(0):
+            self.client.get(f"{reverse('apiv2:trek-list')}?practices=1,2&language=en")
+
+    def test_list_cache_invalidates_on_object_save(self):
+        self.get_trek_list({'language': 'en'})
+        with self.captureOnCommitCallbacks(execute=True):
+            trek_factory.TrekFactory.create()
+        response = self.get_trek_list({'language': 'en'})
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_list_cache_is_kept_on_other_topology_save(self):
+        self.get_trek_list({'language': 'en'})
+        with self.captureOnCommitCallbacks(execute=True):
+            path = core_factory.PathFactory.create(geom=LineString((0, 0), (10, 0)))
+            signage_factory.SignageFactory.create(paths=[(path, 0.5, 0.5)])
+        with self.assertNumQueries(0):
+            self.get_trek_list({'language': 'en'})
+
+    def test_list_cache_invalidates_on_related_model_save(self):
+        self.get_trek_list({'language': 'en'})
+        with self.captureOnCommitCallbacks(execute=True):
+            zoning_factory.CityFactory.create()
+        with CaptureQueriesContext(connection) as context:
+            self.get_trek_list({'language': 'en'})
+        self.assertGreater(len(context.captured_queries), 0)
+
+    def test_list_cache_invalidates_by_model(self):
+        self.get_trek_list({'language': 'en'})
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_model_version(trek_models.Trek)
+        with CaptureQueriesContext(connection) as context:
+            self.get_trek_list({'language': 'en'})
+        self.assertGreater(len(context.captured_queries), 0)
+
+    def test_sensitive_area_list_cache_changes_with_month(self):
+        species = sensitivity_factory.SpeciesFactory.create(period01=True, period06=False, period07=False)
+        sensitivity_factory.SensitiveAreaFactory.create(species=species)
+        url = reverse('apiv2:sensitivearea-list')
+        with freeze_time("2099-01-31"):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get(url, {'language': 'en'})
+            self.assertEqual(response.json()['count'], 1)
+        with freeze_time("2099-02-01"):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get(url, {'language': 'en'})
+            self.assertEqual(response.json()['count'], 0)
+            # areas of given period are still cached
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get(url, {'language': 'en', 'period': '1'})
+            with self.assertNumQueries(0):
+                response = self.client.get(url, {'language': 'en', 'period': '1'})
+            self.assertEqual(response.json()['count'], 1)
+
+    @override_settings(API_V2_LIST_CACHE_MAX_ENTRY_SIZE=10)
+    def test_list_cache_ignores_too_big_entries(self):
+        self.get_trek_list({'language': 'en'})
+        with CaptureQueriesContext(connection) as context:
+            self.get_trek_list({'language': 'en'})
+        self.assertGreater(len(context.captured_queries), 0)
+
+
+class ConditionalGetTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trek = trek_factory.TrekFactory.create()
+
+    def setUp(self):
+        caches['api_v2'].clear()
+
+    def test_detail_has_validators(self):
+        response = self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+    def test_detail_not_modified_if_none_match(self):
+        response = self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk,)))
+        # object is not serialized, only its version is read
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk,)),
+                                       headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+    def test_detail_modified_if_none_match(self):
+        response = self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk,)),
+                                   headers={'If-None-Match': '"outdated"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_not_modified_since(self):
+        response = self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk,)))
+        response = self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk,)),
+                                   headers={'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_modified_since(self):
+        response = self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk,)),
+                                   headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_etag_changes_with_object(self):
+        etag = self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk,)))['ETag']
+        self.trek.name = "Modified"
+        self.trek.save()
+        response = self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk,)),
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_not_modified_if_none_match(self):
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('apiv2:trek-list'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_has_no_last_modified(self):
+        # model versions may be read again from database, with an older date than deleted objects
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_list_etag_changes_with_query_params(self):
+        etag = self.client.get(reverse('apiv2:trek-list'))['ETag']
+        response = self.client.get(reverse('apiv2:trek-list'), {'language': 'en'}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_found_has_no_validators(self):
+        response = self.client.get(reverse('apiv2:trek-detail', args=(0,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+
+class CursorPaginationTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = [trek_factory.TrekFactory.create(name=name) for name in ('C', 'A', 'B', 'A')]
+
+    def setUp(self):
+        caches['api_v2'].clear()
+
+    def get_all_pages(self, params, ordering):
+        ids = []
+        response = self.client.get(reverse('apiv2:trek-list'), dict(params, cursor_ordering=ordering, page_size=1))
+        while True:
+            self.assertEqual(response.status_code, 200)
+            json_response = response.json()
+            self.assertIsNone(json_response['count'])
+            self.assertIsNone(json_response['previous'])
+            results = json_response['features'] if params.get('format') == 'geojson' else json_response['results']
+            ids += [result['id'] for result in results]
+            if not json_response['next']:
+                return ids
+            response = self.client.get(json_response['next'])
+
+    def test_cursor_by_name(self):
+        ids = self.get_all_pages({}, 'name')
+        expected = sorted(self.treks, key=lambda trek: (trek.name, trek.pk))
+        self.assertListEqual(ids, [trek.pk for trek in expected])
+
+    def test_cursor_by_translated_name(self):
+        treks = [trek_factory.TrekFactory.create(name_en=name_en, name_fr=name_fr, published_fr=True)
+                 for name_en, name_fr in (('A', 'C'), ('B', 'A'), ('C', 'B'), ('D', 'A'))]
+        ids = self.get_all_pages({'language': 'fr'}, 'name')
+        expected = sorted(treks, key=lambda trek: (trek.name_fr, trek.pk))
+        self.assertListEqual(ids, [trek.pk for trek in expected])
+
+    def test_cursor_by_date_update(self):
+        ids = self.get_all_pages({}, 'date_update')
+        expected = sorted(self.treks, key=lambda trek: (trek.date_update, trek.pk))
+        self.assertListEqual(ids, [trek.pk for trek in expected])
+
+    def test_cursor_geojson(self):
+        ids = self.get_all_pages({'format': 'geojson'}, 'name')
+        self.assertEqual(len(ids), 4)
+
+    def test_cursor_does_not_count(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('apiv2:trek-list'), {'cursor_ordering': 'name'})
+        for query in context.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('apiv2:trek-list'), {'cursor_ordering': 'name', 'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
+    def get_cursor_page(self, ordering, position):
+        cursor = base64.b64encode(json.dumps(position).encode()).decode()
+        return self.client.get(reverse('apiv2:trek-list'), {'cursor_ordering': ordering, 'cursor': cursor})
+
+    def test_cursor_of_unexpected_values(self):
+        for position in ({'value': 'A'}, [['A'], 1], [{'a': 1}, 1], ['A', [1]], ['A', '1'], ['A', True], ['A', 1, 2], 'A1'):
+            for ordering in ('name', 'date_update'):
+                self.assertEqual(self.get_cursor_page(ordering, position).status_code, 404, (position, ordering))
+        self.assertEqual(self.get_cursor_page('date_update', ['2024-02-30T10:00:00+00:00', 1]).status_code, 404)
+
+    def test_invalid_cursor_ordering(self):
+        response = self.client.get(reverse('apiv2:trek-list'), {'cursor_ordering': 'length'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_mode_is_default(self):
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(response.json()['count'], 4)
+
+
+class FieldDependenciesTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trek = trek_factory.TrekFactory.create(
+            parking_location='SRID=%s;POINT(700000 6600000)' % settings.SRID
+        )
+        common_factory.AttachmentFactory.create(content_object=cls.trek, attachment_file=get_dummy_uploaded_document())
+        cls.trek.web_links.add(trek_factory.WebLinkFactory.create())
+
+    def setUp(self):
+        caches['api_v2'].clear()
+
+    def get_queries(self, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('apiv2:trek-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in context.captured_queries]
+
+    def test_requested_fields_only_query_their_dependencies(self):
+        response, queries = self.get_queries({'fields': 'id,name'})
+        self.assertEqual(list(response.json()['results'][0].keys()), ['id', 'name'])
+        self.assertFalse([sql for sql in queries if 'common_attachment' in sql or 'trekking_weblink' in sql])
+        self.assertFalse([sql for sql in queries if 'ST_Transform' in sql or 'parking_location' in sql])
+
+    def test_omitted_fields_do_not_query_their_dependencies(self):
+        response, queries = self.get_queries({'omit': 'attachments,web_links'})
+        self.assertNotIn('attachments', response.json()['results'][0])
+        self.assertFalse([sql for sql in queries if 'trekking_weblink' in sql])
+        self.assertTrue([sql for sql in queries if 'ST_Transform' in sql])
+
+    def test_all_fields_by_default(self):
+        response, queries = self.get_queries({})
+        result = response.json()['results'][0]
+        self.assertEqual(len(result['web_links']), 1)
+        self.assertEqual(len(result['attachments']), 1)
+        self.assertIsNotNone(result['parking_location'])
+        self.assertIsNotNone(result['length_3d'])
+
+    def test_geojson_geometry_always_annotated(self):
+        response, queries = self.get_queries({'fields': 'id', 'format': 'geojson'})
+        feature = response.json()['features'][0]
+        self.assertIsNotNone(feature['geometry'])
+        self.assertNotIn('name', feature['properties'])
+
+    def test_geojson_geometry_kept_when_omitted(self):
+        response, queries = self.get_queries({'fields': 'name', 'omit': 'geometry', 'format': 'geojson'})
+        feature = response.json()['features'][0]
+        self.assertIsNotNone(feature['geometry'])
+        self.assertEqual(list(feature['properties'].keys()), ['name'])
+
+
+class TranslatedColumnsTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trek = trek_factory.TrekFactory.create(name_en="Trek", name_fr="Randonnée", name_es="Excursión",
+                                                   published_fr=True, published_es=True)
+        cls.poi = trek_factory.POIFactory.create(name_en="POI", name_fr="Point", published_fr=True)
+
+    def setUp(self):
+        caches['api_v2'].clear()
+
+    def get_main_query(self, url, params, table):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        queries = [query['sql'] for query in context.captured_queries if f'"{table}"."name_' in query['sql']]
+        return response.json(), queries[0]
+
+    def test_list_loads_requested_language_columns(self):
+        data, sql = self.get_main_query(reverse('apiv2:trek-list'), {'language': 'fr'}, 'trekking_trek')
+        self.assertEqual(data['results'][0]['name'], "Randonnée")
+        self.assertIn('"name_fr"', sql)
+        self.assertNotIn('"name_es"', sql)
+        self.assertNotIn('"description_it"', sql)
+
+    def test_detail_loads_requested_language_columns(self):
+        data, sql = self.get_main_query(reverse('apiv2:trek-detail', args=(self.trek.pk, )), {'language': 'es'},
+                                        'trekking_trek')
+        self.assertEqual(data['name'], "Excursión")
+        self.assertNotIn('"name_fr"', sql)
+
+    def test_fallback_language_columns_are_loaded(self):
+        data, sql = self.get_main_query(reverse('apiv2:poi-list'), {'language': 'fr'}, 'trekking_poi')
+        self.assertEqual(data['results'][0]['name'], "Point")
+        self.assertIn(f'"name_{settings.MODELTRANSLATION_DEFAULT_LANGUAGE}"', sql)
+        self.assertNotIn('"name_it"', sql)
+
+    def test_all_languages(self):
+        data, sql = self.get_main_query(reverse('apiv2:trek-list'), {}, 'trekking_trek')
+        self.assertEqual(data['results'][0]['name']['es'], "Excursión")
+        self.assertIn('"name_it"', sql)
+
+
+class BinaryFormatsTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.treks = trek_factory.TrekFactory.create_batch(2)
+
+    def setUp(self):
+        caches['api_v2'].clear()
+
+    def test_msgpack_list(self):
+        response = self.client.get(reverse('apiv2:trek-list'), {'format': 'msgpack'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        json_response = self.client.get(reverse('apiv2:trek-list'), {'format': 'json'}).json()
+        self.assertEqual(msgpack.unpackb(response.content), json_response)
+
+    def test_msgpack_plain_endpoint(self):
+        response = self.client.get(reverse('apiv2:theme-list'), {'format': 'msgpack'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('results', msgpack.unpackb(response.content))
+
+    def test_flatgeobuf_list(self):
+        response = self.client.get(reverse('apiv2:trek-list'), {'format': 'fgb', 'fields': 'id,name,length_2d'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/flatgeobuf')
+        with fiona.MemoryFile(response.content) as memfile:
+            with memfile.open() as collection:
+                self.assertEqual(collection.driver, 'FlatGeobuf')
+                self.assertTrue(collection.schema['properties']['id'].startswith('int'))
+                self.assertEqual(collection.schema['properties']['length_2d'], 'float')
+                self.assertEqual(collection.schema['properties']['name'], 'str')
+                features = list(collection)
+        self.assertSetEqual({feature.properties['id'] for feature in features}, {trek.pk for trek in self.treks})
+        self.assertEqual(features[0].geometry.type, 'LineString')
+        self.assertIsInstance(json.loads(features[0].properties['name']), dict)
+
+    def test_flatgeobuf_geometry_not_omitted(self):
+        response = self.client.get(reverse('apiv2:trek-list'), {'format': 'fgb', 'omit': 'geometry'})
+        self.assertEqual(response.status_code, 200)
+        with fiona.MemoryFile(response.content) as memfile:
+            with memfile.open() as collection:
+                self.assertNotIn('geometry', collection.schema['properties'])
+                features = list(collection)
+        self.assertEqual(len(features), len(self.treks))
+        self.assertTrue(all(feature.geometry is not None for feature in features))
+
+    def test_flatgeobuf_detail(self):
+        response = self.client.get(reverse('apiv2:trek-detail', args=(self.treks[0].pk, )),
+                                   {'format': 'fgb', 'language': 'en'})
+        with fiona.MemoryFile(response.content) as memfile:
+            with memfile.open() as collection:
+                feature = next(iter(collection))
+        self.assertEqual(feature.properties['name'], self.treks[0].name_en)
+
+    def test_flatgeobuf_pagination_headers(self):
+        response = self.client.get(reverse('apiv2:trek-list'), {'format': 'fgb', 'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Total-Count'], '2')
+        self.assertIn('page=2', response['Link'])
+        self.assertIn('rel="next"', response['Link'])
+        response = self.client.get(reverse('apiv2:trek-list'), {'format': 'fgb', 'page_size': 1, 'page': 2})
+        self.assertIn('rel="prev"', response['Link'])
+        self.assertNotIn('rel="next"', response['Link'])
+
+    def test_flatgeobuf_not_found(self):
+        response = self.client.get(reverse('apiv2:trek-detail', args=(0, )), {'format': 'fgb'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', response.json())
+
+
+class SimplifyGeometryTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        wkt = 'SRID=2154;LINESTRING(700000 6600000, 700010 6600001, 700020 6600000, 700030 6600001, 700040 6600000)'
+        if settings.TREKKING_TOPOLOGY_ENABLED:
+            cls.trek = trek_factory.TrekFactory.create(paths=[core_factory.PathFactory.create(geom=wkt)])
+        else:
+            cls.trek = trek_factory.TrekFactory.create(geom=wkt)
+
+    def setUp(self):
+        caches['api_v2'].clear()
+
+    def get_coordinates(self, params):
+        response = self.client.get(reverse('apiv2:trek-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'][0]['geometry']['coordinates']
+
+    def test_full_resolution_by_default(self):
+        self.assertEqual(len(self.get_coordinates({})), 5)
+
+    def test_simplify(self):
+        self.assertEqual(len(self.get_coordinates({'simplify': 10})), 2)
+
+    def test_zoom(self):
+        self.assertEqual(len(self.get_coordinates({'zoom': 9})), 2)
+        self.assertEqual(len(self.get_coordinates({'zoom': 20})), 5)
+
+    def test_invalid_values_are_ignored(self):
+        self.assertEqual(len(self.get_coordinates({'simplify': 'nan'})), 5)
+        self.assertEqual(len(self.get_coordinates({'simplify': -1})), 5)
+        self.assertEqual(len(self.get_coordinates({'zoom': 'far'})), 5)
+        self.assertEqual(len(self.get_coordinates({'zoom': -1})), 5)
+        self.assertEqual(len(self.get_coordinates({'zoom': 23})), 5)
+
+    def test_collapsed_geometry_is_not_simplified(self):
+        # line is shorter than coordinates precision at zoom 0
+        self.assertEqual(len(self.get_coordinates({'simplify': 10 ** 9})), 5)
+        self.assertEqual(len(self.get_coordinates({'zoom': 0})), 5)
+        response = self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk,)), {'simplify': 10 ** 9})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['departure_geom']), 2)
+
+
+class VectorTilesTestCase(APITestCase):
+    """ Model versions are stored on commit, run on_commit callbacks to use them """
+    zoom = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trek = trek_factory.TrekFactory.create(name_en="Published trek", published_en=True)
+        cls.unpublished_trek = trek_factory.TrekFactory.create(name_en="Hidden trek", published=False)
+
+    def setUp(self):
+        cache.clear()
+        caches['api_v2'].clear()
+
+    def get_tile_url(self, geom, basename='trek'):
+        point = geom.point_on_surface.transform(4326, clone=True)
+        n = 2 ** self.zoom
+        x = int((point.x + 180) / 360 * n)
+        y = int((1 - math.asinh(math.tan(math.radians(point.y))) / math.pi) / 2 * n)
+        return reverse(f'apiv2:{basename}-tile', kwargs={'z': self.zoom, 'x': x, 'y': y})
+
+    def get_tile(self, url, params=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(url, params)
+
+    def test_tile(self):
+        response = self.get_tile(self.get_tile_url(self.trek.geom), {'language': 'en'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertIn(b'trek', response.content)
+        self.assertIn(b'Published trek', response.content)
+        self.assertNotIn(b'Hidden trek', response.content)
+
+    def test_empty_tile(self):
+        response = self.get_tile(reverse('apiv2:trek-tile', kwargs={'z': self.zoom, 'x': 0, 'y': 0}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+
+    def test_tile_out_of_range(self):
+        response = self.get_tile(reverse('apiv2:trek-tile', kwargs={'z': 1, 'x': 2, 'y': 0}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_tile_cache(self):
+        url = self.get_tile_url(self.trek.geom)
+        content = self.get_tile(url, {'language': 'en'}).content
+        with self.assertNumQueries(0):
+            response = self.get_tile(url, {'language': 'en'})
+        self.assertEqual(response.content, content)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trek.name_en = "Renamed trek"
+            self.trek.save()
+        self.assertIn(b'Renamed trek', self.get_tile(url, {'language': 'en'}).content)
+
+    def test_sensitive_area_tile(self):
+        area = sensitivity_factory.SensitiveAreaFactory.create()
+        response = self.get_tile(self.get_tile_url(area.geom, 'sensitivearea'), {'language': 'en'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(area.species.name_en.encode(), response.content)
+
+
 class CreateReportsAPITest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -5783,6 +6446,25 @@ class SensitivityAPIv2Test(TranslationResetMixin, TrekkingManagerTest):
         self.assertEqual(response.json()['count'], 1)
         self.assertEqual(response.json()['results'][0]['name'], sensitive_area_jf.species.name)
 
+    def test_filters_practices_no_duplicate(self):
+        sensitive_area = SensitiveAreaFactory.create()
+        practices = ','.join(str(practice.pk) for practice in sensitive_area.species.practices.all())
+        url = reverse('apiv2:sensitivearea-list')
+        params = {'format': 'json', 'period': 'ignore', 'practices': practices, 'language': 'en'}
+        response = self.client.get(url, params)
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_list_ordered_by_display_area(self):
+        small_area = SensitiveAreaFactory.create(
+            geom='SRID=2154;POLYGON((700000 6600000, 700000 6600010, 700010 6600010, 700010 6600000, 700000 6600000))')
+        big_point = SensitiveAreaFactory.create(geom='SRID=2154;POINT (700040 6600040)', species__radius=100)
+        url = reverse('apiv2:sensitivearea-list')
+        params = {'format': 'json', 'period': 'ignore', 'language': 'en'}
+        response = self.client.get(url, params)
+        ids = [result['id'] for result in response.json()['results']]
+        self.assertLess(ids.index(big_point.pk), ids.index(small_area.pk))
+        self.assertEqual(response.json()['results'][ids.index(big_point.pk)]['geometry']['type'], 'Polygon')
+
     def test_filters_no_period_get_month(self):
         sensitive_area_month = SensitiveAreaFactory.create(**{'species__period01': True})
         SensitiveAreaFactory.create(**{'species__period02': True})
@@ -5791,3 +6473,273 @@ class SensitivityAPIv2Test(TranslationResetMixin, TrekkingManagerTest):
         response = self.client.get(url, params)
         self.assertEqual(response.json()['count'], 1)
         self.assertEqual(response.json()['results'][0]['name'], sensitive_area_month.species.name)
+
+
+class AttachmentThumbnailTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.poi = trek_factory.POIFactory()
+        cls.attachment = common_factory.AttachmentFactory(content_object=cls.poi,
+                                                          attachment_file=get_dummy_uploaded_image())
+
+    def setUp(self):
+        caches['api_v2'].clear()
+
+    def get_thumbnail(self):
+        response = self.client.get(reverse('apiv2:poi-detail', args=(self.poi.pk,)), {'fields': 'attachments'})
+        return response.json()['attachments'][0]['thumbnail']
+
+    def test_no_thumbnail_until_it_is_generated(self):
+        self.assertEqual(self.get_thumbnail(), "")
+        self.assertFalse(os.path.exists(f"{self.attachment.attachment_file.path}.400x0_q85.png"))
+
+    def test_thumbnail_generated_by_task(self):
+        self.get_thumbnail()
+        # cached response of POI is invalidated
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_thumbnails('common.Attachment', self.attachment.pk)
+        self.assertEqual(self.get_thumbnail(), f"http://testserver{self.attachment.attachment_file.url}.400x0_q85.png")
+
+    def test_thumbnail_failure_is_logged(self):
+        with open(self.attachment.attachment_file.path, 'wb') as f:
+            f.write(b'not a picture')
+        with self.assertLogs('geotrek.common.tasks', level='WARNING'):
+            generate_thumbnails('common.Attachment', self.attachment.pk)
+        self.assertEqual(self.get_thumbnail(), "")
+
+
+class ServerTimingTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trek = trek_factory.TrekFactory.create()
+
+    def setUp(self):
+        caches['api_v2'].clear()
+
+    @override_settings(API_V2_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(response.status_code, 200)
+        metrics = response['Server-Timing'].split(', ')
+        self.assertTrue(metrics[0].startswith('sql;dur='))
+        self.assertIn('cache-api_v2;desc="hits=0 misses=1"', metrics)
+        self.assertTrue([metric for metric in metrics if metric.startswith('serialize;dur=')])
+        self.assertTrue([metric for metric in metrics if metric.startswith('render;dur=')])
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertIn('cache-api_v2;desc="hits=1 misses=0"', response['Server-Timing'].split(', '))
+
+    @override_settings(API_V2_SERVER_TIMING=True)
+    def test_metrics_are_logged(self):
+        with self.assertLogs('geotrek.api.v2.timing', 'INFO') as logs:
+            self.client.get(reverse('apiv2:trek-detail', args=(self.trek.pk,)))
+        self.assertEqual(logs.records[0].metrics['cache_misses']['api_v2'], 1)
+        self.assertGreater(logs.records[0].metrics['sql_count'], 0)
+        self.assertEqual(logs.records[0].view, 'TrekViewSet')
+
+    def test_no_server_timing_by_default(self):
+        response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_query_budget_is_enforced(self):
+        with mock.patch.object(TrekViewSet, 'query_budget', 1):
+            with self.assertRaisesRegex(QueryBudgetExceeded, 'TrekViewSet query budget is 1'):
+                self.client.get(reverse('apiv2:trek-list'))
+
+    def test_query_budget_is_respected(self):
+        with mock.patch.object(TrekViewSet, 'query_budget', 100):
+            response = self.client.get(reverse('apiv2:trek-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Server-Timing', response)
+
+
+class BatchRetrieveTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trek_1 = trek_factory.TrekFactory.create(name="Trek 1", published=True)
+        cls.trek_2 = trek_factory.TrekFactory.create(name="Trek 2", published=True)
+        cls.unpublished_trek = trek_factory.TrekFactory.create(published=False)
+
+    def setUp(self):
+        caches['api_v2'].clear()
+
+    def get_batch(self, ids):
+        return self.client.get(reverse('apiv2:trek-batch'), {'ids': ','.join(map(str, ids))})
+
+    def test_details_in_requested_order(self):
+        response = self.get_batch([self.trek_2.pk, self.unpublished_trek.pk, 0, self.trek_1.pk, self.trek_2.pk])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual([trek['id'] for trek in response.json()], [self.trek_2.pk, self.trek_1.pk])
+        detail = self.client.get(reverse('apiv2:trek-detail', args=(self.trek_1.pk,)))
+        self.assertEqual(response.json()[1], detail.json())
+
+    def test_cached_details_are_not_queried(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.get_batch([self.trek_1.pk, self.trek_2.pk])
+        with self.assertNumQueries(0):
+            response = self.get_batch([self.trek_2.pk, self.trek_1.pk])
+        self.assertEqual([trek['id'] for trek in response.json()], [self.trek_2.pk, self.trek_1.pk])
+
+    def test_modified_object_is_serialized_again(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.get_batch([self.trek_1.pk, self.trek_2.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trek_1.name = "Modified trek"
+            self.trek_1.save()
+        response = self.get_batch([self.trek_1.pk, self.trek_2.pk])
+        self.assertEqual(response.json()[0]['name']['en'], "Modified trek")
+
+    def test_invalid_ids(self):
+        response = self.get_batch(['a', self.trek_1.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ids', response.json())
+
+    def test_too_many_ids(self):
+        with mock.patch.object(TrekViewSet, 'batch_max_size', 1):
+            response = self.get_batch([self.trek_1.pk, self.trek_2.pk])
+        self.assertEqual(response.status_code, 400)
+
+    def test_poi_batch(self):
+        poi = trek_factory.POIFactory.create(published=True)
+        response = self.client.get(reverse('apiv2:poi-batch'), {'ids': poi.pk})
+        self.assertEqual([item['id'] for item in response.json()], [poi.pk])
+
+
+class ChangesFeedTestCase(APITransactionTestCase):
+    """ Changes are read once their transaction is committed, so test without wrapping transaction """
+
+    def get_changes(self, viewset, since):
+        response = self.client.get(reverse(f'apiv2:{viewset}-changes'), {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_updated_and_deleted_treks(self):
+        trek = trek_factory.TrekFactory.create(published=True)
+        deleted_trek = trek_factory.TrekFactory.create(published=True)
+        changes = self.get_changes('trek', 0)
+        self.assertEqual(changes['updated'], sorted([trek.pk, deleted_trek.pk]))
+        self.assertEqual(changes['deleted'], [])
+        sequence = changes['sequence']
+        self.assertEqual(self.get_changes('trek', sequence), {'sequence': sequence, 'updated': [], 'deleted': []})
+        deleted_trek.delete()
+        trek.published = False
+        trek.save()
+        changes = self.get_changes('trek', sequence)
+        self.assertEqual(changes['updated'], [])
+        self.assertEqual(changes['deleted'], sorted([trek.pk, deleted_trek.pk]))
+        self.assertGreater(changes['sequence'], sequence)
+
+    def test_hard_deleted_touristic_content(self):
+        content = tourism_factory.TouristicContentFactory.create(published=True)
+        sequence = self.get_changes('touristiccontent', 0)['sequence']
+        pk = content.pk
+        tourism_models.TouristicContent.objects.filter(pk=pk).delete()
+        changes = self.get_changes('touristiccontent', sequence)
+        self.assertEqual(changes['deleted'], [pk])
+
+    def test_changes_of_other_models_are_ignored(self):
+        sequence = self.get_changes('poi', 0)['sequence']
+        trek_factory.TrekFactory.create(published=True)
+        self.assertEqual(self.get_changes('poi', sequence)['updated'], [])
+
+    def test_invalid_sequence(self):
+        response = self.client.get(reverse('apiv2:trek-changes'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_purged_sequence(self):
+        trek_factory.TrekFactory.create(published=True)
+        sequence = self.get_changes('trek', 0)['sequence']
+        call_command('purge_changes', days=0, verbosity=0)
+        self.assertFalse(common_models.ObjectChange.objects.exists())
+        response = self.client.get(reverse('apiv2:trek-changes'), {'since': 0})
+        self.assertEqual(response.status_code, 410)
+        self.assertGreaterEqual(response.json()['sequence'], sequence)
+        self.assertEqual(self.get_changes('trek', sequence)['updated'], [])
+
+
+class CompressedCacheTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trek = trek_factory.TrekFactory.create()
+        cls.url = reverse('apiv2:trek-detail', args=(cls.trek.pk,))
+
+    def setUp(self):
+        caches['api_v2'].clear()
+
+    def test_gzipped_content_served_to_clients_accepting_it(self):
+        identity = self.client.get(self.url)
+        self.assertFalse(identity.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', identity['Vary'])
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), identity.content)
+        self.assertEqual(response['ETag'], f"W/{identity['ETag']}")
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_gzip_refused_by_quality_value(self):
+        self.client.get(self.url)
+        for header in ('gzip;q=0', 'br, gzip; q=0.0', '*;q=0', 'identity'):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING=header)
+            self.assertFalse(response.has_header('Content-Encoding'), header)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br;q=1, *;q=0.5')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_cached_content_is_decompressed_for_other_clients(self):
+        gzipped = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, gzip.decompress(gzipped.content))
+        self.assertEqual(response.json()['id'], self.trek.pk)
+
+    def test_small_content_is_not_compressed(self):
+        self.assertEqual(compress_content(b'{}'), (b'{}', None))
+        content, encoding = compress_content(b'{"name": "trek"}' * 100)
+        self.assertEqual(encoding, 'gzip')
+        self.assertEqual(gzip.decompress(content), b'{"name": "trek"}' * 100)
+
+
+class PublishedIndexesTestCase(TestCase):
+    """ Partial indexes of published objects are used by API filters """
+    @classmethod
+    def setUpTestData(cls):
+        tourism_factory.TouristicContentFactory.create_batch(20, published=False, published_en=False, published_fr=False)
+        tourism_factory.TouristicContentFactory(published=True, published_en=True, published_fr=False)
+        trek_factory.TrekFactory.create_batch(10, published=False, published_en=False, published_fr=False)
+        trek_factory.TrekFactory(published=True, published_en=False, published_fr=True)
+
+    def get_plan(self, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {queryset.model._meta.db_table}')
+            # Tables are too small for indexes to be preferred otherwise
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_touristic_content_language_filter_uses_index(self):
+        queryset = tourism_models.TouristicContent.objects.existing() \
+            .filter(get_published_filter_expression(tourism_models.TouristicContent, 'en'))
+        self.assertIn('tourism_touristiccontent_published_en_idx', self.get_plan(queryset))
+        self.assertEqual(queryset.count(), 1)
+
+    def test_touristic_content_all_languages_filter_uses_indexes(self):
+        queryset = tourism_models.TouristicContent.objects.existing() \
+            .filter(get_published_filter_expression(tourism_models.TouristicContent, 'all'))
+        plan = self.get_plan(queryset)
+        self.assertIn('tourism_touristiccontent_published_en_idx', plan)
+        self.assertIn('tourism_touristiccontent_published_fr_idx', plan)
+
+    def test_trek_language_filter_uses_index(self):
+        queryset = trek_models.Trek.objects.existing() \
+            .filter(get_published_filter_expression(trek_models.Trek, 'fr'))
+        self.assertIn('trekking_trek_published_fr_idx', self.get_plan(queryset))
+        self.assertEqual(queryset.count(), 1)
+
+    def test_deleted_objects_are_excluded_with_publication(self):
+        self.assertEqual(
+            get_published_filter_expression(tourism_models.TouristicContent, 'fr'),
+            Q(published_fr=True, deleted=False)
+        )
+        self.assertEqual(get_published_filter_expression(trek_models.Trek, 'fr'), Q(published_fr=True))
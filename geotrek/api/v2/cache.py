@@ -1,16 +1,20 @@
-from rest_framework_extensions.cache.mixins import RetrieveCacheResponseMixin as BaseRetrieveCacheResponseMixin, \
-    ListCacheResponseMixin as BaseListCacheResponseMixin
+from django.conf import settings
+from rest_framework_extensions.cache.mixins import BaseCacheResponseMixin
 
 from geotrek.api.v2.decorators import cache_response_detail, cache_response_list
 
 
-class RetrieveCacheResponseMixin(BaseRetrieveCacheResponseMixin):
+class RetrieveCacheResponseMixin(BaseCacheResponseMixin):
     @cache_response_detail()
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
 
-class ListCacheResponseMixin(BaseListCacheResponseMixin):
+class ListCacheResponseMixin(BaseCacheResponseMixin):
+    @property
+    def list_cache_max_entry_size(self):
+        return settings.API_V2_LIST_CACHE_MAX_ENTRY_SIZE
+
     @cache_response_list()
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -1,31 +1,220 @@
+import gzip
+
+from django.core.cache import caches
+from django.http.response import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers, quote_etag
+from django.utils.connection import ConnectionProxy
+from django.utils.http import http_date
 from rest_framework_extensions.cache.decorators import CacheResponse as BaseCacheResponse
+from rest_framework_extensions.settings import extensions_api_settings
+
+
+# Smaller contents are cached uncompressed, as GZipMiddleware does
+COMPRESS_MIN_SIZE = 200
+
+
+def accepts_encoding(header, encoding):
+    """ whether Accept-Encoding header accepts encoding, with a non-zero quality value (its own or the one of *) """
+    qualities = {}
+    for coding in header.split(','):
+        name, *params = coding.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    return qualities.get(encoding, qualities.get('*', 0.0)) > 0
+
+
+def compress_content(content):
+    """ return content as stored in cache and its encoding: gzipped once, unless it is not worth it """
+    if len(content) < COMPRESS_MIN_SIZE:
+        return content, None
+    compressed = gzip.compress(content, mtime=0)
+    if len(compressed) >= len(content):
+        return content, None
+    return compressed, 'gzip'
+
+
+class APIV2CacheResponse(BaseCacheResponse):
+    """ Cache rendered responses, and answer conditional requests (If-None-Match / If-Modified-Since)
+    with ETag built on cache key, before any serialization.
+    Contents are cached gzipped, and served as is to clients accepting it """
+    def __init__(self, max_entry_size=None, last_modified_func=None, **kwargs):
+        super().__init__(**kwargs)
+        # backend of request thread, instead of the one of the thread importing views
+        self.cache = ConnectionProxy(caches, kwargs.get('cache') or extensions_api_settings.DEFAULT_USE_CACHE)
+        self.max_entry_size = max_entry_size
+        self.last_modified_func = last_modified_func
+
+    def process_cache_response(self,
+                               view_instance,
+                               view_method,
+                               request,
+                               args,
+                               kwargs):
+        key = self.calculate_key(
+            view_instance=view_instance,
+            view_method=view_method,
+            request=request,
+            args=args,
+            kwargs=kwargs
+        )
+        timeout = self.calculate_timeout(view_instance=view_instance)
+
+        # Cache key changes with object / models versions, so it is a strong validator
+        validators = HttpResponse()
+        validators['ETag'] = quote_etag(key)
+        last_modified = self.calculate_last_modified(
+            view_instance=view_instance,
+            view_method=view_method,
+            request=request,
+            args=args,
+            kwargs=kwargs
+        )
+        if last_modified:
+            validators['Last-Modified'] = http_date(last_modified.timestamp())
+        not_modified = get_conditional_response(
+            request,
+            etag=validators['ETag'],
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+            response=validators
+        )
+        if not_modified is not validators:
+            # cached content may be served gzipped to other clients
+            patch_vary_headers(not_modified, ('Accept-Encoding', ))
+            return not_modified
+
+        response_triple = self.cache.get(key)
+        if not response_triple:
+            # render response to create and cache the content byte string
+            response = view_method(view_instance, request, *args, **kwargs)
+            response = view_instance.finalize_response(request, response, *args, **kwargs)
+            # don't fill cache with too big entries
+            max_entry_size = self.calculate_max_entry_size(view_instance=view_instance)
+            if response.streaming:
+                # streamed responses are not rendered in memory, they are cached once fully sent
+                response.streaming_content = self.cache_streaming_content(
+                    response.streaming_content, response.status_code, {k: (k, v) for k, v in response.items()},
+                    key, timeout, max_entry_size
+                )
+                patch_vary_headers(response, ('Accept-Encoding', ))
+            else:
+                response.render()
+
+                too_big = max_entry_size is not None and len(response.content) > max_entry_size
+                if (not response.status_code >= 400 or self.cache_errors) and not too_big:
+                    headers = {k: (k, v) for k, v in response.items()}
+                    content, encoding = compress_content(response.content)
+                    response_triple = (
+                        content,
+                        response.status_code,
+                        headers,
+                        encoding
+                    )
+                    self.cache.set(key, response_triple, timeout)
+                    if encoding:
+                        if self.accepts_encoding(request, encoding):
+                            response = self.build_response(request, *response_triple)
+                        else:
+                            patch_vary_headers(response, ('Accept-Encoding', ))
+        else:
+            response = self.build_response(request, *response_triple)
+        if 200 <= response.status_code < 300:
+            for header in ('ETag', 'Last-Modified'):
+                if header in validators:
+                    response[header] = validators[header]
+            if response.has_header('Content-Encoding'):
+                # content differs from identity one byte per byte
+                response['ETag'] = f"W/{response['ETag']}"
+        if not hasattr(response, '_closable_objects'):
+            response._closable_objects = []
+
+        return response
+
+    def cache_streaming_content(self, streaming_content, status, headers, key, timeout, max_entry_size):
+        """ yield streamed content, and cache it once complete unless it exceeds max_entry_size """
+        chunks, size = [], 0
+        for chunk in streaming_content:
+            yield chunk
+            if chunks is None:
+                continue
+            size += len(chunk)
+            if max_entry_size is not None and size > max_entry_size:
+                chunks = None
+            else:
+                chunks.append(chunk)
+        if chunks is not None and (status < 400 or self.cache_errors):
+            content, encoding = compress_content(b''.join(chunks))
+            self.cache.set(key, (content, status, headers, encoding), timeout)
+
+    def accepts_encoding(self, request, encoding):
+        return accepts_encoding(request.headers.get('Accept-Encoding', ''), encoding)
+
+    def build_response(self, request, content, status, headers, encoding=None):
+        """ build smaller Django HttpResponse from cached entry (entries cached before compression have no encoding) """
+        accepted = encoding and self.accepts_encoding(request, encoding)
+        if encoding and not accepted:
+            content = gzip.decompress(content)
+        response = HttpResponse(content=content, status=status)
+        for k, v in headers.values():
+            response[k] = v
+        if encoding:
+            patch_vary_headers(response, ('Accept-Encoding', ))
+        if accepted:
+            response['Content-Encoding'] = encoding
+        return response
+
+    def calculate_last_modified(self, view_instance, **kwargs):
+        if self.last_modified_func is None:
+            return None
+        if isinstance(self.last_modified_func, str):
+            return getattr(view_instance, self.last_modified_func)(view_instance=view_instance, **kwargs)
+        return self.last_modified_func(view_instance=view_instance, **kwargs)
+
+    def calculate_max_entry_size(self, view_instance):
+        if isinstance(self.max_entry_size, str):
+            return getattr(view_instance, self.max_entry_size)
+        return self.max_entry_size
 
 
-class APIV2CacheResponseDetail(BaseCacheResponse):
+class APIV2CacheResponseDetail(APIV2CacheResponse):
     def __init__(self,
                  timeout='object_cache_timeout',
                  key_func='object_cache_key_func',
                  cache='api_v2',
-                 cache_errors=None):
+                 cache_errors=None,
+                 last_modified_func='object_last_modified_func'):
         super().__init__(timeout=timeout,
                          key_func=key_func,
                          cache=cache,
-                         cache_errors=cache_errors)
+                         cache_errors=cache_errors,
+                         last_modified_func=last_modified_func)
 
 
 cache_response_detail = APIV2CacheResponseDetail
 
 
-class APIV2CacheResponseList(BaseCacheResponse):
+class APIV2CacheResponseList(APIV2CacheResponse):
+    """ Lists have no Last-Modified date: model versions read again from database (once expired)
+    may be older than a deletion, only ETag is a reliable validator """
     def __init__(self,
                  timeout='list_cache_timeout',
                  key_func='list_cache_key_func',
                  cache='api_v2',
-                 cache_errors=None):
+                 cache_errors=None,
+                 max_entry_size='list_cache_max_entry_size',
+                 last_modified_func=None):
         super().__init__(timeout=timeout,
                          key_func=key_func,
                          cache=cache,
-                         cache_errors=cache_errors)
+                         cache_errors=cache_errors,
+                         max_entry_size=max_entry_size,
+                         last_modified_func=last_modified_func)
 
 
 cache_response_list = APIV2CacheResponseList
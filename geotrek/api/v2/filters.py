@@ -6,7 +6,7 @@ import coreschema
 from coreapi.document import Field
 from django.conf import settings
 from django.contrib.gis.db.models import Collect
-from django.db.models import Exists, OuterRef, Model
+from django.db.models import F, Model
 from django.db.models.query_utils import Q
 from django.utils.translation import gettext_lazy as _
 from django_filters import ModelMultipleChoiceFilter
@@ -15,6 +15,7 @@ from django_filters.widgets import CSVWidget
 from rest_framework.filters import BaseFilterBackend
 from rest_framework_gis.filters import DistanceToPointFilter, InBBOXFilter
 
+from geotrek.common.proximity import filter_near, get_near_property, is_indexed
 from geotrek.flatpages.models import MenuItem, FlatPage
 from modeltranslation.utils import build_localized_fieldname
 
@@ -22,9 +23,12 @@ from geotrek.tourism.models import TouristicEventOrganizer, TouristicContent, To
     TouristicEventPlace, TouristicEventType
 from geotrek.trekking.models import ServiceType, Trek, POI
 from geotrek.zoning.models import City, District
+from geotrek.zoning.utils import filter_intersecting
 
 if 'geotrek.outdoor' in settings.INSTALLED_APPS:
     from geotrek.outdoor.models import Course, Site
+if 'geotrek.sensitivity' in settings.INSTALLED_APPS:
+    from geotrek.sensitivity.models import Species
 
 
 def get_published_filter_expression(model: Type[Model], language: Optional[str] = None):
@@ -32,11 +36,14 @@ def get_published_filter_expression(model: Type[Model], language: Optional[str]
     this function returns a query expression to filter on.
 
     `language` parameter is expected to be one of the modeltranslation's defined language or "all".
+    Deleted objects are excluded by each language predicate when their model has a `deleted` field
+    in the same table, to match partial indexes of published objects (see common/sql/published_indexes.sql).
     """
     associated_published_fields = [f.name for f in model._meta.get_fields() if f.name.startswith('published')]
+    existing = {'deleted': False} if 'deleted' in [f.name for f in model._meta.local_concrete_fields] else {}
     if len(associated_published_fields) == 1:
         # The model's published field is not translated
-        return Q(published=True)
+        return Q(published=True, **existing)
     elif len(associated_published_fields) > 1:
         # The published field is translated
         if not language or language == 'all':
@@ -45,12 +52,12 @@ def get_published_filter_expression(model: Type[Model], language: Optional[str]
             for lang in settings.MODELTRANSLATION_LANGUAGES:
                 field_name = build_localized_fieldname('published', lang)
                 if field_name in associated_published_fields:
-                    q |= Q(**{field_name: True})
+                    q |= Q(**{field_name: True}, **existing)
             return q
         else:
             # one language is specified
             field_name = build_localized_fieldname('published', language)
-            return Q(**{field_name: True})
+            return Q(**{field_name: True}, **existing)
 
 
 class GeotrekQueryParamsFilter(BaseFilterBackend):
@@ -95,7 +102,17 @@ class GeotrekQueryParamsDimensionFilter(BaseFilterBackend):
             Field(
                 name='format', required=False, location='query', schema=coreschema.String(
                     title=_("Format"),
-                    description=_("Set output format (json / geojson). Default: json. Example: geojson.")
+                    description=_("Set output format (json / geojson / fgb / msgpack). Default: json. Example: geojson.")
+                )
+            ), Field(
+                name='simplify', required=False, location='query', schema=coreschema.Number(
+                    title=_("Simplify"),
+                    description=_("Simplify geometries with this tolerance, in meters. Example: 50.")
+                )
+            ), Field(
+                name='zoom', required=False, location='query', schema=coreschema.Integer(
+                    title=_("Zoom"),
+                    description=_("Simplify geometries for display at this map zoom level. Example: 9.")
                 )
             ),
         )
@@ -171,29 +188,29 @@ class GeotrekSensitiveAreaFilter(BaseFilterBackend):
         qs = queryset
         practices = request.GET.get('practices')
         if practices:
-            qs = qs.filter(species__practices__id__in=practices.split(','))
+            # Filter species in subquery, so that joined practices don't duplicate areas
+            qs = qs.filter(species__in=Species.objects.filter(practices__id__in=practices.split(',')))
         structures = request.GET.get('structures')
         if structures:
             qs = qs.filter(structure__in=structures.split(','))
         period = request.GET.get('period')
         if not period:
-            qs = qs.filter(**{'species__period{:02}'.format(date.today().month): True})
+            qs = self.filter_period(qs, [date.today().month])
         elif period == 'any':
-            q = Q()
-            for m in range(1, 13):
-                q |= Q(**{'species__period{:02}'.format(m): True})
-            qs = qs.filter(q)
+            qs = qs.filter(period_mask__gt=0)
         elif period == 'ignore':
             pass
         else:
-            q = Q()
-            for m in [int(m) for m in period.split(',')]:
-                q |= Q(**{'species__period{:02}'.format(m): True})
-            qs = qs.filter(q)
+            qs = self.filter_period(qs, [int(m) for m in period.split(',')])
         trek_id = request.GET.get('trek')
         if trek_id:
             qs = _filter_near(base_model=qs.model, queryset=qs, target_model=Trek, target_pk=trek_id)
-        return qs.distinct()
+        return qs
+
+    def filter_period(self, qs, months):
+        """ keep areas occupied during any of given months, testing species period bitmask copied on areas """
+        mask = Species.get_period_mask(months)
+        return qs.alias(period_match=F('period_mask').bitand(mask)).filter(period_match__gt=0)
 
     def get_schema_fields(self, view):
         return (
@@ -279,24 +296,24 @@ def _filter_near(base_model, target_model, target_pk, queryset):
     """Filter the queryset of base_model objects by keeping only the objects near the target.
 
     The function uses the model properties to achieve the filtering. For instance it would find and use the `target_trek.pois` property to filter
-    q POI queryset near a target trek.
+    q POI queryset near a target trek. Their results are read from proximity index when it is maintained for these models.
 
     Return an empty queryset if the target does not exist.
     """
-
-    def pluralize(name):
-        return name + 's'
-
     try:
         target = target_model.objects.get(pk=target_pk)
     except target_model.DoesNotExist:
         return queryset.none()
-    prop_name = getattr(base_model, "related_near_objects_property_name", None) or pluralize(base_model._meta.model_name)
-    prop = getattr(target_model, prop_name)
-    return prop.fget(target, queryset)
+    if is_indexed(target_model, base_model):
+        return filter_near(queryset, target)
+    return get_near_property(target_model, base_model).fget(target, queryset)
 
 
 class NearbyContentFilter(BaseFilterBackend):
+    # changes on these models modify filtered results
+    related_models = (TouristicEvent, TouristicContent, Trek)
+    if 'geotrek.outdoor' in settings.INSTALLED_APPS:
+        related_models += (Site, Course)
 
     def filter_queryset(self, request, qs, view):
         near_touristicevent = request.GET.get('near_touristicevent')
@@ -374,10 +391,10 @@ class GeotrekZoningAndThemeFilter(BaseFilterBackend):
         qs = queryset
         cities = request.GET.get('cities')
         if cities:
-            qs = qs.filter(Exists(City.objects.filter(code__in=cities.split(","), geom__intersects=OuterRef('geom'))))
+            qs = filter_intersecting(qs, City, pk__in=cities.split(","))
         districts = request.GET.get('districts')
         if districts:
-            qs = qs.filter(Exists(District.objects.filter(pk__in=districts.split(","), geom__intersects=OuterRef('geom'))))
+            qs = filter_intersecting(qs, District, pk__in=districts.split(","))
         structures = request.GET.get('structures')
         if structures:
             qs = qs.filter(structure__in=structures.split(','))
@@ -706,10 +723,10 @@ class GeotrekTrekQueryParamsFilter(BaseFilterBackend):
             qs = qs.filter(ascent__lte=ascent_max)
         cities = request.GET.get('cities')
         if cities:
-            qs = qs.filter(Exists(City.objects.filter(code__in=cities.split(","), geom__intersects=OuterRef('geom'))))
+            qs = filter_intersecting(qs, City, pk__in=cities.split(","))
         districts = request.GET.get('districts')
         if districts:
-            qs = qs.filter(Exists(District.objects.filter(pk__in=districts.split(","), geom__intersects=OuterRef('geom'))))
+            qs = filter_intersecting(qs, District, pk__in=districts.split(","))
         structures = request.GET.get('structures')
         if structures:
             qs = qs.filter(structure__in=structures.split(','))
@@ -1,3 +1,4 @@
+from django.db import connection
 from django.db.models import Func
 from django.db.models.fields import FloatField
 
@@ -8,3 +9,34 @@ class Length3D(Func):
     """
     function = 'ST_3DLENGTH'
     output_field = FloatField()
+
+
+TILE_SQL = """
+    SELECT ST_AsMVT(tile, %s, %s, 'geom') FROM (
+        SELECT {columns},
+               ST_AsMVTGeom(ST_Transform(objects.tile_geom, 3857), ST_MakeEnvelope(%s, %s, %s, %s, 3857), %s, %s, true) AS geom
+        FROM ({objects}) AS objects
+    ) AS tile
+    WHERE tile.geom IS NOT NULL
+"""
+
+
+def as_mvt(queryset, geometry, properties, layer, bounds, extent=4096, buffer=64):
+    """
+    ST_AsMVT postgis function: return vector tile (bytes) of queryset objects within bounds (EPSG:3857)
+    :param geometry: expression of objects geometry
+    :param properties: dict of features properties expressions, by name
+    """
+    objects = queryset.order_by().values(
+        tile_geom=geometry,
+        **{f'tile_{name}': expression for name, expression in properties.items()}
+    )
+    sql, params = objects.query.sql_with_params()
+    quote = connection.ops.quote_name
+    columns = ', '.join(f'objects.{quote(f"tile_{name}")} AS {quote(name)}' for name in properties)
+    with connection.cursor() as cursor:
+        # objects sql may contain braces, don't format it
+        cursor.execute(TILE_SQL.format(columns=columns, objects='{objects}').replace('{objects}', sql),
+                       [layer, extent, *bounds, extent, buffer, *params])
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] else b''
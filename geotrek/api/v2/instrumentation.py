@@ -0,0 +1,173 @@
+"""
+Instrumentation of APIv2 requests, enabled by API_V2_SERVER_TIMING setting.
+
+Each request records its SQL queries count and duration, lookups in cache aliases with hits and misses,
+serialization and rendering durations. They are returned in a `Server-Timing` header (shown by browsers
+developer tools) and logged by `geotrek.api.v2.timing` logger.
+Serialization duration includes queries run lazily by serializers. Streamed lists are serialized after
+the view returns, their metrics only cover queryset building.
+
+Viewsets may declare a `query_budget` (maximum number of SQL queries of a request):
+exceeding it is logged as a warning, and raises QueryBudgetExceeded while running tests.
+"""
+import logging
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+logger = logging.getLogger('geotrek.api.v2.timing')
+
+CACHE_ALIASES = ('api_v2', 'fat', 'default')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_duration = 0
+        self.cache_hits = defaultdict(int)
+        self.cache_misses = defaultdict(int)
+        self.durations = defaultdict(float)
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_duration += time.perf_counter() - start
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] += time.perf_counter() - start
+
+    def timed(self, name, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def count_cache_lookups(self, alias):
+        """
+        Count hits and misses of lookups in cache alias, return a function restoring it.
+        Backends are per thread, so only lookups of current request are counted.
+        """
+        cache = caches[alias]
+        get, get_many = cache.get, cache.get_many
+        missing = object()
+        # default get_many is built on get, count its lookups once
+        nested = []
+
+        def counted_get(key, default=None, version=None):
+            value = get(key, missing, version=version)
+            if not nested:
+                if value is missing:
+                    self.cache_misses[alias] += 1
+                else:
+                    self.cache_hits[alias] += 1
+            return default if value is missing else value
+
+        def counted_get_many(keys, version=None):
+            keys = list(keys)
+            nested.append(True)
+            try:
+                values = get_many(keys, version=version)
+            finally:
+                nested.pop()
+            self.cache_hits[alias] += len(values)
+            self.cache_misses[alias] += len(keys) - len(values)
+            return values
+
+        cache.get, cache.get_many = counted_get, counted_get_many
+
+        def restore():
+            del cache.get, cache.get_many
+        return restore
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.execute_wrapper))
+            for alias in CACHE_ALIASES:
+                if alias in settings.CACHES:
+                    stack.callback(self.count_cache_lookups(alias))
+            with self.timer('total'):
+                yield self
+
+    def get_server_timing(self):
+        """ return metrics as Server-Timing header value, durations in milliseconds """
+        metrics = [f'sql;dur={self.sql_duration * 1000:.1f};desc="queries={self.sql_count}"']
+        for alias in CACHE_ALIASES:
+            if alias in self.cache_hits or alias in self.cache_misses:
+                metrics.append(f'cache-{alias};desc="hits={self.cache_hits[alias]} misses={self.cache_misses[alias]}"')
+        metrics += [f'{name};dur={duration * 1000:.1f}' for name, duration in self.durations.items()]
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        return {
+            'sql_count': self.sql_count,
+            'sql_duration': round(self.sql_duration * 1000, 1),
+            'cache_hits': dict(self.cache_hits),
+            'cache_misses': dict(self.cache_misses),
+            **{f'{name}_duration': round(duration * 1000, 1) for name, duration in self.durations.items()},
+        }
+
+
+class ServerTimingMixin:
+    """ Record metrics of viewset requests, return them as Server-Timing header and log them """
+    query_budget = None
+    metrics = None
+
+    def is_instrumented(self):
+        return settings.API_V2_SERVER_TIMING or (settings.TEST and self.query_budget is not None)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_instrumented():
+            return super().dispatch(request, *args, **kwargs)
+        self.metrics = RequestMetrics()
+        with self.metrics.record():
+            response = super().dispatch(request, *args, **kwargs)
+            # Render here instead of after view returns, to measure rendering
+            if getattr(response, 'is_rendered', True) is False:
+                response.render()
+        response['Server-Timing'] = self.metrics.get_server_timing()
+        metrics = self.metrics.as_dict()
+        logger.info("%s %s %s", request.method, request.get_full_path(), metrics,
+                    extra={'metrics': metrics, 'view': self.__class__.__name__})
+        self.check_query_budget(request)
+        return response
+
+    def check_query_budget(self, request):
+        if self.query_budget is None or self.metrics.sql_count <= self.query_budget:
+            return
+        message = (f"{request.method} {request.get_full_path()} ran {self.metrics.sql_count} SQL queries, "
+                   f"{self.__class__.__name__} query budget is {self.query_budget}")
+        logger.warning(message)
+        if settings.TEST:
+            raise QueryBudgetExceeded(message)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.metrics:
+            serializer.to_representation = self.metrics.timed('serialize', serializer.to_representation)
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.metrics and hasattr(response, 'render'):
+            response.render = self.metrics.timed('render', response.render)
+        return response
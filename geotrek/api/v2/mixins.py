@@ -1,19 +1,27 @@
 from django.conf import settings
-from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from modeltranslation.utils import build_localized_fieldname
 
-from geotrek.common import models as common_models
+from geotrek.api.v2.utils import TopoguideResolver
+from geotrek.zoning.utils import ZoningResolver
 
 
 class PDFSerializerMixin:
+    """
+    Serialize PDF URLs, checking Topoguide attachments of the whole list at once
+    when only external PDF are public (see GeotrekViewSet.get_serializer)
+    """
+
+    def get_topoguide_resolver(self, obj):
+        if 'topoguides' not in self.context:
+            self.context['topoguides'] = TopoguideResolver([obj])
+        return self.context['topoguides']
 
     def _get_pdf_url_lang(self, obj, lang, portal=None):
         namespace = self.Meta.model._meta.app_label
         modelname = self.Meta.model._meta.object_name.lower()
         if settings.ONLY_EXTERNAL_PUBLIC_PDF:
-            file_type = get_object_or_404(common_models.FileType, type="Topoguide")
-            if not common_models.Attachment.objects.attachments_for_object_only_type(obj, file_type).exists():
+            if not self.get_topoguide_resolver(obj).has_topoguide(obj):
                 return None
         urlname = '{}:{}_{}printable'.format(namespace, modelname, 'booklet_' if settings.USE_BOOKLET_PDF else '')
         url = reverse(urlname, kwargs={'lang': lang, 'pk': obj.pk, 'slug': obj.slug})
@@ -68,3 +76,27 @@ class PublishedRelatedObjectsSerializerMixin:
                 if related_object.published:
                     value = getattr(related_object, field)
         return value
+
+
+class ZoningSerializerMixin:
+    """
+    Serialize cities and districts with zonings resolved for the whole list (see GeotrekViewSet.get_serializer),
+    falling back on object zoning properties
+    """
+
+    def get_zoning_resolver(self, obj):
+        return self.context.get('zoning') or ZoningResolver([obj])
+
+    def get_cities(self, obj):
+        zoning = self.context.get('zoning')
+        cities = zoning.published_cities(obj) if zoning else obj.published_cities
+        return [city.code for city in cities]
+
+    def get_districts(self, obj):
+        zoning = self.context.get('zoning')
+        districts = zoning.published_districts(obj) if zoning else obj.published_districts
+        return [district.pk for district in districts]
+
+    def get_departure_city_code(self, obj, get_geom):
+        city = self.get_zoning_resolver(obj).departure_city(obj, get_geom)
+        return city.code if city else None
@@ -1,9 +1,25 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
 from collections import OrderedDict
 
+import coreschema
+from coreapi.document import Field
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
 from django.core.paginator import Paginator
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
 from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from modeltranslation import utils as translation_utils
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from geotrek.api.v2.renderers import GEOJSON_FORMATS, FlatGeobufRenderer
+from geotrek.common.utils.translation import get_translated_fields
 
 
 class FasterPaginator(Paginator):
@@ -19,20 +35,156 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 1000
     django_paginator_class = FasterPaginator
+    cursor_ordering_query_param = 'cursor_ordering'
+    cursor_query_param = 'cursor'
+    cursor_orderings = ('date_update', 'name')
+    invalid_cursor_message = _('Invalid cursor')
 
     def get_paginated_response(self, data):
-        if self.request.query_params.get('format', 'json') == 'geojson':
+        output_format = self.request.query_params.get('format', 'json')
+        if output_format in GEOJSON_FORMATS:
             return Response(OrderedDict([
                 ('type', 'FeatureCollection'),
-                ('count', self.page.paginator.count),
+                ('count', self.get_count()),
                 ('next', self.get_next_link()),
                 ('previous', self.get_previous_link()),
                 ('features', data['features'])
-            ]))
+            ]), headers=self.get_pagination_headers() if output_format == FlatGeobufRenderer.format else None)
         else:
-            return super().get_paginated_response(data)
+            return Response(OrderedDict([
+                ('count', self.get_count()),
+                ('next', self.get_next_link()),
+                ('previous', self.get_previous_link()),
+                ('results', data)
+            ]))
+
+    def get_pagination_headers(self):
+        """ Count and links as headers, for formats which can only contain features (FlatGeobuf) """
+        links = [f'<{url}>; rel="{rel}"' for rel, url in (('next', self.get_next_link()), ('prev', self.get_previous_link()))
+                 if url]
+        headers = {'Link': ', '.join(links)} if links else {}
+        count = self.get_count()
+        if count is not None:
+            headers['X-Total-Count'] = str(count)
+        return headers
 
     def paginate_queryset(self, queryset, request, view=None):
         if 'no_page' in request.query_params:
             return None
+        self.cursor_ordering = request.query_params.get(self.cursor_ordering_query_param)
+        if self.cursor_ordering:
+            return self.paginate_queryset_by_cursor(queryset, request)
         return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self):
+        """ No count in cursor mode, it would require a SQL COUNT on each page """
+        if self.cursor_ordering:
+            return None
+        return self.page.paginator.count
+
+    def get_next_link(self):
+        if self.cursor_ordering:
+            if not self.has_next:
+                return None
+            url = self.request.build_absolute_uri()
+            return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_position))
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        """ Cursor mode only goes forward """
+        if self.cursor_ordering:
+            return None
+        return super().get_previous_link()
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        """
+        Keyset pagination: objects are ordered by (cursor_ordering, pk), and next page starts after
+        last object of current page. Neither OFFSET nor COUNT is used.
+        """
+        if self.cursor_ordering not in self.cursor_orderings:
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            queryset.model._meta.get_field(self.cursor_ordering)
+        except FieldDoesNotExist:
+            raise NotFound(self.invalid_cursor_message)
+        self.request = request
+        page_size = self.get_page_size(request)
+        field = self.get_cursor_field(queryset.model, request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            if value is None:
+                # null values are at the end, ordered by pk
+                queryset = queryset.filter(**{f'{field}__isnull': True, 'pk__gt': pk})
+            else:
+                queryset = queryset.filter(Q(**{f'{field}__gt': value})
+                                           | Q(**{field: value, 'pk__gt': pk})
+                                           | Q(**{f'{field}__isnull': True}))
+        queryset = queryset.order_by(F(field).asc(nulls_last=True), 'pk')
+
+        # fetch one more object to know if there is a next page
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        results = results[:page_size]
+        if results:
+            last = results[-1]
+            self.last_position = (getattr(last, field), last.pk)
+        return results
+
+    def get_cursor_field(self, model, request):
+        """ Translated fields are ordered by their column in requested language (or active one), without fallback,
+        so that order, filter of next pages and cursor values read the same column """
+        if self.cursor_ordering not in get_translated_fields(model):
+            return self.cursor_ordering
+        language = request.query_params.get('language')
+        if language not in settings.MODELTRANSLATION_LANGUAGES:
+            language = translation_utils.get_language()
+        return translation_utils.build_localized_fieldname(self.cursor_ordering, language)
+
+    def encode_cursor(self, position):
+        value, pk = position
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        return b64encode(json.dumps([value, pk]).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        """ return (value, pk) position given by cursor, as encoded by encode_cursor """
+        try:
+            position = json.loads(b64decode(cursor.encode('ascii')).decode('utf-8'))
+        except (ValueError, UnicodeError, BinasciiError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != 2:
+            raise NotFound(self.invalid_cursor_message)
+        value, pk = position
+        if type(pk) is not int or not (value is None or isinstance(value, str)):
+            raise NotFound(self.invalid_cursor_message)
+        if value is not None and self.cursor_ordering == 'date_update':
+            try:
+                value = parse_datetime(value)
+            except ValueError:
+                # well formatted but invalid date
+                value = None
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def get_schema_fields(self, view):
+        return super().get_schema_fields(view) + [
+            Field(
+                name=self.cursor_ordering_query_param, required=False, location='query',
+                schema=coreschema.Enum(
+                    self.cursor_orderings,
+                    title=_("Cursor ordering"),
+                    description=_("Use cursor pagination, ordered by this field then id. "
+                                  "Follow next link to get next page. No count is returned in this mode.")
+                )
+            ),
+            Field(
+                name=self.cursor_query_param, required=False, location='query',
+                schema=coreschema.String(
+                    title=_("Cursor"),
+                    description=_("Position of the page, as given in next link (cursor pagination only).")
+                )
+            ),
+        ]
@@ -1,9 +1,15 @@
+import json
+
+import fiona
+import msgpack
 import pygal
 from django.conf import settings
 from django.utils import translation
 from django.utils.translation import gettext as _
 from pygal.style import LightSolarizedStyle
-from rest_framework.renderers import BaseRenderer
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
 
 
 class SVGProfileRenderer(BaseRenderer):
@@ -51,3 +57,118 @@ class SVGProfileRenderer(BaseRenderer):
         translation.deactivate()
         line_chart.add('', [(int(v[0]), int(v[3])) for v in profile])
         return line_chart.render()
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Render serialized data as MessagePack, values not natively supported are encoded as in JSON.
+    """
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONEncoder().default)
+
+
+class FlatGeobufRenderer(BaseRenderer):
+    """
+    Render GeoJSON serialized data (feature or feature collection) as FlatGeobuf, with a spatial index.
+    Properties are typed after their values, nested values are encoded as JSON strings.
+    """
+    media_type = "application/flatgeobuf"
+    format = "fgb"
+    charset = None
+    render_style = 'binary'
+    property_types = ((bool, 'bool'), (int, 'int'), (float, 'float'), (str, 'str'))
+
+    def get_property_type(self, values):
+        types = {type(value) for value in values if value is not None}
+        if types == {int, float}:
+            return 'float'
+        for python_type, property_type in self.property_types:
+            if types == {python_type}:
+                return property_type
+        return 'str'
+
+    def get_geometry_type(self, geometries):
+        types = {geometry['type'] for geometry in geometries if geometry}
+        if len(types) != 1:
+            return 'Unknown'
+        geometry_type = types.pop()
+        coordinates = next(geometry for geometry in geometries if geometry).get('coordinates')
+        while coordinates and isinstance(coordinates[0], list):
+            coordinates = coordinates[0]
+        return f'3D {geometry_type}' if coordinates and len(coordinates) > 2 else geometry_type
+
+    def get_property_value(self, value, property_type):
+        if property_type == 'str' and value is not None and not isinstance(value, str):
+            return json.dumps(value, cls=JSONEncoder, ensure_ascii=False)
+        return value
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if data.get('type') not in ('Feature', 'FeatureCollection'):
+            # errors are not features
+            return JSONRenderer().render(data)
+        features = data['features'] if data['type'] == 'FeatureCollection' else [data]
+        rows = [dict(feature['properties'], **({'id': feature['id']} if 'id' in feature else {})) for feature in features]
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        properties = {name: self.get_property_type([row.get(name) for row in rows]) for name in names}
+        schema = {
+            'geometry': self.get_geometry_type([feature['geometry'] for feature in features]),
+            'properties': properties,
+        }
+        with fiona.MemoryFile(ext='.fgb') as memfile:
+            with memfile.open(driver='FlatGeobuf', schema=schema, crs=f'EPSG:{settings.API_SRID}') as collection:
+                collection.writerecords([fiona.Feature.from_dict(
+                    geometry=feature['geometry'],
+                    properties={name: self.get_property_value(row.get(name), property_type)
+                                for name, property_type in properties.items()},
+                ) for feature, row in zip(features, rows)])
+            return bytes(memfile.getbuffer())
+
+
+class MVTRenderer(BaseRenderer):
+    """
+    Render vector tiles, already encoded in database
+    """
+    media_type = "application/vnd.mapbox-vector-tile"
+    format = "mvt"
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        # errors
+        return JSONRenderer().render(data)
+
+
+# formats rendered from GeoJSON serialized data
+GEOJSON_FORMATS = ('geojson', FlatGeobufRenderer.format)
+
+
+def stream_json(chunks, geojson=False):
+    """
+    Render chunks of serialized objects as a JSON array, or a GeoJSON FeatureCollection,
+    yielding bytes as soon as each chunk is ready.
+    Output is the same as JSONRenderer (compact and unicode, without NaN nor Infinity in strict mode).
+    """
+    yield b'{"type":"FeatureCollection","features":[' if geojson else b'['
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        content = ','.join(json.dumps(item, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'),
+                                      allow_nan=not api_settings.STRICT_JSON)
+                           for item in chunk)
+        # same escaping as JSONRenderer, for javascript compatibility
+        content = content.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        yield (content if first else ',' + content).encode('utf-8')
+        first = False
+    yield b']}' if geojson else b']'
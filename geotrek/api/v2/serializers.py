@@ -6,27 +6,27 @@ from django.contrib.gis.db.models.functions import Transform
 from django.contrib.gis.geos import MultiLineString, Point, GEOSGeometry
 from django.db.models import F
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.utils.html import escape
 from django.utils.translation import get_language
 from django.utils.translation import gettext_lazy as _
 from drf_dynamic_fields import DynamicFieldsMixin
 from easy_thumbnails.alias import aliases
-from easy_thumbnails.engine import NoSourceGenerator
-from easy_thumbnails.exceptions import InvalidImageFormatError
 from easy_thumbnails.files import get_thumbnailer
 
 from geotrek.flatpages.models import MenuItem
 from modeltranslation.utils import build_localized_fieldname
-from PIL.Image import DecompressionBombError
 from rest_framework import serializers, serializers as rest_serializers
 from rest_framework.relations import HyperlinkedIdentityField
+from rest_framework.utils.serializer_helpers import BindingDict
 from rest_framework_gis import serializers as geo_serializers
 from rest_framework_gis.fields import GeometryField
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 
 from geotrek.api.v2.filters import get_published_filter_expression
 from geotrek.api.v2.functions import Length3D
-from geotrek.api.v2.mixins import PDFSerializerMixin, PublishedRelatedObjectsSerializerMixin
+from geotrek.api.v2.mixins import PDFSerializerMixin, PublishedRelatedObjectsSerializerMixin, ZoningSerializerMixin
+from geotrek.api.v2.renderers import GEOJSON_FORMATS
 from geotrek.api.v2.utils import build_url, get_translation_or_dict, is_published
 from geotrek.authent import models as authent_models
 from geotrek.common import models as common_models
@@ -40,6 +40,7 @@ if 'geotrek.tourism' in settings.INSTALLED_APPS:
     from geotrek.tourism import models as tourism_models
 if 'geotrek.trekking' in settings.INSTALLED_APPS:
     from geotrek.trekking import models as trekking_models
+    from geotrek.trekking.utils import TrekStepsResolver
 if 'geotrek.sensitivity' in settings.INSTALLED_APPS:
     from geotrek.sensitivity import models as sensitivity_models
 if 'geotrek.zoning' in settings.INSTALLED_APPS:
@@ -59,6 +60,24 @@ class BaseGeoJSONSerializer(geo_serializers.GeoFeatureModelSerializer):
     Mixin used to serialize geojson
     """
 
+    @property
+    def fields(self):
+        """Keep feature geometry and id, which `fields` and `omit` query params must not remove"""
+        fields = super().fields
+        for name in (self.Meta.geo_field, self.Meta.id_field):
+            if name and name not in fields:
+                # already bound to this serializer, added without binding it again
+                fields.fields[name] = self.feature_fields[name]
+        return fields
+
+    @cached_property
+    def feature_fields(self):
+        fields = BindingDict(self)
+        for name, field in self.get_fields().items():
+            if name in (self.Meta.geo_field, self.Meta.id_field):
+                fields[name] = field
+        return fields
+
     def to_representation(self, instance):
         """Round bbox coordinates"""
         feature = super().to_representation(instance)
@@ -82,7 +101,7 @@ def override_serializer(format_output, base_serializer_class):
     """
     Override Serializer switch output format and dimension data
     """
-    if format_output == 'geojson':
+    if format_output in GEOJSON_FORMATS:
         class GeneratedGeoSerializer(BaseGeoJSONSerializer,
                                      base_serializer_class):
             class Meta(BaseGeoJSONSerializer.Meta,
@@ -273,15 +292,17 @@ class AttachmentsSerializerMixin(serializers.ModelSerializer):
         return obj.attachment_file
 
     def get_thumbnail(self, obj):
-        thumbnailer = get_thumbnailer(self.get_attachment_file(obj))
         if hasattr(obj, 'is_image') and not obj.is_image:
             return ""
+        thumbnailer = get_thumbnailer(self.get_attachment_file(obj))
+        # Thumbnails are generated by generate_thumbnails task, pictures are never processed here
         try:
-            thumbnail = thumbnailer.get_thumbnail(aliases.get('apiv2'))
-        except (IOError, InvalidImageFormatError, DecompressionBombError, NoSourceGenerator):
+            thumbnail = thumbnailer.get_existing_thumbnail(aliases.get('apiv2'))
+        except IOError:
+            return ""
+        if thumbnail is None:
+            # Not generated yet, or picture can not be processed
             return ""
-        thumbnail.author = obj.author
-        thumbnail.legend = obj.legend
         return build_url(self, thumbnail.url)
 
     def get_url(self, obj):
@@ -468,7 +489,7 @@ if 'geotrek.tourism' in settings.INSTALLED_APPS:
             model = tourism_models.TouristicEventType
             fields = ('id', 'pictogram', 'type')
 
-    class TouristicModelSerializer(PDFSerializerMixin, DynamicFieldsMixin, TimeStampedSerializer):
+    class TouristicModelSerializer(PDFSerializerMixin, ZoningSerializerMixin, DynamicFieldsMixin, TimeStampedSerializer):
         geometry = geo_serializers.GeometryField(read_only=True, source="geom_transformed", precision=7)
         accessibility = serializers.SerializerMethodField()
         external_id = serializers.CharField(source='eid')
@@ -486,12 +507,6 @@ if 'geotrek.tourism' in settings.INSTALLED_APPS:
         def get_practical_info(self, obj):
             return get_translation_or_dict('practical_info', self, obj)
 
-        def get_cities(self, obj):
-            return [city.code for city in obj.published_cities]
-
-        def get_districts(self, obj):
-            return [district.pk for district in obj.published_districts]
-
         def get_name(self, obj):
             return get_translation_or_dict('name', self, obj)
 
@@ -527,8 +542,7 @@ if 'geotrek.tourism' in settings.INSTALLED_APPS:
             }
 
         def get_departure_city(self, obj):
-            city = zoning_models.City.objects.all().filter(geom__contains=obj.geom).first()
-            return city.code if city else None
+            return self.get_departure_city_code(obj, lambda o: o.geom)
 
     class TouristicEventSerializer(TouristicModelSerializer):
         organizers = serializers.SerializerMethodField()
@@ -660,7 +674,7 @@ if 'geotrek.core' in settings.INSTALLED_APPS:
 
 
 if 'geotrek.trekking' in settings.INSTALLED_APPS:
-    class TrekSerializer(PDFSerializerMixin, DynamicFieldsMixin, serializers.ModelSerializer):
+    class TrekSerializer(PDFSerializerMixin, ZoningSerializerMixin, DynamicFieldsMixin, serializers.ModelSerializer):
         url = HyperlinkedIdentityField(view_name='apiv2:trek-detail')
         published = serializers.SerializerMethodField()
         geometry = geo_serializers.GeometryField(read_only=True, source="geom3d_transformed", precision=7)
@@ -695,15 +709,15 @@ if 'geotrek.trekking' in settings.INSTALLED_APPS:
         advised_parking = serializers.SerializerMethodField()
         parking_location = serializers.SerializerMethodField()
         ratings_description = serializers.SerializerMethodField()
-        children = serializers.ReadOnlyField(source='children_id')
-        parents = serializers.ReadOnlyField(source='parents_id')
+        children = serializers.SerializerMethodField()
+        parents = serializers.SerializerMethodField()
         public_transport = serializers.SerializerMethodField()
         elevation_area_url = serializers.SerializerMethodField()
         elevation_svg_url = serializers.SerializerMethodField()
         altimetric_profile = serializers.SerializerMethodField('get_altimetric_profile_url')
         points_reference = serializers.SerializerMethodField()
-        previous = serializers.ReadOnlyField(source='previous_id')
-        next = serializers.ReadOnlyField(source='next_id')
+        previous = serializers.SerializerMethodField()
+        next = serializers.SerializerMethodField()
         cities = serializers.SerializerMethodField()
         districts = serializers.SerializerMethodField()
         departure_city = serializers.SerializerMethodField()
@@ -711,6 +725,24 @@ if 'geotrek.trekking' in settings.INSTALLED_APPS:
         web_links = WebLinkSerializer(many=True)
         view_points = HDViewPointSerializer(many=True)
 
+        def get_steps_resolver(self, obj):
+            """ Steps of the whole page are resolved at once (see TrekViewSet.get_serializer) """
+            if 'steps' not in self.context:
+                self.context['steps'] = TrekStepsResolver([obj])
+            return self.context['steps']
+
+        def get_children(self, obj):
+            return self.get_steps_resolver(obj).children_id(obj)
+
+        def get_parents(self, obj):
+            return self.get_steps_resolver(obj).parents_id(obj)
+
+        def get_previous(self, obj):
+            return self.get_steps_resolver(obj).previous_id(obj)
+
+        def get_next(self, obj):
+            return self.get_steps_resolver(obj).next_id(obj)
+
         def get_gear(self, obj):
             return get_translation_or_dict('gear', self, obj)
 
@@ -811,19 +843,11 @@ if 'geotrek.trekking' in settings.INSTALLED_APPS:
             geojson = obj.points_reference.transform(settings.API_SRID, clone=True).geojson
             return json.loads(geojson)
 
-        def get_cities(self, obj):
-            return [city.code for city in obj.published_cities]
-
-        def get_districts(self, obj):
-            return [district.pk for district in obj.published_districts]
-
         def get_labels(self, obj):
             return [label.pk for label in obj.published_labels]
 
         def get_departure_city(self, obj):
-            geom = self.get_first_point(obj.geom)
-            city = zoning_models.City.objects.all().filter(geom__contains=geom).first()
-            return city.code if city else None
+            return self.get_departure_city_code(obj, lambda o: self.get_first_point(o.geom))
 
         def _replace_image_paths_with_urls(self, data):
             def replace(html_content):
@@ -872,14 +896,16 @@ if 'geotrek.trekking' in settings.INSTALLED_APPS:
             return obj.count_children
 
         def get_steps(self, obj):
-            qs = obj.children \
+            qs = trekking_models.Trek.objects \
                 .select_related('topo_object', 'difficulty') \
                 .prefetch_related('topo_object__aggregations', 'themes', 'networks', 'attachments') \
                 .annotate(geom3d_transformed=Transform(F('geom_3d'), settings.API_SRID),
                           length_3d_m=Length3D('geom_3d'))
+            # Children of every tour of the page are read at once
+            children = self.get_steps_resolver(obj).get_children(obj, qs)
             FinalClass = override_serializer(self.context.get('request').GET.get('format'),
                                              TrekSerializer)
-            return FinalClass(qs, many=True, context=self.context).data
+            return FinalClass(children, many=True, context=self.context).data
 
         class Meta(TrekSerializer.Meta):
             fields = TrekSerializer.Meta.fields + ('count_children', 'steps')
@@ -1180,7 +1206,7 @@ if 'geotrek.outdoor' in settings.INSTALLED_APPS:
             model = outdoor_models.Practice
             fields = ('id', 'name')
 
-    class SiteSerializer(PDFSerializerMixin, DynamicFieldsMixin, PublishedRelatedObjectsSerializerMixin, serializers.ModelSerializer):
+    class SiteSerializer(PDFSerializerMixin, ZoningSerializerMixin, DynamicFieldsMixin, PublishedRelatedObjectsSerializerMixin, serializers.ModelSerializer):
         name = serializers.SerializerMethodField()
         accessibility = serializers.SerializerMethodField()
         ambiance = serializers.SerializerMethodField()
@@ -1227,12 +1253,6 @@ if 'geotrek.outdoor' in settings.INSTALLED_APPS:
         def get_period(self, obj):
             return get_translation_or_dict('period', self, obj)
 
-        def get_cities(self, obj):
-            return [city.code for city in obj.published_cities]
-
-        def get_districts(self, obj):
-            return [district.pk for district in obj.published_districts]
-
         def get_labels(self, obj):
             return [label.pk for label in obj.published_labels]
 
@@ -1272,7 +1292,7 @@ if 'geotrek.outdoor' in settings.INSTALLED_APPS:
                 'type', 'url', 'uuid', 'courses', 'courses_uuids', 'web_links', 'wind',
             )
 
-    class CourseSerializer(PDFSerializerMixin, DynamicFieldsMixin, PublishedRelatedObjectsSerializerMixin, serializers.ModelSerializer):
+    class CourseSerializer(PDFSerializerMixin, ZoningSerializerMixin, DynamicFieldsMixin, PublishedRelatedObjectsSerializerMixin, serializers.ModelSerializer):
         name = serializers.SerializerMethodField()
         advice = serializers.SerializerMethodField()
         description = serializers.SerializerMethodField()
@@ -1307,12 +1327,6 @@ if 'geotrek.outdoor' in settings.INSTALLED_APPS:
         def get_accessibility(self, obj):
             return get_translation_or_dict('accessibility', self, obj)
 
-        def get_cities(self, obj):
-            return [city.code for city in obj.published_cities]
-
-        def get_districts(self, obj):
-            return [district.pk for district in obj.published_districts]
-
         def get_equipment(self, obj):
             return get_translation_or_dict('equipment', self, obj)
 
@@ -1,5 +1,13 @@
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
 from modeltranslation.utils import build_localized_fieldname
+from rest_framework_extensions.settings import extensions_api_settings
+
+from geotrek.common.cache import get_object_versions
+from geotrek.common.models import Attachment, FileType
 
 
 def get_translation_or_dict(model_field_name, serializer, instance):
@@ -66,3 +74,49 @@ def is_published(instance, language=None):
             # one language is specified
             field_name = build_localized_fieldname('published', language)
             return getattr(instance, field_name)
+
+
+class TopoguideResolver:
+    """
+    Resolve which objects of a list (a page of API results) have a Topoguide attachment (their external PDF),
+    reading Topoguide file type once and attachments of the whole list with one query.
+    Results are cached in api_v2 cache by object version, like cached detail responses of objects
+    (attachments changes update their object).
+    """
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.resolved = {}
+
+    @cached_property
+    def file_type(self):
+        return get_object_or_404(FileType, type="Topoguide")
+
+    def get_cache_key(self, model, pk, version):
+        return f"topoguide:{model._meta.label_lower}:{pk}:{version}"
+
+    def resolve(self, model, pks):
+        cache = caches['api_v2']
+        keys = {pk: self.get_cache_key(model, pk, version)
+                for pk, version in get_object_versions(model, pks).items() if version is not None}
+        cached = cache.get_many(keys.values()) if keys else {}
+        missing = []
+        for pk in pks:
+            if keys.get(pk) in cached:
+                self.resolved[pk] = cached[keys[pk]]
+            else:
+                missing.append(pk)
+        if missing:
+            found = set(Attachment.objects.filter(
+                content_type=ContentType.objects.get_for_model(model), object_id__in=missing, filetype=self.file_type
+            ).values_list('object_id', flat=True))
+            self.resolved.update({pk: pk in found for pk in missing})
+            cache.set_many({keys[pk]: pk in found for pk in missing if pk in keys},
+                           extensions_api_settings.DEFAULT_CACHE_RESPONSE_TIMEOUT)
+
+    def has_topoguide(self, obj):
+        if obj.pk not in self.resolved:
+            model = type(obj)
+            pks = [item.pk for item in self.objects if type(item) is model and item.pk not in self.resolved]
+            self.resolve(model, pks if obj.pk in pks else [obj.pk])
+        return self.resolved[obj.pk]
@@ -23,7 +23,7 @@ class PathViewSet(api_viewsets.GeotrekGeometricViewset):
             .prefetch_related('usages', 'networks') \
             .annotate(
                 geom3d_transformed=Transform(
-                    F('geom_3d'),
+                    self.simplify_geometry(F('geom_3d')),
                     settings.API_SRID
                 ),
                 length_3d_m=Length3D('geom_3d')
@@ -6,11 +6,13 @@ from django.utils.translation import activate
 
 from geotrek.api.v2 import serializers as api_serializers, \
     filters as api_filters, viewsets as api_viewsets
+from geotrek.api.v2.cache import ListCacheResponseMixin
 from geotrek.common.models import Attachment, HDViewPoint
 from geotrek.outdoor import models as outdoor_models
+from geotrek.zoning.models import City, District
 
 
-class SiteViewSet(api_viewsets.GeotrekGeometricViewset):
+class SiteViewSet(ListCacheResponseMixin, api_viewsets.GeotrekGeometricViewset):
     filter_backends = api_viewsets.GeotrekGeometricViewset.filter_backends + (
         api_filters.GeotrekSiteFilter,
         api_filters.NearbyContentFilter,
@@ -18,11 +20,12 @@ class SiteViewSet(api_viewsets.GeotrekGeometricViewset):
         api_filters.GeotrekRatingsFilter
     )
     serializer_class = api_serializers.SiteSerializer
+    list_cache_related_models = (City, District) + api_filters.NearbyContentFilter.related_models
 
     def get_queryset(self):
         activate(self.request.GET.get('language'))
         return outdoor_models.Site.objects \
-            .annotate(geom_transformed=Transform(F('geom'), settings.API_SRID)) \
+            .annotate(geom_transformed=Transform(self.simplify_geometry(F('geom')), settings.API_SRID)) \
             .select_related('parent', 'practice', 'type') \
             .prefetch_related(Prefetch('attachments',
                                        queryset=Attachment.objects.select_related('license', 'filetype', 'filetype__structure')),
@@ -94,7 +97,7 @@ class CourseViewSet(api_viewsets.GeotrekGeometricViewset):
     def get_queryset(self):
         activate(self.request.GET.get('language'))
         return outdoor_models.Course.objects \
-            .annotate(geom_transformed=Transform(F('geom'), settings.API_SRID)) \
+            .annotate(geom_transformed=Transform(self.simplify_geometry(F('geom')), settings.API_SRID)) \
             .select_related('type') \
             .prefetch_related(Prefetch('attachments',
                                        queryset=Attachment.objects.select_related('license', 'filetype', 'filetype__structure')),
@@ -1,17 +1,21 @@
+from datetime import date
+
 from django.conf import settings
 from django.contrib.gis.db.models.functions import Transform
 from django.db.models import F, Case, When, Prefetch
 from django_filters.rest_framework.backends import DjangoFilterBackend
+from modeltranslation.utils import build_localized_fieldname
 
 from geotrek.common.models import Attachment
 from geotrek.api.v2 import serializers as api_serializers, \
     viewsets as api_viewsets
-from geotrek.common.functions import GeometryType, Buffer, Area
+from geotrek.api.v2.cache import ListCacheResponseMixin
+from geotrek.common.functions import GeometryType, Buffer
 from geotrek.sensitivity import models as sensitivity_models
 from ..filters import GeotrekQueryParamsFilter, GeotrekQueryParamsDimensionFilter, GeotrekInBBoxFilter, GeotrekSensitiveAreaFilter, NearbyContentFilter, UpdateOrCreateDateFilter
 
 
-class SensitiveAreaViewSet(api_viewsets.GeotrekGeometricViewset):
+class SensitiveAreaViewSet(api_viewsets.VectorTilesMixin, ListCacheResponseMixin, api_viewsets.GeotrekGeometricViewset):
     filter_backends = (
         DjangoFilterBackend,
         GeotrekQueryParamsFilter,
@@ -23,6 +27,15 @@ class SensitiveAreaViewSet(api_viewsets.GeotrekGeometricViewset):
     )
     bbox_filter_field = 'geom_transformed'
     bbox_filter_include_overlapping = True
+    list_cache_related_models = (sensitivity_models.Species, sensitivity_models.SportPractice, sensitivity_models.Rule) \
+        + NearbyContentFilter.related_models
+
+    def get_list_cache_key(self):
+        """ areas are filtered on current month when no period is given (lists and tiles) """
+        key = super().get_list_cache_key()
+        if not self.request.GET.get('period'):
+            key = f"{key}:month={date.today().month}"
+        return key
 
     def get_serializer_class(self):
         if 'bubble' in self.request.GET:
@@ -32,6 +45,19 @@ class SensitiveAreaViewSet(api_viewsets.GeotrekGeometricViewset):
         format_output = self.request.query_params.get('format', 'json')
         return api_serializers.override_serializer(format_output, base_serializer_class)
 
+    def get_tile_geometry(self):
+        """ points are displayed as circles of species radius """
+        return Case(
+            When(geom_type='POINT', then=Buffer(F('geom'), F('species__radius'), 4)),
+            default=F('geom')
+        )
+
+    def get_tile_properties(self):
+        return {
+            'id': F('pk'),
+            'name': F(f"species__{build_localized_fieldname('name', self.get_tile_language())}"),
+        }
+
     def get_queryset(self):
         queryset = (
             sensitivity_models.SensitiveArea.objects.existing()
@@ -46,16 +72,19 @@ class SensitiveAreaViewSet(api_viewsets.GeotrekGeometricViewset):
         )
         if 'bubble' in self.request.GET:
             queryset = queryset.annotate(geom_transformed=Transform(F('geom'), settings.API_SRID))
+        elif self.get_simplify_tolerance() is None:
+            # Points buffered by species radius and transformed by triggers
+            queryset = queryset.annotate(geom_transformed=F('geom_display'))
         else:
             queryset = queryset.annotate(geom_transformed=Case(
-                When(geom_type='POINT', then=Transform(Buffer(F('geom'), F('species__radius'), 4), settings.API_SRID)),
-                default=Transform(F('geom'), settings.API_SRID)
+                When(geom_type='POINT', then=Transform(self.simplify_geometry(Buffer(F('geom'), F('species__radius'), 4)), settings.API_SRID)),
+                default=Transform(self.simplify_geometry(F('geom')), settings.API_SRID)
             ))
         # Ensure smaller areas are at the end of the list, ie above bigger areas on the map
         # to ensure we can select every area in case of overlapping
         # Second sort key pk is required for reliable pagination
-        queryset = queryset.order_by(Area('geom_transformed').desc(), 'pk')
-        return queryset.defer('geom')
+        queryset = queryset.order_by(F('geom_display_area').desc(), 'pk')
+        return queryset.defer('geom', 'geom_buffered', 'geom_display')
 
 
 class SportPracticeViewSet(api_viewsets.GeotrekViewSet):
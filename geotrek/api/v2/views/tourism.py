@@ -9,9 +9,11 @@ from rest_framework.response import Response
 
 from geotrek.api.v2 import serializers as api_serializers, \
     filters as api_filters, viewsets as api_viewsets
+from geotrek.api.v2.cache import ListCacheResponseMixin
 from geotrek.api.v2.decorators import cache_response_detail
 from geotrek.common.models import Attachment
 from geotrek.tourism import models as tourism_models
+from geotrek.zoning.models import City, District
 
 
 class LabelAccessibilityViewSet(api_viewsets.GeotrekViewSet):
@@ -34,24 +36,33 @@ class TouristicContentCategoryViewSet(api_viewsets.GeotrekViewSet):
         return Response(serializer.data)
 
 
-class TouristicContentViewSet(api_viewsets.GeotrekGeometricViewset):
+class TouristicContentViewSet(api_viewsets.VectorTilesMixin, api_viewsets.ChangesMixin, ListCacheResponseMixin,
+                              api_viewsets.GeotrekGeometricViewset):
     filter_backends = api_viewsets.GeotrekGeometricViewset.filter_backends + (
         api_filters.GeotrekTouristicContentFilter,
         api_filters.NearbyContentFilter,
         api_filters.UpdateOrCreateDateFilter
     )
     serializer_class = api_serializers.TouristicContentSerializer
+    list_cache_related_models = (City, District) + api_filters.NearbyContentFilter.related_models
+
+    def get_field_dependencies(self):
+        return {
+            'geometry': {'annotate': {'geom_transformed': Transform(self.simplify_geometry(F('geom')), settings.API_SRID)}},
+            'source': {'prefetch_related': ['source']},
+            'themes': {'prefetch_related': ['themes']},
+            'types': {'prefetch_related': ['type1', 'type2']},
+            'attachments': {'prefetch_related': [
+                Prefetch('attachments',
+                         queryset=Attachment.objects.select_related('license', 'filetype__structure').order_by('starred', '-date_insert'))]},
+        }
 
     def get_queryset(self):
         activate(self.request.GET.get('language'))
-        return tourism_models.TouristicContent.objects.existing()\
+        queryset = tourism_models.TouristicContent.objects.existing()\
             .select_related('category', 'reservation_system', 'label_accessibility') \
-            .prefetch_related('source', 'themes', 'type1', 'type2',
-                              Prefetch('attachments',
-                                       queryset=Attachment.objects.select_related('license', 'filetype__structure').order_by('starred', '-date_insert'))
-                              ) \
-            .annotate(geom_transformed=Transform(F('geom'), settings.API_SRID)) \
             .order_by('name')  # Required for reliable pagination
+        return self.prune_queryset(queryset)
 
 
 class InformationDeskTypeViewSet(api_viewsets.GeotrekViewSet):
@@ -82,7 +93,7 @@ class TouristicEventTypeViewSet(api_viewsets.GeotrekViewSet):
     queryset = tourism_models.TouristicEventType.objects.order_by('pk')  # Required for reliable pagination
 
 
-class TouristicEventViewSet(api_viewsets.GeotrekGeometricViewset):
+class TouristicEventViewSet(api_viewsets.ChangesMixin, api_viewsets.GeotrekGeometricViewset):
     filter_backends = api_viewsets.GeotrekGeometricViewset.filter_backends + (
         api_filters.GeotrekTouristicEventFilter,
         api_filters.NearbyContentFilter,
@@ -99,7 +110,7 @@ class TouristicEventViewSet(api_viewsets.GeotrekGeometricViewset):
                               Prefetch('attachments',
                                        queryset=Attachment.objects.select_related('license', 'filetype', 'filetype__structure'))
                               ) \
-            .annotate(geom_transformed=Transform(F('geom'), settings.API_SRID)) \
+            .annotate(geom_transformed=Transform(self.simplify_geometry(F('geom')), settings.API_SRID)) \
             .order_by('begin_date')  # Required for reliable pagination
 
 
@@ -9,11 +9,14 @@ from rest_framework.response import Response
 from modeltranslation.utils import build_localized_fieldname
 
 from geotrek.api.v2 import filters as api_filters, serializers as api_serializers, viewsets as api_viewsets
+from geotrek.api.v2.cache import ListCacheResponseMixin
 from geotrek.api.v2.decorators import cache_response_detail
 from geotrek.api.v2.functions import Length3D
 from geotrek.api.v2.renderers import SVGProfileRenderer
 from geotrek.common.models import Attachment, AccessibilityAttachment, HDViewPoint
 from geotrek.trekking import models as trekking_models
+from geotrek.trekking.utils import TrekStepsResolver
+from geotrek.zoning.models import City, District
 
 
 class WebLinkCategoryViewSet(api_viewsets.GeotrekViewSet):
@@ -21,7 +24,8 @@ class WebLinkCategoryViewSet(api_viewsets.GeotrekViewSet):
     queryset = trekking_models.WebLinkCategory.objects.all()
 
 
-class TrekViewSet(api_viewsets.GeotrekGeometricViewset):
+class TrekViewSet(api_viewsets.VectorTilesMixin, api_viewsets.ChangesMixin, ListCacheResponseMixin,
+                  api_viewsets.GeotrekGeometricViewset):
     filter_backends = api_viewsets.GeotrekGeometricViewset.filter_backends + (
         api_filters.GeotrekTrekQueryParamsFilter,
         api_filters.NearbyContentFilter,
@@ -30,52 +34,71 @@ class TrekViewSet(api_viewsets.GeotrekGeometricViewset):
         api_filters.GeotrekNetworksFilter
     )
     serializer_class = api_serializers.TrekSerializer
+    list_cache_related_models = (City, District) + api_filters.NearbyContentFilter.related_models
+
+    def get_field_dependencies(self):
+        geom3d_transformed = {'geom3d_transformed': Transform(self.simplify_geometry(F('geom_3d')), settings.API_SRID)}
+        return {
+            'geometry': {'annotate': geom3d_transformed},
+            'departure_geom': {'annotate': geom3d_transformed},
+            'length_3d': {'annotate': {'length_3d_m': Length3D('geom_3d')}},
+            'accessibilities': {'prefetch_related': ['accessibilities']},
+            'attachments': {'prefetch_related': [
+                Prefetch('attachments',
+                         queryset=Attachment.objects.select_related('license', 'filetype', 'filetype__structure'))]},
+            'attachments_accessibility': {'prefetch_related': [
+                Prefetch('attachments_accessibility',
+                         queryset=AccessibilityAttachment.objects.select_related('license'))]},
+            'web_links': {'prefetch_related': [
+                Prefetch('web_links',
+                         queryset=trekking_models.WebLink.objects.select_related('category'))]},
+            'view_points': {'prefetch_related': [
+                Prefetch('view_points',
+                         queryset=HDViewPoint.objects.select_related('content_type', 'license').annotate(geom_transformed=Transform(F('geom'), settings.API_SRID)))]},
+            'parking_location': {'columns': ['parking_location']},
+            'points_reference': {'columns': ['points_reference']},
+        }
 
     def get_queryset(self):
         activate(self.request.GET.get('language'))
-        return trekking_models.Trek.objects.existing() \
+        queryset = trekking_models.Trek.objects.existing() \
             .select_related('topo_object') \
-            .prefetch_related('topo_object__aggregations', 'accessibilities',
-                              Prefetch('attachments',
-                                       queryset=Attachment.objects.select_related('license', 'filetype', 'filetype__structure')),
-                              Prefetch('attachments_accessibility',
-                                       queryset=AccessibilityAttachment.objects.select_related('license')),
-                              Prefetch('web_links',
-                                       queryset=trekking_models.WebLink.objects.select_related('category')),
-                              Prefetch('view_points',
-                                       queryset=HDViewPoint.objects.select_related('content_type', 'license').annotate(geom_transformed=Transform(F('geom'), settings.API_SRID)))) \
-            .annotate(geom3d_transformed=Transform(F('geom_3d'), settings.API_SRID),
-                      length_3d_m=Length3D('geom_3d')) \
+            .prefetch_related('topo_object__aggregations') \
             .order_by("name")  # Required for reliable pagination
+        return self.prune_queryset(queryset)
+
+    def get_serializer(self, *args, **kwargs):
+        """ Resolve parents, children, previous and next steps of a page of treks at once """
+        if kwargs.get('many') and args and isinstance(args[0], list):
+            kwargs.setdefault('context', self.get_serializer_context())
+            kwargs['context']['steps'] = TrekStepsResolver(args[0])
+        return super().get_serializer(*args, **kwargs)
+
+    def get_batch_queryset(self):
+        """ Detail view is available even for unpublished treks that are children of other published treks """
+        return self.defer_translations(self.filter_published_lang_retrieve(self.request, self.get_queryset()))
 
     @cache_response_detail()
     def retrieve(self, request, pk=None, format=None):
         """ Return detail view even for unpublished treks that are children of other published treks """
-        qs_filtered = self.filter_published_lang_retrieve(request, self.get_queryset())
-        trek = get_object_or_404(qs_filtered, pk=pk)
+        trek = get_object_or_404(self.get_batch_queryset(), pk=pk)
         return Response(self.get_serializer(trek).data)
 
     def filter_published_lang_retrieve(self, request, queryset):
         """ filter trek by publication language (including parents publication language) """
-        qs = queryset
         language = request.GET.get('language', 'all')
-        associated_published_fields = [f.name for f in qs.model._meta.get_fields() if f.name.startswith('published')]
+        associated_visible_fields = [f.name for f in queryset.model._meta.get_fields() if f.name.startswith('visible')]
 
         if language == 'all':
             # no language specified. Check for all.
             q = Q()
             for lang in settings.MODELTRANSLATION_LANGUAGES:
-                field_name = build_localized_fieldname('published', lang)
-                if field_name in associated_published_fields:
-                    field_name_parent = 'trek_parents__parent__{}'.format(build_localized_fieldname('published', lang))
-                    q |= Q(**{field_name: True}) | Q(**{field_name_parent: True})
-            qs = qs.filter(q)
-        else:
-            # one language is specified
-            field_name = build_localized_fieldname('published', language)
-            field_name_parent = 'trek_parents__parent__{}'.format(build_localized_fieldname('published', language))
-            qs = qs.filter(Q(**{field_name: True}) | Q(**{field_name_parent: True}))
-        return qs.distinct()
+                field_name = build_localized_fieldname('visible', lang)
+                if field_name in associated_visible_fields:
+                    q |= Q(**{field_name: True})
+            return queryset.filter(q)
+        # one language is specified
+        return queryset.filter(**{build_localized_fieldname('visible', language): True})
 
     @action(detail=True, url_name="dem")
     @cache_response_detail()
@@ -161,13 +184,15 @@ class DifficultyViewSet(api_viewsets.GeotrekViewSet):
         return Response(serializer.data)
 
 
-class POIViewSet(api_viewsets.GeotrekGeometricViewset):
+class POIViewSet(api_viewsets.VectorTilesMixin, api_viewsets.ChangesMixin, ListCacheResponseMixin,
+                 api_viewsets.GeotrekGeometricViewset):
     filter_backends = api_viewsets.GeotrekGeometricViewset.filter_backends + (
         api_filters.GeotrekPOIFilter,
         api_filters.NearbyContentFilter,
         api_filters.UpdateOrCreateDateFilter
     )
     serializer_class = api_serializers.POISerializer
+    list_cache_related_models = api_filters.NearbyContentFilter.related_models
     queryset = trekking_models.POI.objects.existing() \
         .select_related('topo_object', 'type', ) \
         .prefetch_related('topo_object__aggregations',
@@ -1,19 +1,41 @@
 from hashlib import md5
+from itertools import islice
+from math import isfinite
 
 from django.conf import settings
+from django.contrib.gis.geos import Polygon
+from django.core.cache import caches
+from django.db.models import F
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.functional import cached_property
+from django.utils.translation import get_language, override
 from django_filters.rest_framework.backends import DjangoFilterBackend
 from mapentity.renderers import GeoJSONRenderer
-from rest_framework import viewsets, renderers
+from modeltranslation import utils as translation_utils
+from rest_framework import renderers, status, viewsets
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.response import Response
 
-from geotrek.api.v2 import pagination as api_pagination, filters as api_filters
+from geotrek.api.v2 import pagination as api_pagination, filters as api_filters, renderers as api_renderers
 from geotrek.api.v2.cache import RetrieveCacheResponseMixin
+from geotrek.api.v2.decorators import cache_response_list
+from geotrek.api.v2.functions import as_mvt
+from geotrek.api.v2.instrumentation import ServerTimingMixin
 from geotrek.api.v2.serializers import override_serializer
+from geotrek.api.v2.utils import TopoguideResolver
+from geotrek.common.cache import (add_object_version, get_model_versions, get_object_version, get_object_versions,
+                                  get_version_datetime)
+from geotrek.common.functions import SimplifyGeometry
+from geotrek.common.models import ObjectChange
+from geotrek.common.utils.translation import get_translated_fields
+from geotrek.zoning.utils import ZoningResolver
 
 
-class GeotrekViewSet(RetrieveCacheResponseMixin, viewsets.ReadOnlyModelViewSet):
+class GeotrekViewSet(ServerTimingMixin, RetrieveCacheResponseMixin, viewsets.ReadOnlyModelViewSet):
     filter_backends = (
         DjangoFilterBackend,
         api_filters.GeotrekQueryParamsFilter,
@@ -22,38 +44,189 @@ class GeotrekViewSet(RetrieveCacheResponseMixin, viewsets.ReadOnlyModelViewSet):
     pagination_class = api_pagination.StandardResultsSetPagination
     permission_classes = [IsAuthenticatedOrReadOnly, ] if settings.API_IS_PUBLIC else [IsAuthenticated, ]
     authentication_classes = [BasicAuthentication, SessionAuthentication]
-    renderer_classes = [renderers.JSONRenderer, renderers.BrowsableAPIRenderer, ] if settings.DEBUG else [renderers.JSONRenderer, ]
+    renderer_classes = ([renderers.JSONRenderer, renderers.BrowsableAPIRenderer, ] if settings.DEBUG else [renderers.JSONRenderer, ]) \
+        + [api_renderers.MessagePackRenderer, ]
     lookup_value_regex = r'\d+'
+    list_cache_related_models = ()
+    stream_chunk_size = 100
 
-    def get_ordered_query_params(self):
+    def handle_exception(self, exc):
+        """ Errors are neither features nor tiles, render them as JSON """
+        if isinstance(getattr(self.request, 'accepted_renderer', None),
+                      (api_renderers.FlatGeobufRenderer, api_renderers.MVTRenderer)):
+            self.request.accepted_renderer = renderers.JSONRenderer()
+            self.request.accepted_media_type = renderers.JSONRenderer.media_type
+        return super().handle_exception(exc)
+
+    def get_ordered_query_params(self, exclude=()):
         """ Get multi value query params sorted by key """
         parameters = self.request.query_params
-        sorted_keys = sorted(parameters.keys())
+        sorted_keys = sorted(key for key in parameters.keys() if key not in exclude)
         return {k: sorted(parameters.getlist(k)) for k in sorted_keys}
 
-    def get_base_cache_string(self):
+    def get_base_cache_string(self, exclude_params=()):
         """ return cache string as url path + ordered query params """
         proto_scheme = self.request.headers.get('X-Forwarded-Proto', self.request.scheme)  # take care about scheme defined in nginx.conf
-        return f"{self.request.path}:{self.get_ordered_query_params()}:{self.request.accepted_renderer.format}:{proto_scheme}"
+        return f"{self.request.path}:{self.get_ordered_query_params(exclude_params)}:{self.request.accepted_renderer.format}:{proto_scheme}"
+
+    def get_object_version(self, pk):
+        """ return object version from version store, bumped on each save / delete """
+        if pk in self.object_versions:
+            return self.object_versions[pk]
+        model = self.get_queryset().model
+        version = get_object_version(model, pk)
+        if version is None:
+            # unknown or expired version: fall back on date_update column
+            # don't directly use get_object or get_queryset to avoid select / prefetch and annotation sql queries
+            # insure object exists and doesn't raise exception
+            instance = get_object_or_404(model._default_manager.only('date_update'), pk=pk)
+            version = add_object_version(model, pk, instance.date_update.isoformat())
+        self.object_versions[pk] = version
+        return version
+
+    def get_object_versions(self, pks):
+        """ return versions of existing objects among pks, reading unknown ones from date_update column at once """
+        model = self.get_queryset().model
+        versions = get_object_versions(model, [pk for pk in pks if pk not in self.object_versions])
+        unknown = [pk for pk, version in versions.items() if version is None]
+        if unknown:
+            for pk, date_update in model._default_manager.filter(pk__in=unknown).values_list('pk', 'date_update'):
+                versions[pk] = add_object_version(model, pk, date_update.isoformat())
+        self.object_versions.update({pk: version for pk, version in versions.items() if version is not None})
+        return {pk: self.object_versions[pk] for pk in pks if pk in self.object_versions}
+
+    @cached_property
+    def object_versions(self):
+        """ object versions read during request, key and Last-Modified date are computed from the same version """
+        return {}
 
     def get_object_cache_key(self, pk):
-        """ return specific object cache key based on object date_update column"""
-        # don't directly use get_object or get_queryset to avoid select / prefetch and annotation sql queries
-        # insure object exists and doesn't raise exception
-        instance = get_object_or_404(self.get_queryset().model, pk=pk)
-        date_update = instance.date_update
-        return f"{self.get_base_cache_string()}:{date_update.isoformat()}"
+        """ return specific object cache key based on object version """
+        return f"{self.get_base_cache_string()}:{self.get_object_version(pk)}"
 
     def object_cache_key_func(self, **kwargs):
         """ cache key md5 for retrieve viewset action """
         return md5(self.get_object_cache_key(kwargs.get('kwargs').get('pk')).encode("utf-8")).hexdigest()
 
+    def get_list_cache_models(self):
+        """ models whose changes invalidate list cache: listed model and models used by filters / serializers """
+        return (self.get_queryset().model, ) + tuple(self.list_cache_related_models)
+
+    @cached_property
+    def list_versions(self):
+        return get_model_versions(self.get_list_cache_models())
+
+    def get_list_cache_key(self):
+        """ return list cache key based on listed and related models versions """
+        versions = ':'.join(self.list_versions)
+        return f"{self.get_base_cache_string()}:{versions}"
+
+    def list_cache_key_func(self, **kwargs):
+        """ cache key md5 for list viewset action """
+        return md5(self.get_list_cache_key().encode("utf-8")).hexdigest()
+
+    def object_last_modified_func(self, **kwargs):
+        """ Last-Modified date for retrieve viewset action """
+        return get_version_datetime(self.get_object_version(kwargs.get('kwargs').get('pk')))
+
+    def get_field_dependencies(self):
+        """
+        Queryset parts needed by some serializer fields only, as
+        {field name: {'prefetch_related': [lookups], 'annotate': {name: expression}, 'columns': [names]}}
+        """
+        return {}
+
+    def is_field_requested(self, name):
+        """ whether serializer field will be rendered, according to `fields` and `omit` query params """
+        if name == 'geometry' and self.request.accepted_renderer.format in api_renderers.GEOJSON_FORMATS:
+            # geometry is always part of GeoJSON and FlatGeobuf features
+            return True
+        omit = self.request.query_params.get('omit')
+        if omit and name in omit.split(','):
+            return False
+        fields = self.request.query_params.get('fields')
+        return not fields or name in fields.split(',')
+
+    def prune_queryset(self, queryset):
+        """
+        Prefetch, annotate and load columns of field dependencies for requested fields only.
+        Columns declared by fields that are not requested are deferred.
+        """
+        prefetches, annotations, columns, deferred = [], {}, set(), set()
+        for name, dependencies in self.get_field_dependencies().items():
+            if self.is_field_requested(name):
+                prefetches += [lookup for lookup in dependencies.get('prefetch_related', ()) if lookup not in prefetches]
+                annotations.update(dependencies.get('annotate', {}))
+                columns.update(dependencies.get('columns', ()))
+            else:
+                deferred.update(dependencies.get('columns', ()))
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        if deferred - columns:
+            queryset = queryset.defer(*(deferred - columns))
+        return queryset
+
+    def defer_translations(self, queryset):
+        """
+        When one language is requested, defer translated columns of other languages.
+        Columns of requested and active languages, with their fallbacks, are still loaded.
+        """
+        language = self.request.GET.get('language', 'all')
+        if language not in settings.MODELTRANSLATION_LANGUAGES:
+            return queryset
+        loaded = set(translation_utils.resolution_order(language)) \
+            | set(translation_utils.resolution_order(translation_utils.get_language()))
+        deferred = [
+            translation_utils.build_localized_fieldname(name, lang)
+            for name in get_translated_fields(queryset.model)
+            for lang in settings.MODELTRANSLATION_LANGUAGES if lang not in loaded
+        ]
+        return queryset.defer(*deferred) if deferred else queryset
+
+    def filter_queryset(self, queryset):
+        return self.defer_translations(super().filter_queryset(queryset))
+
     def get_serializer_context(self):
         return {
             'request': self.request,
             'kwargs': self.kwargs
         }
 
+    def get_serializer(self, *args, **kwargs):
+        """ Resolve zonings (one query per zoning layer) and Topoguide attachments of a page of objects at once """
+        if kwargs.get('many') and args and isinstance(args[0], list):
+            kwargs.setdefault('context', self.get_serializer_context())
+            kwargs['context']['zoning'] = ZoningResolver(args[0])
+            kwargs['context']['topoguides'] = TopoguideResolver(args[0])
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        """ Without pagination, stream list instead of building the whole response in memory """
+        if 'no_page' in request.query_params and request.accepted_renderer.format in ('json', 'geojson'):
+            return self.get_streaming_response(self.filter_queryset(self.get_queryset()))
+        return super().list(request, *args, **kwargs)
+
+    def get_streaming_response(self, queryset):
+        """ Iterate over queryset with a server-side cursor and serialize it chunk by chunk """
+        geojson = self.request.accepted_renderer.format == 'geojson'
+        # content is generated after view returns, keep language used to build queryset
+        language = get_language()
+
+        def get_chunks():
+            with override(language):
+                objects = queryset.iterator(chunk_size=self.stream_chunk_size)
+                while True:
+                    chunk = list(islice(objects, self.stream_chunk_size))
+                    if not chunk:
+                        break
+                    data = self.get_serializer(chunk, many=True).data
+                    yield data['features'] if geojson else data
+
+        return StreamingHttpResponse(api_renderers.stream_json(get_chunks(), geojson=geojson),
+                                     content_type=self.request.accepted_renderer.media_type)
+
 
 class GeotrekGeometricViewset(GeotrekViewSet):
     filter_backends = GeotrekViewSet.filter_backends + (
@@ -64,9 +237,183 @@ class GeotrekGeometricViewset(GeotrekViewSet):
     distance_filter_field = 'geom'
     bbox_filter_field = 'geom'
     bbox_filter_include_overlapping = True
-    renderer_classes = GeotrekViewSet.renderer_classes + [GeoJSONRenderer, ]
+    renderer_classes = GeotrekViewSet.renderer_classes + [GeoJSONRenderer, api_renderers.FlatGeobufRenderer, ]
+
+    simplify_query_param = 'simplify'
+    zoom_query_param = 'zoom'
+    max_zoom = 22
+    # size in meters of a 256 pixels tile at zoom 0, at the equator
+    zoom_0_tile_size = 40075016.686
+
+    def get_simplify_tolerance(self):
+        """
+        Return simplification tolerance (in internal SRID units) given by `simplify` query param,
+        or by `zoom` (0 to max_zoom) as size of a tile pixel, at most the size of a pixel at zoom 0.
+        None without valid parameter.
+        """
+        max_tolerance = self.zoom_0_tile_size / 256
+        try:
+            if self.simplify_query_param in self.request.query_params:
+                tolerance = float(self.request.query_params[self.simplify_query_param])
+            elif self.zoom_query_param in self.request.query_params:
+                zoom = int(self.request.query_params[self.zoom_query_param])
+                if not 0 <= zoom <= self.max_zoom:
+                    return None
+                tolerance = max_tolerance / 2 ** zoom
+            else:
+                return None
+        except ValueError:
+            return None
+        return min(tolerance, max_tolerance) if isfinite(tolerance) and tolerance > 0 else None
+
+    def simplify_geometry(self, expression):
+        """
+        Simplify geometry expression with requested tolerance, then reduce precision of coordinates
+        to a tenth of tolerance. Geometries smaller than tolerance, which would be collapsed, are kept as is.
+        To be used before transformation to API SRID.
+        """
+        tolerance = self.get_simplify_tolerance()
+        if tolerance is None:
+            return expression
+        return SimplifyGeometry(expression, tolerance)
 
     def get_serializer_class(self):
         base_serializer_class = super().get_serializer_class()
         format_output = self.request.query_params.get('format', 'json')
         return override_serializer(format_output, base_serializer_class)
+
+
+class VectorTilesMixin:
+    """
+    Add vector tiles (MVT) endpoint to geometric viewset, at tiles/{z}/{x}/{y}/.
+    Objects are filtered with viewset filter backends (published, portals, language...),
+    tiles are cached with list cache key, so with listed and related models versions.
+    """
+    tile_extent = 4096
+    tile_buffer = 64
+    tile_max_zoom = 22
+    # half size in meters of the EPSG:3857 world
+    tile_world_size = 20037508.342789244
+
+    def get_tile_bounds(self, z, x, y):
+        """ return tile bounds in EPSG:3857, as (xmin, ymin, xmax, ymax) """
+        size = 2 * self.tile_world_size / 2 ** z
+        xmin = -self.tile_world_size + x * size
+        ymax = self.tile_world_size - y * size
+        return xmin, ymax - size, xmin + size, ymax
+
+    def get_tile_geometry(self):
+        """ expression of features geometry, in internal SRID """
+        return F('geom')
+
+    def get_tile_language(self):
+        """ requested language, else active one, for translated properties """
+        language = self.request.GET.get('language')
+        if language in settings.MODELTRANSLATION_LANGUAGES:
+            return language
+        return translation_utils.get_language()
+
+    def get_tile_properties(self):
+        """ expressions of features properties, by name """
+        return {
+            'id': F('pk'),
+            'name': F(translation_utils.build_localized_fieldname('name', self.get_tile_language())),
+        }
+
+    @action(detail=False, url_path=r'tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)', url_name='tile',
+            renderer_classes=[api_renderers.MVTRenderer, ])
+    @cache_response_list(max_entry_size=None)
+    def tile(self, request, z, x, y, *args, **kwargs):
+        z, x, y = int(z), int(x), int(y)
+        if z > self.tile_max_zoom or x >= 2 ** z or y >= 2 ** z:
+            raise Http404
+        xmin, ymin, xmax, ymax = bounds = self.get_tile_bounds(z, x, y)
+        # objects within tile and its buffer
+        margin = (xmax - xmin) * self.tile_buffer / self.tile_extent
+        envelope = Polygon.from_bbox((xmin - margin, ymin - margin, xmax + margin, ymax + margin))
+        envelope.srid = 3857
+        envelope.transform(settings.SRID)
+        queryset = self.filter_queryset(self.get_queryset()) \
+            .alias(tile_geom_filter=self.get_tile_geometry()) \
+            .filter(tile_geom_filter__intersects=envelope)
+        content = as_mvt(queryset, self.get_tile_geometry(), self.get_tile_properties(), self.basename, bounds,
+                         extent=self.tile_extent, buffer=self.tile_buffer)
+        return Response(content)
+
+
+class BatchRetrieveMixin:
+    """
+    Add batch detail endpoint to viewset, at batch/?ids=1,2,3: details of several objects as a JSON list,
+    in requested order, objects not available at detail endpoint being skipped.
+    Each object detail is cached with its version: cached ones are read with one lookup,
+    others are serialized from one queryset.
+    """
+    batch_max_size = 100
+
+    def get_batch_pks(self):
+        ids = self.request.query_params.get('ids', '')
+        try:
+            pks = [int(pk) for pk in ids.split(',') if pk.strip()]
+        except ValueError:
+            raise ValidationError({'ids': "Expected a comma separated list of identifiers"})
+        if len(pks) > self.batch_max_size:
+            raise ValidationError({'ids': f"At most {self.batch_max_size} identifiers are allowed"})
+        return list(dict.fromkeys(pks))
+
+    def get_batch_queryset(self):
+        """ objects available at detail endpoint """
+        return self.filter_queryset(self.get_queryset())
+
+    def get_batch_cache_key(self, pk, version):
+        """ object cache key, shared by batches with same query params other than ids """
+        key = f"{self.get_base_cache_string(exclude_params=('ids', ))}:{pk}:{version}"
+        return md5(key.encode("utf-8")).hexdigest()
+
+    @action(detail=False, url_name='batch', renderer_classes=[renderers.JSONRenderer, ])
+    def batch(self, request, *args, **kwargs):
+        pks = self.get_batch_pks()
+        keys = {pk: self.get_batch_cache_key(pk, version) for pk, version in self.get_object_versions(pks).items()}
+        cache = caches['api_v2']
+        cached = cache.get_many(keys.values()) if keys else {}
+        contents = {pk: cached[key] for pk, key in keys.items() if key in cached}
+        missing = [pk for pk in keys if pk not in contents]
+        if missing:
+            objects = list(self.get_batch_queryset().filter(pk__in=missing))
+            data = self.get_serializer(objects, many=True).data
+            rendered = {obj.pk: request.accepted_renderer.render(item) for obj, item in zip(objects, data)}
+            cache.set_many({keys[pk]: content for pk, content in rendered.items()}, self.object_cache_timeout)
+            contents.update(rendered)
+        content = b'[' + b','.join(contents[pk] for pk in pks if pk in contents) + b']'
+        return HttpResponse(content, content_type=request.accepted_renderer.media_type)
+
+
+class ChangesMixin(BatchRetrieveMixin):
+    """
+    Add changes feed to viewset, at changes/?since=<sequence>, for incremental synchronization:
+    objects changed since sequence, as `updated` identifiers (available at batch and detail endpoints)
+    and `deleted` ones (deleted, unpublished, out of portal...), with `sequence` to give to next call.
+    Changes are logged by triggers (see ObjectChange model), and purged after API_V2_CHANGES_RETENTION_DAYS:
+    feeds since an older sequence answer 410 Gone with current `sequence`, clients have to synchronize again
+    from list endpoint then read feed since this sequence.
+    """
+    @action(detail=False, url_name='changes')
+    def changes(self, request, *args, **kwargs):
+        since = request.query_params.get('since', '0')
+        if not since.isdigit():
+            raise ValidationError({'since': "Expected a sequence number"})
+        sequence = ObjectChange.get_sequence()
+        if int(since) < ObjectChange.get_purged_sequence():
+            return Response({
+                'detail': "Changes since this sequence were purged, synchronize again from list endpoint",
+                'sequence': sequence,
+            }, status=status.HTTP_410_GONE)
+        pks = ObjectChange.get_changed_pks(self.get_queryset().model, int(since), sequence)
+        updated = set()
+        if pks:
+            queryset = self.get_batch_queryset().prefetch_related(None).order_by().filter(pk__in=pks)
+            updated = set(queryset.values_list('pk', flat=True))
+        return Response({
+            'sequence': sequence,
+            'updated': sorted(updated),
+            'deleted': sorted(pks - updated),
+        })
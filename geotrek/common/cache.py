@@ -0,0 +1,106 @@
+"""
+Version store for cached API responses, kept in default cache (memcached).
+
+Versions are written once the transaction is committed only, so that the store never references
+uncommitted or rolled back data. Inside a transaction, versions are forgotten and lookups fall back on database.
+
+Versions start with the modification date in ISO format, so that they can be used as Last-Modified date.
+
+Versions are bumped by signals: changes made in database only (`queryset.update()`, triggers) are served
+once versions expire (CACHE_TIMEOUT_OBJECT_VERSION), except topologies updated by triggers when paths are
+saved, split or deleted (see core signals).
+"""
+from datetime import datetime
+from functools import partial
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.timezone import now
+
+
+def new_version():
+    return f"{now().isoformat()}_{uuid4().hex}"
+
+
+def get_version_datetime(version):
+    """ return modification date of version, or None if unknown """
+    try:
+        return datetime.fromisoformat(version.split('_')[0])
+    except ValueError:
+        return None
+
+
+def get_version_model(model):
+    """ Versions are kept by concrete model: changes of a multi-table inherited model (Trek, POI... on Topology)
+    only invalidate its own responses (see core signals for topologies changed from their parent table) """
+    return model._meta.concrete_model
+
+
+def get_object_version_key(model, pk):
+    return f"object_version:{get_version_model(model)._meta.label_lower}:{pk}"
+
+
+def get_object_version(model, pk):
+    """ return current version of object, or None if unknown (never stored or expired) """
+    return cache.get(get_object_version_key(model, pk))
+
+
+def get_object_versions(model, pks):
+    """ return current version of each object, None if unknown, with one lookup """
+    keys = {pk: get_object_version_key(model, pk) for pk in pks}
+    versions = cache.get_many(keys.values()) if keys else {}
+    return {pk: versions.get(key) for pk, key in keys.items()}
+
+
+def add_object_version(model, pk, version):
+    """ Store version read from database, unless object was bumped meanwhile """
+    key = get_object_version_key(model, pk)
+    transaction.on_commit(lambda: cache.add(key, version, settings.CACHE_TIMEOUT_OBJECT_VERSION))
+    return version
+
+
+def bump_object_version(model, pk):
+    """ Give a new version to object, invalidating its cached API responses """
+    key = get_object_version_key(model, pk)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.set(key, new_version(), settings.CACHE_TIMEOUT_OBJECT_VERSION))
+
+
+def delete_object_version(model, pk):
+    """ Forget object version, next lookup will fall back on database """
+    key = get_object_version_key(model, pk)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def get_model_version_key(model):
+    return f"model_version:{get_version_model(model)._meta.label_lower}"
+
+
+def get_model_versions(models):
+    """ return current version of each model, read from max date_update and count if unknown """
+    keys = {model: get_model_version_key(model) for model in models}
+    versions = cache.get_many(keys.values())
+    result = []
+    for model in models:
+        version = versions.get(keys[model])
+        if version is None:
+            aggregates = get_version_model(model)._default_manager.aggregate(
+                last_update=Max('date_update'),
+                count=Count('pk')
+            )
+            last_update = aggregates['last_update'].isoformat() if aggregates['last_update'] else 'no-data'
+            version = f"{last_update}_{aggregates['count']}"
+            transaction.on_commit(partial(cache.add, keys[model], version, settings.CACHE_TIMEOUT_OBJECT_VERSION))
+        result.append(version)
+    return result
+
+
+def bump_model_version(model):
+    """ Give a new version to model, invalidating every cached list of its objects """
+    key = get_model_version_key(model)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.set(key, new_version(), settings.CACHE_TIMEOUT_OBJECT_VERSION))
@@ -0,0 +1,188 @@
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from hashlib import md5
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+
+INDEX_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (path TEXT PRIMARY KEY, size INTEGER NOT NULL, accessed REAL NOT NULL);
+    CREATE INDEX IF NOT EXISTS entries_accessed_idx ON entries (accessed);
+    CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER NOT NULL);
+    INSERT OR IGNORE INTO stats (id, size) VALUES (0, 0);
+    CREATE TRIGGER IF NOT EXISTS entries_insert_tgr AFTER INSERT ON entries
+        BEGIN UPDATE stats SET size = size + NEW.size; END;
+    CREATE TRIGGER IF NOT EXISTS entries_update_tgr AFTER UPDATE OF size ON entries
+        BEGIN UPDATE stats SET size = size - OLD.size + NEW.size; END;
+    CREATE TRIGGER IF NOT EXISTS entries_delete_tgr AFTER DELETE ON entries
+        BEGIN UPDATE stats SET size = size - OLD.size; END;
+"""
+
+
+class ShardedFileBasedCache(FileBasedCache):
+    """
+    File based cache bounded by total size of entries (MAX_SIZE option, in bytes) instead of their number.
+
+    Entries are spread in sub-directories by first bytes of their key hash. An SQLite index in cache directory
+    keeps size and last access date of each entry, and their total size (maintained by triggers), so that least
+    recently used entries are removed when MAX_SIZE is exceeded, without listing files.
+    As many entries as CULL_FREQUENCY option gives are then removed (3 frees a third of MAX_SIZE).
+
+    Entries are written to a temporary file then renamed, and files are renamed or removed with their index
+    update in SQLite transactions, so the cache can be shared by several processes.
+    """
+    index_name = 'index.sqlite3'
+    # Delay (in seconds) writers wait for index lock
+    index_timeout = 30
+    # Last access date of entries is written at most once per interval (in seconds), to limit index writes
+    access_resolution = 60
+    # Delay (in seconds) reads wait for index lock to write last access date, which is skipped if it is locked
+    access_timeout = 0.1
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._max_size = int(params.get('OPTIONS', {}).get('MAX_SIZE', 1024 ** 3))
+        self._index = None
+        self._index_pid = None
+
+    def _key_to_file(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        digest = md5(key.encode()).hexdigest()
+        return os.path.join(self._dir, digest[:2], digest[2:4], f"{digest}{self.cache_suffix}")
+
+    def _get_index(self):
+        """ return connection to index, opened once per process """
+        if self._index is None or self._index_pid != os.getpid():
+            self._createdir()
+            path = os.path.join(self._dir, self.index_name)
+            created = not os.path.exists(path)
+            index = sqlite3.connect(path, timeout=self.index_timeout, isolation_level=None, check_same_thread=False)
+            index.execute('PRAGMA journal_mode=WAL')
+            index.executescript(INDEX_SCHEMA)
+            if created:
+                # entries of FileBasedCache layout would never be read nor removed
+                for fname in super()._list_cache_files():
+                    super()._delete(fname)
+            self._index, self._index_pid = index, os.getpid()
+        return self._index
+
+    @contextmanager
+    def _transaction(self):
+        index = self._get_index()
+        index.execute('BEGIN IMMEDIATE')
+        try:
+            yield index
+        except BaseException:
+            index.execute('ROLLBACK')
+            raise
+        index.execute('COMMIT')
+
+    def get(self, key, default=None, version=None):
+        fname = self._key_to_file(key, version)
+        try:
+            with open(fname, 'rb') as f:
+                if not self._is_expired(f):
+                    value = pickle.loads(zlib.decompress(f.read()))
+                    self._touch(fname)
+                    return value
+        except FileNotFoundError:
+            pass
+        return default
+
+    def _touch(self, fname):
+        """ write last access date of entry, without waiting for writers more than access_timeout """
+        path = os.path.relpath(fname, self._dir)
+        now = time.time()
+        index = self._get_index()
+        # reads don't lock the index
+        row = index.execute('SELECT accessed FROM entries WHERE path = ?', (path, )).fetchone()
+        if row is None or row[0] >= now - self.access_resolution:
+            return
+        index.execute(f'PRAGMA busy_timeout = {int(self.access_timeout * 1000)}')
+        try:
+            index.execute('UPDATE entries SET accessed = ? WHERE path = ?', (now, path))
+        except sqlite3.OperationalError:
+            # index is locked, access date will be written by a next read
+            pass
+        finally:
+            index.execute(f'PRAGMA busy_timeout = {int(self.index_timeout * 1000)}')
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        fname = self._key_to_file(key, version)
+        old_umask = os.umask(0o077)
+        try:
+            os.makedirs(os.path.dirname(fname), 0o700, exist_ok=True)
+        finally:
+            os.umask(old_umask)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(fname))
+        renamed = False
+        try:
+            with open(fd, 'wb') as f:
+                self._write_content(f, timeout, value)
+                size = f.tell()
+            with self._transaction() as index:
+                os.replace(tmp_path, fname)
+                renamed = True
+                index.execute(
+                    'INSERT INTO entries (path, size, accessed) VALUES (?, ?, ?) '
+                    'ON CONFLICT (path) DO UPDATE SET size = excluded.size, accessed = excluded.accessed',
+                    (os.path.relpath(fname, self._dir), size, time.time())
+                )
+        finally:
+            if not renamed:
+                os.remove(tmp_path)
+        self._cull()
+
+    def _delete(self, fname):
+        with self._transaction() as index:
+            deleted = super()._delete(fname)
+            index.execute('DELETE FROM entries WHERE path = ?', (os.path.relpath(fname, self._dir), ))
+        return deleted
+
+    def get_size(self):
+        """ return total size of entries in bytes """
+        return self._get_index().execute('SELECT size FROM stats').fetchone()[0]
+
+    def _cull(self):
+        """ remove least recently used entries if total size exceeds MAX_SIZE """
+        paths = []
+        # files are removed before commit, so that a concurrent set of same key waits for it
+        with self._transaction() as index:
+            size = index.execute('SELECT size FROM stats').fetchone()[0]
+            if size <= self._max_size:
+                return
+            if self._cull_frequency == 0:
+                target = 0
+            else:
+                target = self._max_size - self._max_size // self._cull_frequency
+            entries = index.execute('SELECT path, size FROM entries ORDER BY accessed')
+            for path, entry_size in entries:
+                if size <= target:
+                    break
+                paths.append(path)
+                size -= entry_size
+            entries.close()
+            index.executemany('DELETE FROM entries WHERE path = ?', [(path, ) for path in paths])
+            for path in paths:
+                try:
+                    os.remove(os.path.join(self._dir, path))
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        if not os.path.exists(self._dir):
+            return
+        with self._transaction() as index:
+            index.execute('DELETE FROM entries')
+            for name in os.listdir(self._dir):
+                path = os.path.join(self._dir, name)
+                if len(name) == 2 and os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+        for fname in super()._list_cache_files():
+            super()._delete(fname)
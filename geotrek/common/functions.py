@@ -12,6 +12,11 @@ class SimplifyPreserveTopology(GeomOutputGeoFunc):
     """ ST_SimplifyPreserveTopology postgis function """
 
 
+class SimplifyGeometry(GeomOutputGeoFunc):
+    """ ft_simplify_geometry function: simplified geometry with reduced precision, or geometry if it would be collapsed """
+    function = 'ft_simplify_geometry'
+
+
 class GeometryType(GeoFunc):
     """ GeometryType postgis function """
     output_field = CharField()
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from geotrek.common.models import AccessibilityAttachment, Attachment
+from geotrek.common.tasks import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnails of attachments served by APIv2 (in background, unless --sync)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync', action='store_true', default=False,
+                            help="Generate thumbnails in this process instead of background tasks")
+
+    def handle(self, *args, **options):
+        attachments = [
+            (Attachment, Attachment.objects.exclude(attachment_file='')),
+            (AccessibilityAttachment, AccessibilityAttachment.objects.exclude(attachment_accessibility_file='')),
+        ]
+        for model, queryset in attachments:
+            count = 0
+            for pk in queryset.values_list('pk', flat=True).iterator():
+                if options['sync']:
+                    generate_thumbnails(model._meta.label, pk)
+                else:
+                    generate_thumbnails.delay(model._meta.label, pk)
+                count += 1
+            if options['verbosity'] > 0:
+                self.stdout.write("{count} {model} processed".format(count=count, model=model._meta.verbose_name_plural))
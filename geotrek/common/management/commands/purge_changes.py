@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from geotrek.common.models import ObjectChange
+
+
+class Command(BaseCommand):
+    help = "Remove changes older than API_V2_CHANGES_RETENTION_DAYS from APIv2 changes feeds log"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.API_V2_CHANGES_RETENTION_DAYS,
+                            help="Keep changes of last days (default: API_V2_CHANGES_RETENTION_DAYS)")
+
+    def handle(self, *args, **options):
+        count = ObjectChange.purge(now() - timedelta(days=options['days']))
+        if options['verbosity'] > 0:
+            self.stdout.write("{count} changes removed".format(count=count))
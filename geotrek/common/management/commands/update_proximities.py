@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from geotrek.common.models import ProximitySet
+from geotrek.common.proximity import get_source_models, update_proximities
+
+
+class Command(BaseCommand):
+    help = "Compute again proximities used by APIv2 near filters (after changing intersection margins)"
+
+    def handle(self, *args, **options):
+        ProximitySet.objects.all().delete()
+
+        for model in get_source_models():
+            count = update_proximities(model)
+            if options['verbosity'] > 0:
+                self.stdout.write("{count} proximity sets computed for {model}".format(
+                    count=count, model=model._meta.verbose_name_plural))
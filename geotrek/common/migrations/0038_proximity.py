@@ -0,0 +1,40 @@
+# Generated by Django 4.2.13 on 2026-10-19 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('common', '0037_annotationcategory_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProximitySet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('ordered', models.BooleanField(default=False)),
+                ('date_insert', models.DateTimeField(auto_now_add=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('near_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Proximity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField(db_index=True)),
+                ('distance', models.FloatField(null=True)),
+                ('order', models.PositiveIntegerField(null=True)),
+                ('proximity_set', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proximities', to='common.proximityset')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='proximityset',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id', 'near_content_type'), name='proximityset_object_near_model_uniq'),
+        ),
+    ]
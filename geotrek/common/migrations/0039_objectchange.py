@@ -0,0 +1,26 @@
+# Generated by Django 4.2.13 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0038_proximity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObjectChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('object_id', models.PositiveIntegerField()),
+                ('transaction_id', models.BigIntegerField()),
+                ('date', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'transaction_id'], name='objectchange_model_tx_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.13 on 2026-10-19 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0039_objectchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObjectChangePurge',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.BigIntegerField()),
+                ('date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
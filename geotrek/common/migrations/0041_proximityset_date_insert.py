@@ -0,0 +1,19 @@
+# Generated by Django 4.2.13 on 2026-10-19 18:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0040_objectchangepurge'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='proximityset',
+            name='date_insert',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
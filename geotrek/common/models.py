@@ -8,10 +8,11 @@ from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db import models as gis_models
-from django.db import models
-from django.db.models import Q
+from django.db import connection, models, transaction
+from django.db.models import Max, Q
 from django.template.defaultfilters import slugify
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.http import urlencode
 from django.utils.translation import gettext_lazy as _
 from mapentity.models import MapEntityMixin
@@ -405,3 +406,89 @@ class AccessMean(TimeStampedModelMixin):
 
     def __str__(self):
         return self.label
+
+
+class ProximitySet(models.Model):
+    """
+    Objects of a model near a given object (e.g. POIs near a trek), as resolved by its property (`trek.pois`),
+    stored for APIv2 `near_*` filters. Removed when either side changes, then computed again on next lookup
+    (see geotrek/common/proximity.py).
+    """
+    content_type = models.ForeignKey(ContentType, related_name='+', on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    near_content_type = models.ForeignKey(ContentType, related_name='+', on_delete=models.CASCADE)
+    # Property results are ordered (along linear geometries, by name...), order of each object is kept
+    ordered = models.BooleanField(default=False)
+    # Start of computation: results read data committed at that time
+    date_insert = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id', 'near_content_type'],
+                                    name='proximityset_object_near_model_uniq'),
+        ]
+
+
+class Proximity(models.Model):
+    proximity_set = models.ForeignKey(ProximitySet, related_name='proximities', on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField(db_index=True)
+    # Distance in meters between both geometries
+    distance = models.FloatField(null=True)
+    order = models.PositiveIntegerField(null=True)
+
+
+class ObjectChange(models.Model):
+    """
+    Insertion, update or deletion of an object served by APIv2 changes feeds, logged by triggers
+    (see `ft_log_change` SQL function). Changes are read once their transaction is finished,
+    with transaction identifiers as sequence, so that no concurrent change is ever skipped.
+    """
+    model = models.CharField(max_length=100)
+    object_id = models.PositiveIntegerField()
+    transaction_id = models.BigIntegerField()
+    date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'transaction_id'], name='objectchange_model_tx_idx'),
+        ]
+
+    @staticmethod
+    def get_sequence():
+        """ return oldest running transaction identifier: every change logged before is visible.
+        It does not increase while a transaction (of any database) is running, so long or idle transactions
+        delay feeds (see `idle_in_transaction_session_timeout` PostgreSQL setting). """
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def get_purged_sequence():
+        """ return sequence before which changes were purged, feeds can not be read since an older one """
+        return ObjectChangePurge.objects.aggregate(sequence=Max('transaction_id'))['sequence'] or 0
+
+    @classmethod
+    def purge(cls, before):
+        """ remove changes logged before date (and other changes of their transactions), return their number """
+        last = cls.objects.filter(date__lt=before).aggregate(transaction_id=Max('transaction_id'))['transaction_id']
+        if last is None:
+            return 0
+        with transaction.atomic():
+            count, _ = cls.objects.filter(transaction_id__lte=last).delete()
+            ObjectChangePurge.objects.create(transaction_id=last + 1)
+        return count
+
+    @classmethod
+    def get_changed_pks(cls, model, since, sequence):
+        """ return primary keys of model objects changed between sequences since (included) and sequence """
+        return set(cls.objects.filter(
+            model=model._meta.label_lower,
+            transaction_id__gte=since,
+            transaction_id__lt=sequence,
+        ).values_list('object_id', flat=True).distinct())
+
+
+class ObjectChangePurge(models.Model):
+    """ Sequence before which changes were removed from ObjectChange log (see `purge_changes` command) """
+    transaction_id = models.BigIntegerField()
+    date = models.DateTimeField(auto_now_add=True)
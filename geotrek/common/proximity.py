@@ -0,0 +1,285 @@
+"""
+Proximity index for APIv2 `near_*` filters.
+
+Objects near another one (e.g. POIs near a trek) are resolved by model properties (`trek.pois`), which apply
+intersection margins, topologies overlapping, excluded POIs... Their results are stored once per object and
+near model (ProximitySet), with distance and order, and filters read them instead of running spatial queries again.
+
+Sets are removed when either side changes (including geometries computed by triggers from paths,
+and margins given by practices), once per transaction when it is committed. Lookups never write them:
+missing sets are resolved by properties and computed by a background task. Sets keep the start date of their
+computation: a set computed while a change was committed may have read former data, it is removed once stored.
+After changing an intersection margin setting, run `update_proximities` command.
+"""
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, Max, OuterRef, Q, Subquery
+from django.utils.timezone import now
+
+from geotrek.common.models import Proximity, ProximitySet
+from geotrek.common.utils import queryset_or_all_objects
+
+# Models given to `near_*` filters
+SOURCE_MODELS = (
+    'trekking.Trek',
+    'tourism.TouristicContent',
+    'tourism.TouristicEvent',
+    'outdoor.Site',
+    'outdoor.Course',
+)
+
+# Models filtered by `near_*` filters
+NEAR_MODELS = SOURCE_MODELS + (
+    'trekking.POI',
+    'trekking.Service',
+    'infrastructure.Infrastructure',
+    'signage.Signage',
+    'sensitivity.SensitiveArea',
+)
+
+
+# Date of last invalidation, in default cache
+INVALIDATION_DATE_KEY = 'proximities:invalidation_date'
+
+
+def _get_models(labels):
+    result = []
+    for label in labels:
+        try:
+            result.append(apps.get_model(label))
+        except LookupError:
+            pass
+    return tuple(result)
+
+
+@lru_cache
+def get_source_models():
+    return _get_models(SOURCE_MODELS)
+
+
+@lru_cache
+def get_near_models():
+    return _get_models(NEAR_MODELS)
+
+
+def get_near_property(model, near_model):
+    """ return property of model giving near_model objects (e.g. `Trek.pois`), or None """
+    name = getattr(near_model, 'related_near_objects_property_name', None) or f"{near_model._meta.model_name}s"
+    prop = getattr(model, name, None)
+    return prop if isinstance(prop, property) else None
+
+
+def is_indexed(model, near_model):
+    return model in get_source_models() and near_model in get_near_models() \
+        and get_near_property(model, near_model) is not None
+
+
+def get_max_margin():
+    """ return greatest distance used by properties, to find objects possibly near a changed one """
+    margins = [
+        settings.TREK_POI_INTERSECTION_MARGIN,
+        settings.TREK_SIGNAGE_INTERSECTION_MARGIN,
+        settings.TREK_INFRASTRUCTURE_INTERSECTION_MARGIN,
+        settings.TOURISM_INTERSECTION_MARGIN,
+        settings.OUTDOOR_INTERSECTION_MARGIN,
+        settings.SENSITIVE_AREA_INTERSECTION_MARGIN,
+    ]
+    if 'geotrek.trekking' in settings.INSTALLED_APPS:
+        margins.append(apps.get_model('trekking', 'Practice').objects.aggregate(distance=Max('distance'))['distance'])
+    return max(margin for margin in margins if margin is not None)
+
+
+def compute_proximities(obj, near_model):
+    """ resolve near_model objects near obj with its property, and store them.
+    Return stored set, or None if objects were changed meanwhile (set is computed again on next lookup). """
+    started = now()
+    prop = get_near_property(type(obj), near_model)
+    queryset = prop.fget(obj, queryset_or_all_objects(None, near_model))
+    ordered = bool(queryset.query.order_by or queryset.query.extra_order_by)
+    if obj.geom:
+        queryset = queryset.annotate(proximity_distance=Distance('geom', obj.geom))
+        results = queryset.values_list('pk', 'proximity_distance')
+    else:
+        results = [(pk, None) for pk in queryset.values_list('pk', flat=True)]
+    proximities = {}
+    for pk, distance in results:
+        # Intersections may be split in several parts
+        if pk not in proximities:
+            proximities[pk] = Proximity(object_id=pk, distance=distance.m if distance is not None else None,
+                                        order=len(proximities) if ordered else None)
+    lookup = {
+        'content_type': ContentType.objects.get_for_model(type(obj)),
+        'object_id': obj.pk,
+        'near_content_type': ContentType.objects.get_for_model(near_model),
+    }
+    try:
+        with transaction.atomic():
+            # Sets computed meanwhile from more recent data are kept
+            ProximitySet.objects.filter(date_insert__lt=started, **lookup).delete()
+            proximity_set = ProximitySet.objects.create(ordered=ordered, date_insert=started, **lookup)
+            for proximity in proximities.values():
+                proximity.proximity_set = proximity_set
+            Proximity.objects.bulk_create(proximities.values())
+    except IntegrityError:
+        # Computed meanwhile by a concurrent task
+        return ProximitySet.objects.filter(**lookup).first()
+    invalidation_date = cache.get(INVALIDATION_DATE_KEY)
+    if invalidation_date is not None and started < invalidation_date:
+        # Stored after sets depending on changed objects were removed, results may be stale
+        proximity_set.delete()
+        return None
+    return proximity_set
+
+
+def get_proximity_set(obj, near_model):
+    return ProximitySet.objects.filter(
+        content_type=ContentType.objects.get_for_model(type(obj)),
+        object_id=obj.pk,
+        near_content_type=ContentType.objects.get_for_model(near_model),
+    ).first()
+
+
+def filter_near(queryset, obj):
+    """ Filter queryset on objects near obj, ordered as its property results if they are ordered.
+    If proximities are not computed yet, use the property and compute them in background. """
+    from geotrek.common.tasks import compute_proximity_set
+
+    proximity_set = get_proximity_set(obj, queryset.model)
+    if proximity_set is None:
+        transaction.on_commit(
+            lambda: compute_proximity_set.delay(type(obj)._meta.label, obj.pk, queryset.model._meta.label)
+        )
+        return get_near_property(type(obj), queryset.model).fget(obj, queryset)
+    proximities = Proximity.objects.filter(proximity_set=proximity_set)
+    queryset = queryset.filter(pk__in=proximities.values('object_id'))
+    if proximity_set.ordered:
+        order = Subquery(proximities.filter(object_id=OuterRef('pk')).values('order')[:1])
+        queryset = queryset.annotate(proximity_order=order).order_by('proximity_order')
+    return queryset
+
+
+def update_proximities(model):
+    """ compute again proximities of every model object, return the number of sets """
+    count = 0
+    for near_model in get_near_models():
+        if not is_indexed(model, near_model):
+            continue
+        for obj in queryset_or_all_objects(None, model).iterator():
+            compute_proximities(obj, near_model)
+            count += 1
+    return count
+
+
+def _get_topology_model(kind):
+    for model in get_near_models():
+        if getattr(model, 'KIND', None) == kind:
+            return model
+    return None
+
+
+def _get_changed_objects(model, pks):
+    """ return {model: pks} of near models objects depending on given objects """
+    label = model._meta.label
+    if model in get_near_models():
+        return {model: set(pks)}
+    changed = defaultdict(set)
+    if label == 'core.Topology':
+        topologies = model._base_manager.filter(pk__in=pks).values_list('pk', 'kind')
+    elif label == 'core.Path':
+        # Geometries of topologies are computed by triggers
+        topologies = apps.get_model('core', 'Topology')._base_manager.filter(aggregations__path__in=pks) \
+            .values_list('pk', 'kind').distinct()
+    elif label == 'trekking.Practice':
+        # Practices give treks margin
+        trek_model = apps.get_model('trekking', 'Trek')
+        changed[trek_model].update(trek_model._base_manager.filter(practice__in=pks).values_list('pk', flat=True))
+        topologies = []
+    else:
+        topologies = []
+    for topology_pk, kind in topologies:
+        topology_model = _get_topology_model(kind)
+        if topology_model:
+            changed[topology_model].add(topology_pk)
+    return changed
+
+
+def _get_geom_field(model):
+    # Sensitive areas are near objects intersecting their buffered geometry
+    return 'geom_buffered' if any(field.name == 'geom_buffered' for field in model._meta.concrete_fields) else 'geom'
+
+
+def _invalidate(changes):
+    """ remove sets depending on changed objects ({model: pks}) with one query """
+    changed = defaultdict(set)
+    for model, pks in changes.items():
+        for changed_model, changed_pks in _get_changed_objects(model, pks).items():
+            changed[changed_model].update(changed_pks)
+    q = Q()
+    margin = D(m=get_max_margin()) if changed else None
+    for changed_model, changed_pks in changed.items():
+        if not changed_pks:
+            continue
+        content_type = ContentType.objects.get_for_model(changed_model)
+        # Sets of objects, or near ones they were part of
+        q |= Q(content_type=content_type, object_id__in=changed_pks) \
+            | Q(near_content_type=content_type, proximities__object_id__in=changed_pks)
+        # Sets they may now be part of
+        near_objects = changed_model._base_manager.filter(pk__in=changed_pks)
+        geom_field = _get_geom_field(changed_model)
+        for source_model in get_source_models():
+            near = near_objects.filter(**{f'{geom_field}__dwithin': (OuterRef('geom'), margin)})
+            pks = source_model._base_manager.filter(Exists(near)).values('pk')
+            q |= Q(content_type=ContentType.objects.get_for_model(source_model),
+                   near_content_type=content_type, object_id__in=pks)
+    if q:
+        # Sets being computed from former data are removed once stored (see compute_proximities)
+        cache.set(INVALIDATION_DATE_KEY, now(), None)
+        ProximitySet.objects.filter(q).delete()
+
+
+def get_dependency(model, instance):
+    """ return (model, pk) of changed object if proximities depend on it, else None """
+    label = model._meta.label
+    if model in get_near_models() or label in ('core.Topology', 'core.Path', 'trekking.Practice'):
+        return model, instance.pk
+    if label == 'core.PathAggregation':
+        return apps.get_model('core', 'Topology'), instance.topo_object_id
+    return None
+
+
+_pending = threading.local()
+
+
+def _get_pending_changes():
+    if not hasattr(_pending, 'changes'):
+        _pending.changes = defaultdict(set)
+    return _pending.changes
+
+
+def _invalidate_pending():
+    changes = dict(_get_pending_changes())
+    _get_pending_changes().clear()
+    if changes:
+        _invalidate(changes)
+
+
+def invalidate_proximities(model, pk):
+    """ Remove proximities depending on object once current transaction is committed.
+    Objects changed in a transaction (e.g. paths of an import) are collected, and their sets are removed at once.
+    Changes of a rolled back transaction are only removed with next committed one. """
+    _get_pending_changes()[model].add(pk)
+    transaction.on_commit(_invalidate_pending)
+
+
+@lru_cache
+def get_excluded_pois_relations():
+    return tuple(model.pois_excluded.through for model in get_source_models() if hasattr(model, 'pois_excluded'))
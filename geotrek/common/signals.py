@@ -1,13 +1,19 @@
 from django.contrib.admin.models import DELETION, LogEntry
 from django.contrib.contenttypes.models import ContentType
-from django.db.models.signals import post_delete, post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.utils.timezone import now
 
 from mapentity.middleware import get_internal_user
 
+from geotrek.common.cache import bump_model_version, bump_object_version, delete_object_version
 from geotrek.common.models import (AccessibilityAttachment, Attachment,
                                    HDViewPoint)
+from geotrek.common.proximity import (get_dependency,
+                                      get_excluded_pois_relations,
+                                      invalidate_proximities)
+from geotrek.common.tasks import generate_thumbnails, get_existing_thumbnail
 
 
 def log_cascade_deletion(sender, instance, related_model, cascading_field):
@@ -38,3 +44,43 @@ def update_content_object_date_update(sender, instance, *args, **kwargs):
     if content_object and hasattr(content_object, 'date_update'):
         content_object.date_update = now()
         content_object.save(update_fields=['date_update'])
+
+
+@receiver(post_save, sender=Attachment)
+@receiver(post_save, sender=AccessibilityAttachment)
+def generate_attachment_thumbnails(sender, instance, **kwargs):
+    """ after each creation / edition of picture file, generate thumbnails served by APIv2 in background, once committed """
+    if not (getattr(instance, 'attachment_accessibility_file', None) or getattr(instance, 'attachment_file', None)):
+        return
+    if get_existing_thumbnail(instance) is None:
+        transaction.on_commit(lambda: generate_thumbnails.delay(sender._meta.label, instance.pk))
+
+
+@receiver(post_save)
+def bump_timestamped_object_version(sender, instance, **kwargs):
+    """ after each creation / edition, give a new version to object and its model to invalidate cached API responses """
+    if hasattr(instance, 'date_update'):
+        bump_object_version(sender, instance.pk)
+        bump_model_version(sender)
+
+
+@receiver(post_delete)
+def delete_timestamped_object_version(sender, instance, **kwargs):
+    if hasattr(instance, 'date_update'):
+        delete_object_version(sender, instance.pk)
+        bump_model_version(sender)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_object_proximities(sender, instance, **kwargs):
+    """ after each creation / edition / deletion, forget proximities computed with object (or its paths) """
+    dependency = get_dependency(sender, instance)
+    if dependency:
+        invalidate_proximities(*dependency)
+
+
+@receiver(m2m_changed)
+def invalidate_excluded_pois_proximities(sender, instance, action, **kwargs):
+    if action.startswith('post_') and sender in get_excluded_pois_relations():
+        invalidate_proximities(type(instance), instance.pk)
@@ -1,11 +1,23 @@
 import importlib
+import logging
 
 from os.path import join
 import sys
 from celery import Task, shared_task, current_task
+from django.apps import apps
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.engine import NoSourceGenerator
+from easy_thumbnails.exceptions import InvalidImageFormatError
+from easy_thumbnails.files import get_thumbnailer
+from PIL.Image import DecompressionBombError
+
+from geotrek.common.cache import bump_model_version, bump_object_version
+from geotrek.common.proximity import compute_proximities, get_proximity_set
+
+logger = logging.getLogger(__name__)
 
 
 class GeotrekImportTask(Task):
@@ -123,3 +135,46 @@ def import_datas_from_web(**kwargs):
         'report': parser.report(output_format='html').replace('$celery_id', current_task.request.id),
         'name': current_task.name
     }
+
+
+def get_attachment_file(attachment):
+    """ return picture file of attachment or accessibility attachment """
+    return getattr(attachment, 'attachment_accessibility_file', None) or attachment.attachment_file
+
+
+def get_existing_thumbnail(attachment):
+    """ return thumbnail served by APIv2 if it was generated from current picture file, else None """
+    try:
+        return get_thumbnailer(get_attachment_file(attachment)).get_existing_thumbnail(aliases.get('apiv2'))
+    except IOError:
+        return None
+
+
+@shared_task(name='geotrek.common.generate-thumbnails')
+def generate_thumbnails(model_label, pk):
+    """ Generate thumbnails of attachment served by APIv2, so that API never processes pictures """
+    attachment = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if attachment is None or (hasattr(attachment, 'is_image') and not attachment.is_image):
+        return
+    attachment_file = get_attachment_file(attachment)
+    if not attachment_file:
+        return
+    try:
+        get_thumbnailer(attachment_file).get_thumbnail(aliases.get('apiv2'))
+    except (IOError, InvalidImageFormatError, DecompressionBombError, NoSourceGenerator) as exc:
+        logger.warning("Thumbnail of %s %s (%s) can not be generated: %s", model_label, pk, attachment_file.name, exc)
+        return
+    # Cached API responses of attached object give the thumbnail now
+    content_object = attachment.content_object
+    if content_object is not None:
+        bump_object_version(type(content_object), content_object.pk)
+        bump_model_version(type(content_object))
+
+
+@shared_task(name='geotrek.common.compute-proximities')
+def compute_proximity_set(model_label, pk, near_model_label):
+    """ Store objects near an object, read by APIv2 near filters, so that API requests never write them """
+    obj = apps.get_model(model_label).objects.filter(pk=pk).first()
+    near_model = apps.get_model(near_model_label)
+    if obj is not None and get_proximity_set(obj, near_model) is None:
+        compute_proximities(obj, near_model)
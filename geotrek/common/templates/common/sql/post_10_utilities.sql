@@ -38,3 +38,46 @@ BEGIN
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
+
+-------------------------------------------------------------------------------
+-- Log changes of objects served by APIv2 changes feeds
+-- Arguments: model label (app_label.model_name), primary key column
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.ft_log_change() RETURNS trigger SECURITY DEFINER AS $$
+-- Only primary key is read, rows (and their geometries) are never serialized
+DECLARE
+    changed_id integer;
+BEGIN
+    -- Rows rewritten with same values (e.g. by computed flags refresh) are not changed
+    IF TG_OP = 'UPDATE' AND OLD IS NOT DISTINCT FROM NEW THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        EXECUTE format('SELECT ($1).%I', TG_ARGV[1]) INTO changed_id USING OLD;
+    ELSE
+        EXECUTE format('SELECT ($1).%I', TG_ARGV[1]) INTO changed_id USING NEW;
+    END IF;
+    INSERT INTO common_objectchange (model, object_id, transaction_id, date)
+        VALUES (TG_ARGV[0], changed_id, txid_current(), statement_timestamp());
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-------------------------------------------------------------------------------
+-- Simplify geometry for APIv2, then reduce precision of coordinates to a tenth
+-- of tolerance. Geometries which would be collapsed are kept as is.
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.ft_simplify_geometry(geom geometry, tolerance float) RETURNS geometry IMMUTABLE AS $$
+DECLARE
+    simplified geometry;
+BEGIN
+    simplified := ST_SnapToGrid(ST_SimplifyPreserveTopology(geom, tolerance), tolerance / 10);
+    IF simplified IS NULL OR ST_IsEmpty(simplified) THEN
+        RETURN geom;
+    END IF;
+    RETURN simplified;
+END;
+$$ LANGUAGE plpgsql;
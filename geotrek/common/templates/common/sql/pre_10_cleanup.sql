@@ -4,3 +4,5 @@ DROP FUNCTION IF EXISTS ft_date_insert() CASCADE;
 DROP FUNCTION IF EXISTS ft_date_update() CASCADE;
 DROP FUNCTION IF EXISTS ft_uuid_insert() CASCADE;
 DROP FUNCTION IF EXISTS flatten_geometrycollection_iu() CASCADE;
+DROP FUNCTION IF EXISTS ft_log_change() CASCADE;
+DROP FUNCTION IF EXISTS ft_simplify_geometry(geometry, float) CASCADE;
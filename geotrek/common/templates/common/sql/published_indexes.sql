@@ -0,0 +1,11 @@
+{% comment %}
+Partial indexes of published objects, by language when PUBLISHED_BY_LANG, included with table and pk variables.
+With deleted variable, deleted objects are excluded too (deleted column in same table).
+Predicates match filters of geotrek.api.v2.filters.get_published_filter_expression().
+{% endcomment %}{% if PUBLISHED_BY_LANG %}{% for lang in MODELTRANSLATION_LANGUAGES %}
+CREATE INDEX IF NOT EXISTS {{ table }}_published_{{ lang }}_idx ON {{ table }} ({{ pk }})
+    WHERE {% if deleted %}NOT deleted AND {% endif %}published_{{ lang }};
+{% endfor %}{% else %}
+CREATE INDEX IF NOT EXISTS {{ table }}_published_idx ON {{ table }} ({{ pk }})
+    WHERE {% if deleted %}NOT deleted AND {% endif %}published;
+{% endif %}
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from geotrek.common.cache_backends import ShardedFileBasedCache
+
+
+class ShardedFileBasedCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.cache = ShardedFileBasedCache(self.directory.name, {'TIMEOUT': None, 'OPTIONS': {'MAX_SIZE': 3000}})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_entries_are_sharded(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        path = self.cache._key_to_file('key')
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(len(os.path.relpath(path, self.directory.name).split(os.sep)), 3)
+
+    def test_size_is_accounted(self):
+        self.cache.set('key', os.urandom(500))
+        size = self.cache.get_size()
+        self.assertGreater(size, 500)
+        self.cache.set('key', os.urandom(1000))
+        self.assertGreater(self.cache.get_size(), size + 400)
+        self.cache.delete('key')
+        self.assertEqual(self.cache.get_size(), 0)
+
+    def test_least_recently_used_entries_are_removed(self):
+        with mock.patch('geotrek.common.cache_backends.time.time') as mocked_time:
+            for i in range(5):
+                mocked_time.return_value = 1000 + i * 100
+                self.cache.set(f'key{i}', os.urandom(500))
+            mocked_time.return_value = 2000
+            self.assertIsNotNone(self.cache.get('key0'))
+            mocked_time.return_value = 2100
+            self.cache.set('key5', os.urandom(500))
+        self.assertLessEqual(self.cache.get_size(), 2000)
+        self.assertTrue(self.cache.has_key('key0'))
+        self.assertTrue(self.cache.has_key('key5'))
+        self.assertFalse(self.cache.has_key('key1'))
+        self.assertFalse(os.path.exists(self.cache._key_to_file('key1')))
+
+    def test_read_does_not_wait_for_locked_index(self):
+        self.cache.set('key', 'value')
+        self.cache._get_index().execute('UPDATE entries SET accessed = 0')
+        writer = sqlite3.connect(os.path.join(self.directory.name, ShardedFileBasedCache.index_name),
+                                 isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            self.assertEqual(self.cache.get('key'), 'value')
+        finally:
+            writer.execute('ROLLBACK')
+            writer.close()
+        self.assertEqual(self.cache._get_index().execute('SELECT accessed FROM entries').fetchone()[0], 0)
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertGreater(self.cache._get_index().execute('SELECT accessed FROM entries').fetchone()[0], 0)
+
+    def test_expired_entry_is_removed_from_index(self):
+        self.cache.set('key', 'value', timeout=-1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get_size(), 0)
+
+    def test_clear(self):
+        self.cache.set('key', 'value')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get_size(), 0)
+        self.assertEqual(sorted(os.listdir(self.directory.name))[0], 'index.sqlite3')
+
+    def test_entries_of_previous_layout_are_removed(self):
+        legacy = os.path.join(self.directory.name, f'legacy{ShardedFileBasedCache.cache_suffix}')
+        with open(legacy, 'wb') as f:
+            f.write(b'')
+        ShardedFileBasedCache(self.directory.name, {}).get_size()
+        self.assertFalse(os.path.exists(legacy))
@@ -11,7 +11,7 @@ from easy_thumbnails.models import Thumbnail
 
 from geotrek import __version__
 from geotrek.authent.tests.factories import StructureFactory
-from geotrek.common.models import TargetPortal
+from geotrek.common.models import Attachment, TargetPortal
 from geotrek.common.tests.factories import AttachmentFactory, TargetPortalFactory
 from geotrek.common.utils.testdata import get_dummy_uploaded_image
 from geotrek.core.models import Usage, Path
@@ -160,6 +160,19 @@ class CommandAttachmentsTests(TestCase):
         self.assertIn('%s... Thumbnail' % self.content.thumbnail.name, output.getvalue())
         self.assertTrue(os.path.exists(self.content.thumbnail.path))
 
+    def test_generate_thumbnails_sync(self):
+        output = StringIO()
+        thumbnail_path = "{path}.400x0_q85.png".format(path=self.picture.attachment_file.path)
+        self.assertFalse(os.path.exists(thumbnail_path))
+        call_command('generate_thumbnails', '--sync', stdout=output)
+        self.assertIn('1 {} processed'.format(Attachment._meta.verbose_name_plural), output.getvalue())
+        self.assertTrue(os.path.exists(thumbnail_path))
+
+    @mock.patch('geotrek.common.tasks.generate_thumbnails.delay')
+    def test_generate_thumbnails_background(self, mocked_delay):
+        call_command('generate_thumbnails', stdout=StringIO())
+        mocked_delay.assert_called_once_with('common.Attachment', self.picture.pk)
+
 
 class CheckVersionsCommandTestCase(TestCase):
     def setUp(self):
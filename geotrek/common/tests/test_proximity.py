@@ -0,0 +1,111 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.timezone import now
+
+from geotrek.common.models import ProximitySet
+from geotrek.common.proximity import INVALIDATION_DATE_KEY, compute_proximities, filter_near
+from geotrek.common.tasks import compute_proximity_set
+from geotrek.tourism.models import TouristicContent, TouristicEvent
+from geotrek.tourism.tests.factories import TouristicContentFactory, TouristicEventFactory
+
+
+class ProximityTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.content = TouristicContentFactory(geom=Point(1000, 1000, srid=settings.SRID))
+        cls.near_content_b = TouristicContentFactory(name="B", geom=Point(1100, 1000, srid=settings.SRID))
+        cls.near_content_a = TouristicContentFactory(name="A", geom=Point(1000, 1300, srid=settings.SRID))
+        cls.far_content = TouristicContentFactory(name="C", geom=Point(9000, 9000, srid=settings.SRID))
+        cls.event = TouristicEventFactory(geom=Point(1000, 1050, srid=settings.SRID))
+
+    def setUp(self):
+        cache.delete(INVALIDATION_DATE_KEY)
+
+    @mock.patch('geotrek.common.tasks.compute_proximity_set.delay')
+    def test_filter_near_stores_property_results(self, mocked_delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            queryset = filter_near(TouristicContent.objects.all(), self.content)
+            self.assertQuerysetEqual(queryset, [self.near_content_a, self.near_content_b])
+        mocked_delay.assert_called_once_with('tourism.TouristicContent', self.content.pk, 'tourism.TouristicContent')
+        compute_proximity_set(*mocked_delay.call_args.args)
+        proximity_set = ProximitySet.objects.get(object_id=self.content.pk)
+        self.assertTrue(proximity_set.ordered)
+        distances = dict(proximity_set.proximities.values_list('object_id', 'distance'))
+        self.assertAlmostEqual(distances[self.near_content_b.pk], 100)
+        self.assertAlmostEqual(distances[self.near_content_a.pk], 300)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(filter_near(TouristicContent.objects.all(), self.content)), 2)
+
+    def test_filter_near_does_not_write(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            queryset = filter_near(TouristicContent.objects.all(), self.content)
+            self.assertQuerysetEqual(queryset, [self.near_content_a, self.near_content_b])
+        self.assertFalse(ProximitySet.objects.exists())
+        self.assertEqual(len(callbacks), 1)
+
+    def test_filter_near_keeps_queryset_filters(self):
+        compute_proximities(self.content, TouristicContent)
+        queryset = filter_near(TouristicContent.objects.exclude(name="A"), self.content)
+        self.assertQuerysetEqual(queryset, [self.near_content_b])
+
+    def test_moved_near_object_is_removed(self):
+        compute_proximities(self.content, TouristicContent)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.near_content_b.geom = Point(9000, 9100, srid=settings.SRID)
+            self.near_content_b.save()
+            self.assertTrue(ProximitySet.objects.filter(object_id=self.content.pk).exists())
+        self.assertFalse(ProximitySet.objects.filter(object_id=self.content.pk).exists())
+        queryset = filter_near(TouristicContent.objects.all(), self.content)
+        self.assertQuerysetEqual(queryset, [self.near_content_a])
+
+    def test_moved_object_becomes_near(self):
+        compute_proximities(self.content, TouristicContent)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.far_content.geom = Point(900, 1000, srid=settings.SRID)
+            self.far_content.save()
+        queryset = filter_near(TouristicContent.objects.all(), self.content)
+        self.assertQuerysetEqual(queryset, [self.near_content_a, self.near_content_b, self.far_content])
+
+    def test_set_computed_during_invalidation_is_removed(self):
+        # Objects were changed while set was computed from former data
+        cache.set(INVALIDATION_DATE_KEY, now() + timedelta(seconds=1))
+        self.assertIsNone(compute_proximities(self.content, TouristicContent))
+        self.assertFalse(ProximitySet.objects.exists())
+
+    def test_more_recent_set_is_kept(self):
+        proximity_set = compute_proximities(self.content, TouristicContent)
+        ProximitySet.objects.filter(pk=proximity_set.pk).update(date_insert=now() + timedelta(seconds=1))
+        self.assertEqual(compute_proximities(self.content, TouristicContent), proximity_set)
+        self.assertEqual(ProximitySet.objects.get().pk, proximity_set.pk)
+
+    def test_deleted_near_object_is_removed(self):
+        compute_proximities(self.content, TouristicEvent)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.delete()
+        self.assertFalse(ProximitySet.objects.filter(object_id=self.content.pk).exists())
+
+    @mock.patch('geotrek.common.proximity._invalidate')
+    def test_changes_are_invalidated_once_per_transaction(self, mocked):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.near_content_a.save()
+            self.near_content_b.save()
+            self.event.save()
+        mocked.assert_called_once_with({
+            TouristicContent: {self.near_content_a.pk, self.near_content_b.pk},
+            TouristicEvent: {self.event.pk},
+        })
+
+    def test_update_proximities_command(self):
+        output = StringIO()
+        call_command('update_proximities', stdout=output)
+        self.assertIn("Touristic contents", output.getvalue())
+        proximity_set = ProximitySet.objects.get(content_type__model='touristicevent', object_id=self.event.pk,
+                                                 near_content_type__model='touristiccontent')
+        self.assertEqual(proximity_set.proximities.count(), 3)
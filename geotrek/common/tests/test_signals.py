@@ -1,7 +1,11 @@
+from unittest import mock
+
 from django.test import TestCase
 from freezegun import freeze_time
 
+from geotrek.common.tasks import generate_thumbnails
 from geotrek.common.tests.factories import HDViewPointFactory, OrganismFactory, AttachmentFactory, AttachmentAccessibilityFactory
+from geotrek.common.utils.testdata import get_dummy_uploaded_image
 
 
 class CommonSignalsTestCase(TestCase):
@@ -82,3 +86,19 @@ class CommonSignalsTestCase(TestCase):
         self.object.refresh_from_db()
         # object date_update has been updated with current datetime
         self.assertEqual(self.object.date_update.isoformat(), "2022-07-04T17:00:00+00:00")
+
+    @mock.patch('geotrek.common.tasks.generate_thumbnails.delay')
+    def test_thumbnails_generated_when_attachment_saved(self, mocked_delay):
+        """ Thumbnails generation sent to background task once committed """
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = AttachmentFactory(content_object=self.object)
+        mocked_delay.assert_called_once_with('common.Attachment', attachment.pk)
+
+    def test_thumbnails_not_generated_again_when_picture_unchanged(self):
+        attachment = AttachmentFactory(content_object=self.object, attachment_file=get_dummy_uploaded_image())
+        generate_thumbnails('common.Attachment', attachment.pk)
+        with mock.patch('geotrek.common.tasks.generate_thumbnails.delay') as mocked_delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                attachment.legend = "Legend"
+                attachment.save()
+        mocked_delay.assert_not_called()
@@ -8,6 +8,7 @@ class CoreConfig(AppConfig):
     verbose_name = _("Core")
 
     def ready(self):
+        import geotrek.core.signals  # NOQA
         from .forms import PathForm, TrailForm
 
         def check_hidden_fields_settings(app_configs, **kwargs):
@@ -0,0 +1,55 @@
+from collections import defaultdict
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from geotrek.common.cache import bump_model_version, bump_object_version
+from geotrek.core.models import Path, Topology
+
+
+@lru_cache
+def get_topology_model(kind):
+    """ return model of topologies of given kind (Trek, POI...), versions are kept by concrete model """
+    for model in apps.get_models():
+        if issubclass(model, Topology) and model.KIND == kind:
+            return model
+    return Topology
+
+
+def bump_topologies_version(topologies):
+    models_pks = defaultdict(list)
+    for pk, kind in topologies.values_list('pk', 'kind').distinct():
+        models_pks[get_topology_model(kind)].append(pk)
+    for model, pks in models_pks.items():
+        for pk in pks:
+            bump_object_version(model, pk)
+        bump_model_version(model)
+
+
+@receiver(post_save, sender=Topology)
+def bump_topology_version(sender, instance, **kwargs):
+    """ parent table of a topology saved alone, invalidate cached API responses of its concrete model """
+    model = get_topology_model(instance.kind)
+    if model is not Topology:
+        bump_object_version(model, instance.pk)
+        bump_model_version(model)
+
+
+@receiver(post_save, sender=Path)
+def bump_path_topologies_version(sender, instance, **kwargs):
+    """ topologies geometries are updated by triggers when a path changes, invalidate their cached API responses.
+    Paths split by saved one (or it snaps to) intersect it, so their topologies are invalidated too """
+    if not settings.TREKKING_TOPOLOGY_ENABLED or not instance.geom:
+        return
+    bump_topologies_version(Topology.objects.filter(aggregations__path__geom__intersects=instance.geom))
+
+
+@receiver(pre_delete, sender=Path)
+def bump_deleted_path_topologies_version(sender, instance, **kwargs):
+    """ topologies are updated (or deleted) by triggers when a path is deleted """
+    if not settings.TREKKING_TOPOLOGY_ENABLED:
+        return
+    bump_topologies_version(Topology.objects.filter(aggregations__path=instance))
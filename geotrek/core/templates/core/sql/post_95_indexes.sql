@@ -0,0 +1,5 @@
+-------------------------------------------------------------------------------
+-- Not deleted topologies by kind (treks, POIs, ...)
+-------------------------------------------------------------------------------
+
+CREATE INDEX IF NOT EXISTS core_topology_existing_kind_idx ON core_topology (kind) WHERE NOT deleted;
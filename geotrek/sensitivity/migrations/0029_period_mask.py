@@ -0,0 +1,35 @@
+# Generated by Django 4.2.13 on 2026-10-19 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensitivity', '0028_alter_sensitivearea_structure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='species',
+            name='period_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sensitivearea',
+            name='period_mask',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False),
+        ),
+        # Next values are computed by triggers
+        migrations.RunSQL(
+            """
+            UPDATE sensitivity_species SET period_mask =
+                period01::int | period02::int << 1 | period03::int << 2 | period04::int << 3
+                | period05::int << 4 | period06::int << 5 | period07::int << 6 | period08::int << 7
+                | period09::int << 8 | period10::int << 9 | period11::int << 10 | period12::int << 11;
+            UPDATE sensitivity_sensitivearea a SET period_mask = s.period_mask
+                FROM sensitivity_species s WHERE s.id = a.species_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.13 on 2026-10-19 11:41
+
+import django.contrib.gis.db.models.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensitivity', '0029_period_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensitivearea',
+            name='geom_display',
+            field=django.contrib.gis.db.models.fields.GeometryField(editable=False, null=True, srid=settings.API_SRID),
+        ),
+        migrations.AddField(
+            model_name='sensitivearea',
+            name='geom_display_area',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='sensitivearea',
+            index=models.Index(fields=['-geom_display_area', 'id'], name='sensitivearea_display_area_idx'),
+        ),
+        # Next values are computed by triggers
+        migrations.RunSQL(
+            f"""
+            UPDATE sensitivity_sensitivearea a SET geom_display = CASE
+                WHEN GeometryType(a.geom) = 'POINT' THEN ST_Transform(ST_Buffer(a.geom, s.radius, 4), {settings.API_SRID})
+                ELSE ST_Transform(a.geom, {settings.API_SRID})
+            END
+            FROM sensitivity_species s WHERE s.id = a.species_id;
+            UPDATE sensitivity_sensitivearea SET geom_display_area = ST_Area(geom_display);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-20 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensitivity', '0030_sensitivearea_geom_display'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sensitivearea',
+            name='period_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
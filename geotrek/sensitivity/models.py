@@ -65,6 +65,8 @@ class Species(TimeStampedModelMixin, OptionalPictogramMixin):
     period10 = models.BooleanField(default=False, verbose_name=_("October"))
     period11 = models.BooleanField(default=False, verbose_name=_("November"))
     period12 = models.BooleanField(default=False, verbose_name=_("Decembre"))
+    # Bit 0 for January... bit 11 for December, computed by triggers
+    period_mask = models.PositiveSmallIntegerField(default=0, editable=False)
     practices = models.ManyToManyField(SportPractice, verbose_name=_("Sport practices"))
     url = models.URLField(blank=True, verbose_name="URL")
     radius = models.IntegerField(blank=True, null=True, verbose_name=_("Bubble radius"), help_text=_("meters"))
@@ -81,6 +83,11 @@ class Species(TimeStampedModelMixin, OptionalPictogramMixin):
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def get_period_mask(months):
+        """ return period bitmask of given month numbers (1-12) """
+        return sum(1 << (month - 1) for month in set(months))
+
     def pretty_period(self):
         return ", ".join([str(self._meta.get_field('period{:02}'.format(p)).verbose_name)
                           for p in range(1, 13)
@@ -94,6 +101,9 @@ class SensitiveArea(GeotrekMapEntityMixin, StructureRelated, TimeStampedModelMix
                     AddPropertyMixin):
     geom = models.GeometryField(srid=settings.SRID)
     geom_buffered = models.GeometryField(srid=settings.SRID, editable=False)
+    # Geometry served by API, points as circles of species radius, and its area, computed by triggers
+    geom_display = models.GeometryField(srid=settings.API_SRID, editable=False, null=True)
+    geom_display_area = models.FloatField(editable=False, null=True)
     species = models.ForeignKey(Species, verbose_name=_("Species or regulatory area"), on_delete=models.PROTECT)
     published = models.BooleanField(verbose_name=_("Published"), default=False, help_text=_("Visible on Geotrek-rando"))
     publication_date = models.DateField(verbose_name=_("Publication date"), null=True, blank=True, editable=False)
@@ -102,6 +112,8 @@ class SensitiveArea(GeotrekMapEntityMixin, StructureRelated, TimeStampedModelMix
     eid = models.CharField(verbose_name=_("External id"), max_length=1024, blank=True, null=True)
     provider = models.CharField(verbose_name=_("Provider"), db_index=True, max_length=1024, blank=True)
     rules = models.ManyToManyField(Rule, verbose_name=_("Rules"), blank=True)
+    # Species period bitmask, copied by triggers to filter without join
+    period_mask = models.PositiveSmallIntegerField(default=0, editable=False)
 
     objects = SensitiveAreaManager()
 
@@ -118,6 +130,9 @@ class SensitiveArea(GeotrekMapEntityMixin, StructureRelated, TimeStampedModelMix
         permissions = (
             ("import_sensitivearea", "Can import Sensitive area"),
         )
+        indexes = [
+            models.Index(fields=['-geom_display_area', 'id'], name='sensitivearea_display_area_idx'),
+        ]
 
     def __str__(self):
         return self.species.name
@@ -148,6 +163,9 @@ class SensitiveArea(GeotrekMapEntityMixin, StructureRelated, TimeStampedModelMix
             # Update computed values
             fromdb = self.__class__.objects.get(pk=self.pk)
             self.geom_buffered = fromdb.geom_buffered
+            self.period_mask = fromdb.period_mask
+            self.geom_display = fromdb.geom_display
+            self.geom_display_area = fromdb.geom_display_area
         return self
 
     def save(self, *args, **kwargs):
@@ -6,6 +6,13 @@ CREATE FUNCTION {{ schema_geotrek }}.sensitive_area_update_geom_buffered_interse
 DECLARE
 BEGIN
     NEW.geom_buffered = ST_BUFFER(NEW.geom, {{ SENSITIVE_AREA_INTERSECTION_MARGIN }});
+    -- Geometry served by API (points as circles of species radius) and its area to order areas
+    IF GeometryType(NEW.geom) = 'POINT' THEN
+        NEW.geom_display = ST_Transform(ST_Buffer(NEW.geom, (SELECT radius FROM sensitivity_species WHERE id = NEW.species_id), 4), {{ API_SRID }});
+    ELSE
+        NEW.geom_display = ST_Transform(NEW.geom, {{ API_SRID }});
+    END IF;
+    NEW.geom_display_area = ST_Area(NEW.geom_display);
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -13,4 +20,51 @@ $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER sensitivity_geom_buffered_intersection
     BEFORE INSERT OR UPDATE ON sensitivity_sensitivearea
-    FOR EACH ROW EXECUTE PROCEDURE sensitive_area_update_geom_buffered_intersection();
\ No newline at end of file
+    FOR EACH ROW EXECUTE PROCEDURE sensitive_area_update_geom_buffered_intersection();
+
+
+-------------------------------------------------------------------------------
+-- Keep period bitmask (bit 0 for January... bit 11 for December) of species
+-- up to date, and copy it on sensitive areas to filter them without join
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.species_update_period_mask() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    NEW.period_mask = NEW.period01::int | NEW.period02::int << 1 | NEW.period03::int << 2
+                      | NEW.period04::int << 3 | NEW.period05::int << 4 | NEW.period06::int << 5
+                      | NEW.period07::int << 6 | NEW.period08::int << 7 | NEW.period09::int << 8
+                      | NEW.period10::int << 9 | NEW.period11::int << 10 | NEW.period12::int << 11;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER sensitivity_species_period_mask_iu_tgr
+    BEFORE INSERT OR UPDATE ON sensitivity_species
+    FOR EACH ROW EXECUTE PROCEDURE species_update_period_mask();
+
+
+CREATE FUNCTION {{ schema_geotrek }}.species_propagate_to_sensitive_areas() RETURNS trigger SECURITY DEFINER AS $$
+-- Display geometries of areas are computed again from radius by their own trigger
+BEGIN
+    UPDATE sensitivity_sensitivearea SET period_mask = NEW.period_mask WHERE species_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- No column list: period_mask is set by BEFORE trigger, not by UPDATE statements of periods
+CREATE TRIGGER sensitivity_species_propagate_u_tgr
+    AFTER UPDATE ON sensitivity_species
+    FOR EACH ROW WHEN (OLD.period_mask IS DISTINCT FROM NEW.period_mask OR OLD.radius IS DISTINCT FROM NEW.radius)
+    EXECUTE PROCEDURE species_propagate_to_sensitive_areas();
+
+
+CREATE FUNCTION {{ schema_geotrek }}.sensitive_area_update_period_mask() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    NEW.period_mask = (SELECT period_mask FROM sensitivity_species WHERE id = NEW.species_id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER sensitivity_sensitivearea_period_mask_iu_tgr
+    BEFORE INSERT OR UPDATE OF species_id ON sensitivity_sensitivearea
+    FOR EACH ROW EXECUTE PROCEDURE sensitive_area_update_period_mask();
@@ -3,3 +3,6 @@
 DROP VIEW IF EXISTS v_sensitivearea CASCADE;
 DROP TRIGGER IF EXISTS sensitivity_geom_buffered_intersection ON sensitivity_sensitivearea;
 DROP FUNCTION IF EXISTS {{ schema_geotrek }}.sensitive_area_update_geom_buffered_intersection() CASCADE;
+DROP FUNCTION IF EXISTS {{ schema_geotrek }}.species_update_period_mask() CASCADE;
+DROP FUNCTION IF EXISTS {{ schema_geotrek }}.species_propagate_to_sensitive_areas() CASCADE;
+DROP FUNCTION IF EXISTS {{ schema_geotrek }}.sensitive_area_update_period_mask() CASCADE;
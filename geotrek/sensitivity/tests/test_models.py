@@ -4,6 +4,7 @@ from django.test import TestCase
 from django.test.utils import override_settings
 from django.conf import settings
 
+from geotrek.sensitivity.models import Species
 from geotrek.trekking.tests.factories import TrekFactory
 from .factories import SensitiveAreaFactory, SpeciesFactory, RuleFactory
 
@@ -20,6 +21,37 @@ class SensitiveAreaModelTest(TestCase):
         sensitive_area = SensitiveAreaFactory.create(species=specie)
         self.assertEqual(sensitive_area.radius, 50)
 
+    def test_period_mask(self):
+        species = SpeciesFactory.create(period06=False, period07=False, period01=True, period12=True)
+        sensitive_area = SensitiveAreaFactory.create(species=species)
+        self.assertEqual(sensitive_area.period_mask, 0b100000000001)
+        species.period01 = False
+        species.period02 = True
+        species.save()
+        sensitive_area.refresh_from_db()
+        self.assertEqual(sensitive_area.period_mask, 0b100000000010)
+        sensitive_area.species = SpeciesFactory.create()
+        sensitive_area.save()
+        self.assertEqual(sensitive_area.period_mask, 0b000001100000)
+
+    def test_period_mask_follows_species_queryset_update(self):
+        species = SpeciesFactory.create(period06=False, period07=False, period01=True)
+        sensitive_area = SensitiveAreaFactory.create(species=species)
+        Species.objects.filter(pk=species.pk).update(period03=True)
+        sensitive_area.refresh_from_db()
+        self.assertEqual(sensitive_area.period_mask, 0b000000000101)
+
+    def test_geom_display(self):
+        species = SpeciesFactory.create(radius=50)
+        sensitive_area = SensitiveAreaFactory.create(species=species, geom='SRID=2154;POINT (700000 6600000)')
+        self.assertEqual(sensitive_area.geom_display.srid, settings.API_SRID)
+        self.assertEqual(sensitive_area.geom_display.geom_type, 'Polygon')
+        area = sensitive_area.geom_display_area
+        species.radius = 100
+        species.save()
+        sensitive_area.refresh_from_db()
+        self.assertAlmostEqual(sensitive_area.geom_display_area / area, 4, places=1)
+
     def test_no_radius(self):
         sensitive_area = SensitiveAreaFactory.create()
         self.assertEqual(sensitive_area.radius, settings.SENSITIVITY_DEFAULT_RADIUS)
@@ -8,6 +8,7 @@ from mapentity.tests import SuperUserFactory
 
 from geotrek.authent.tests.factories import StructureFactory, UserProfileFactory
 from geotrek.authent.tests.base import AuthentFixturesTest
+from geotrek.sensitivity.models import SensitiveArea
 from geotrek.sensitivity.tests.factories import (
     SpeciesFactory,
     RegulatorySensitiveAreaFactory,
@@ -47,6 +48,11 @@ class SensitiveAreaViewsSameStructureTests(AuthentFixturesTest):
         response = self.client.get(url)
         self.assertRedirects(response, reverse("sensitivity:sensitivearea_detail", kwargs={"pk": self.area2.pk}))
 
+    def test_csv_export_period(self):
+        response = self.client.get(SensitiveArea.get_format_list_url() + '?format=csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('"June, July"', response.content.decode())
+
     def test_can_delete_same_structure(self):
         url = reverse("sensitivity:sensitivearea_delete", kwargs={"pk": self.area1.pk})
         response = self.client.get(url)
@@ -331,14 +331,20 @@ CACHES = {
     },
     # The fat backend is used to store big chunk of data (>1 Mo)
     'fat': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'BACKEND': 'geotrek.common.cache_backends.ShardedFileBasedCache',
         'LOCATION': os.path.join(CACHE_ROOT, 'fat'),
         'TIMEOUT': 2592000,  # 30 days
+        'OPTIONS': {
+            'MAX_SIZE': 2 * 1024 ** 3,  # bytes, least recently used entries are removed above
+        },
     },
     'api_v2': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'BACKEND': 'geotrek.common.cache_backends.ShardedFileBasedCache',
         'LOCATION': os.path.join(CACHE_ROOT, 'api_v2'),
         'TIMEOUT': 2592000,  # 30 days
+        'OPTIONS': {
+            'MAX_SIZE': 2 * 1024 ** 3,  # bytes, least recently used entries are removed above
+        },
     }
 }
 
@@ -629,6 +635,8 @@ MESSAGE_TAGS = {
 }
 
 CACHE_TIMEOUT_LAND_LAYERS = 60 * 60 * 24
+# Versions are bumped on save / delete, timeout only catches changes made at DB-level (triggers)
+CACHE_TIMEOUT_OBJECT_VERSION = 60 * 60
 
 TREK_CATEGORY_ORDER = 1
 ITINERANCY_CATEGORY_ORDER = 2
@@ -704,6 +712,9 @@ SWAGGER_SETTINGS = {
 }
 
 API_IS_PUBLIC = True
+API_V2_LIST_CACHE_MAX_ENTRY_SIZE = 5 * 1024 * 1024  # bytes, bigger list responses are not cached
+API_V2_SERVER_TIMING = False  # add SQL, cache, serialization and rendering metrics to APIv2 responses and logs
+API_V2_CHANGES_RETENTION_DAYS = 30  # changes older are removed from changes feeds by purge_changes command
 
 SENSITIVITY_DEFAULT_RADIUS = 100  # meters
 SENSITIVE_AREA_INTERSECTION_MARGIN = 500  # meters (always used)
@@ -0,0 +1,11 @@
+-------------------------------------------------------------------------------
+-- Log changes of touristic contents and events for APIv2 changes feeds
+-------------------------------------------------------------------------------
+
+CREATE TRIGGER tourism_touristiccontent_log_change_iud_tgr
+    AFTER INSERT OR UPDATE OR DELETE ON tourism_touristiccontent
+    FOR EACH ROW EXECUTE PROCEDURE ft_log_change('tourism.touristiccontent', 'id');
+
+CREATE TRIGGER tourism_touristicevent_log_change_iud_tgr
+    AFTER INSERT OR UPDATE OR DELETE ON tourism_touristicevent
+    FOR EACH ROW EXECUTE PROCEDURE ft_log_change('tourism.touristicevent', 'id');
@@ -0,0 +1,6 @@
+-------------------------------------------------------------------------------
+-- Published and not deleted touristic contents and events
+-------------------------------------------------------------------------------
+
+{% include "common/sql/published_indexes.sql" with table="tourism_touristiccontent" pk="id" deleted=True %}
+{% include "common/sql/published_indexes.sql" with table="tourism_touristicevent" pk="id" deleted=True %}
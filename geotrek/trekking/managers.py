@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.contrib.gis.db import models
+from modeltranslation.utils import build_localized_fieldname, get_language
 
 from geotrek.common.mixins.managers import NoDeleteManager, ProviderChoicesMixin
 from geotrek.core.managers import TopologyManager
@@ -14,6 +16,19 @@ class TrekOrderedChildManager(models.Manager):
         return qs.exclude(parent__deleted=True).exclude(child__deleted=True)
 
 
+class TrekStepManager(models.Manager):
+    @staticmethod
+    def get_parent_published_lookup(language=None):
+        """ lookup of parent trek publication in language (current one by default) """
+        if not settings.PUBLISHED_BY_LANG:
+            return 'parent__published'
+        return 'parent__{}'.format(build_localized_fieldname('published', language or get_language()))
+
+    def published(self, language=None):
+        """ steps of treks published in language (current one by default) """
+        return self.filter(**{self.get_parent_published_lookup(language): True})
+
+
 class TrekManager(TopologyManager, ProviderChoicesMixin):
     pass
 
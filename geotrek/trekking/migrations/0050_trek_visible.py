@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekking', '0049_auto_20240417_1519'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trek',
+            name='visible',
+            field=models.BooleanField(default=False, editable=False, help_text='Published or child of a published trek (maintained by database)', verbose_name='Visible'),
+        ),
+    ]
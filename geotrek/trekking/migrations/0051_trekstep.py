@@ -0,0 +1,29 @@
+# Generated by Django 4.2.13 on 2026-10-19 16:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trekking', '0050_trek_visible'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrekStep',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveIntegerField()),
+                ('child', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='parent_steps', to='trekking.trek')),
+                ('next', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='trekking.trek')),
+                ('parent', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='steps', to='trekking.trek')),
+                ('previous', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='trekking.trek')),
+            ],
+            options={
+                'ordering': ('parent_id', 'order'),
+                'unique_together': {('parent', 'child')},
+            },
+        ),
+    ]
@@ -37,7 +37,7 @@ from geotrek.core.models import Path, Topology, simplify_coords
 from geotrek.maintenance.models import Intervention, Project
 from geotrek.tourism import models as tourism_models
 from geotrek.trekking.managers import (POIManager, ServiceManager, TrekManager,
-                                       TrekOrderedChildManager, WebLinkManager)
+                                       TrekOrderedChildManager, TrekStepManager, WebLinkManager)
 
 logger = logging.getLogger(__name__)
 
@@ -60,6 +60,29 @@ class OrderedTrekChild(models.Model):
         )
 
 
+class TrekStep(models.Model):
+    """
+    Steps of treks with their previous and next steps, denormalized from OrderedTrekChild
+    by database triggers (see post_70_steps.sql). Deleted treks are neither parents nor steps.
+    `order` is the position of the step, starting at 1.
+    """
+    parent = models.ForeignKey('Trek', related_name='steps', on_delete=models.DO_NOTHING, db_constraint=False)
+    child = models.ForeignKey('Trek', related_name='parent_steps', on_delete=models.DO_NOTHING, db_constraint=False)
+    order = models.PositiveIntegerField()
+    previous = models.ForeignKey('Trek', related_name='+', on_delete=models.DO_NOTHING, db_constraint=False,
+                                 db_index=False, null=True)
+    next = models.ForeignKey('Trek', related_name='+', on_delete=models.DO_NOTHING, db_constraint=False,
+                             db_index=False, null=True)
+
+    objects = TrekStepManager()
+
+    class Meta:
+        ordering = ('parent_id', 'order')
+        unique_together = (
+            ('parent', 'child'),
+        )
+
+
 class Practice(TimeStampedModelMixin, PictogramMixin):
     name = models.CharField(verbose_name=_("Name"), max_length=128)
     distance = models.IntegerField(verbose_name=_("Distance"), blank=True, null=True,
@@ -212,6 +235,8 @@ class Trek(Topology, StructureRelated, PicturesMixin, PublishableMixin, GeotrekM
                                            on_delete=models.SET_NULL, blank=True, null=True)
     reservation_id = models.CharField(verbose_name=_("Reservation ID"), max_length=1024,
                                       blank=True)
+    visible = models.BooleanField(verbose_name=_("Visible"), default=False, editable=False,
+                                  help_text=_("Published or child of a published trek (maintained by database)"))
     attachments_accessibility = GenericRelation('common.AccessibilityAttachment')
     view_points = GenericRelation('common.HDViewPoint', related_query_name='trek')
 
@@ -374,54 +399,42 @@ class Trek(Topology, StructureRelated, PicturesMixin, PublishableMixin, GeotrekM
 
     @property
     def parents(self):
-        return Trek.objects.filter(trek_children__child=self, deleted=False)
+        return Trek.objects.filter(steps__child=self)
 
     @property
     def parents_id(self):
-        parents = self.trek_parents.values_list('parent__id', flat=True)
-        return list(parents)
+        return list(self.parent_steps.order_by('parent_id').values_list('parent_id', flat=True))
 
     @property
     def children(self):
-        return Trek.objects.filter(trek_parents__parent=self, deleted=False).order_by('trek_parents__order')
+        return Trek.objects.filter(parent_steps__parent=self).order_by('parent_steps__order')
 
     @property
     def children_id(self):
         """
         Get children IDs
         """
-        children = self.trek_children.order_by('order')\
-                                     .values_list('child__id',
-                                                  flat=True)
-        return children
+        return list(self.steps.values_list('child_id', flat=True))
 
     def previous_id_for(self, parent):
-        children_id = list(parent.children_id)
-        index = children_id.index(self.id)
-        if index == 0:
-            return None
-        return children_id[index - 1]
+        return self.parent_steps.filter(parent=parent).values_list('previous_id', flat=True).first()
 
     def next_id_for(self, parent):
-        children_id = list(parent.children_id)
-        index = children_id.index(self.id)
-        if index == len(children_id) - 1:
-            return None
-        return children_id[index + 1]
+        return self.parent_steps.filter(parent=parent).values_list('next_id', flat=True).first()
 
     @property
     def previous_id(self):
         """
-        Dict of parent -> previous child
+        Dict of published parent -> previous child
         """
-        return {parent.id: self.previous_id_for(parent) for parent in self.parents.filter(published=True, deleted=False)}
+        return dict(self.parent_steps.published().values_list('parent_id', 'previous_id'))
 
     @property
     def next_id(self):
         """
-        Dict of parent -> next child
+        Dict of published parent -> next child
         """
-        return {parent.id: self.next_id_for(parent) for parent in self.parents.filter(published=True, deleted=False)}
+        return dict(self.parent_steps.published().values_list('parent_id', 'next_id'))
 
     def clean(self):
         """
@@ -0,0 +1,22 @@
+-------------------------------------------------------------------------------
+-- Log changes of treks and POIs for APIv2 changes feeds, including
+-- deletion flag and geometries stored on their topology
+-------------------------------------------------------------------------------
+
+CREATE TRIGGER trekking_trek_log_change_iud_tgr
+    AFTER INSERT OR UPDATE OR DELETE ON trekking_trek
+    FOR EACH ROW EXECUTE PROCEDURE ft_log_change('trekking.trek', 'topo_object_id');
+
+CREATE TRIGGER core_topology_log_trek_change_ud_tgr
+    AFTER UPDATE OR DELETE ON core_topology
+    FOR EACH ROW WHEN (OLD.kind = 'TREK')
+    EXECUTE PROCEDURE ft_log_change('trekking.trek', 'id');
+
+CREATE TRIGGER trekking_poi_log_change_iud_tgr
+    AFTER INSERT OR UPDATE OR DELETE ON trekking_poi
+    FOR EACH ROW EXECUTE PROCEDURE ft_log_change('trekking.poi', 'topo_object_id');
+
+CREATE TRIGGER core_topology_log_poi_change_ud_tgr
+    AFTER UPDATE OR DELETE ON core_topology
+    FOR EACH ROW WHEN (OLD.kind = 'POI')
+    EXECUTE PROCEDURE ft_log_change('trekking.poi', 'id');
@@ -0,0 +1,90 @@
+-------------------------------------------------------------------------------
+-- Keep visible flags of treks (published, or child of a published and
+-- not deleted trek), by language, up to date
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.treks_visible_iu() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    NEW.visible := COALESCE(NEW.published, FALSE) OR EXISTS (
+        SELECT 1 FROM trekking_orderedtrekchild o
+            JOIN trekking_trek p ON p.topo_object_id = o.parent_id
+            JOIN core_topology t ON t.id = o.parent_id
+        WHERE o.child_id = NEW.topo_object_id AND NOT t.deleted AND p.published
+    );
+    {% if PUBLISHED_BY_LANG %}{% for lang in MODELTRANSLATION_LANGUAGES %}
+    NEW.visible_{{ lang }} := COALESCE(NEW.published_{{ lang }}, FALSE) OR EXISTS (
+        SELECT 1 FROM trekking_orderedtrekchild o
+            JOIN trekking_trek p ON p.topo_object_id = o.parent_id
+            JOIN core_topology t ON t.id = o.parent_id
+        WHERE o.child_id = NEW.topo_object_id AND NOT t.deleted AND p.published_{{ lang }}
+    );
+    {% endfor %}{% endif %}
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trekking_trek_visible_iu_tgr
+    BEFORE INSERT OR UPDATE ON trekking_trek
+    FOR EACH ROW EXECUTE PROCEDURE treks_visible_iu();
+
+
+CREATE FUNCTION {{ schema_geotrek }}.update_treks_visible(trek_ids integer[]) RETURNS void SECURITY DEFINER AS $$
+BEGIN
+    -- Flags are computed by treks_visible_iu() trigger
+    UPDATE trekking_trek SET visible = visible WHERE topo_object_id = ANY(trek_ids);
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Publication or deletion of parent trek (id given by column TG_ARGV[0])
+
+CREATE FUNCTION {{ schema_geotrek }}.treks_children_visible_u() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    PERFORM update_treks_visible(ARRAY(
+        SELECT child_id FROM trekking_orderedtrekchild
+        WHERE parent_id = (to_jsonb(NEW) ->> TG_ARGV[0])::integer
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trekking_trek_children_visible_u_tgr
+    AFTER UPDATE ON trekking_trek
+    FOR EACH ROW WHEN (OLD.published IS DISTINCT FROM NEW.published{% if PUBLISHED_BY_LANG %}{% for lang in MODELTRANSLATION_LANGUAGES %}
+                       OR OLD.published_{{ lang }} IS DISTINCT FROM NEW.published_{{ lang }}{% endfor %}{% endif %})
+    EXECUTE PROCEDURE treks_children_visible_u('topo_object_id');
+
+CREATE TRIGGER core_topology_children_visible_u_tgr
+    AFTER UPDATE OF deleted ON core_topology
+    FOR EACH ROW WHEN (NEW.kind = 'TREK' AND OLD.deleted IS DISTINCT FROM NEW.deleted)
+    EXECUTE PROCEDURE treks_children_visible_u('id');
+
+
+-- Link of child trek to a parent
+
+CREATE FUNCTION {{ schema_geotrek }}.ordered_trek_child_visible_iud() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM update_treks_visible(ARRAY[NEW.child_id]);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM update_treks_visible(ARRAY[OLD.child_id]);
+    ELSE
+        PERFORM update_treks_visible(ARRAY[OLD.child_id, NEW.child_id]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trekking_orderedtrekchild_visible_iud_tgr
+    AFTER INSERT OR UPDATE OF parent_id, child_id OR DELETE ON trekking_orderedtrekchild
+    FOR EACH ROW EXECUTE PROCEDURE ordered_trek_child_visible_iud();
+
+
+-- Flags of existing treks, and indexes used by APIs filters
+
+UPDATE trekking_trek SET visible = visible;
+
+CREATE INDEX IF NOT EXISTS trekking_trek_visible_idx ON trekking_trek (topo_object_id) WHERE visible;
+{% if PUBLISHED_BY_LANG %}{% for lang in MODELTRANSLATION_LANGUAGES %}
+CREATE INDEX IF NOT EXISTS trekking_trek_visible_{{ lang }}_idx ON trekking_trek (topo_object_id) WHERE visible_{{ lang }};
+{% endfor %}{% endif %}
@@ -0,0 +1,6 @@
+-------------------------------------------------------------------------------
+-- Published treks and POIs (deleted flag is stored on their topology)
+-------------------------------------------------------------------------------
+
+{% include "common/sql/published_indexes.sql" with table="trekking_trek" pk="topo_object_id" %}
+{% include "common/sql/published_indexes.sql" with table="trekking_poi" pk="topo_object_id" %}
@@ -0,0 +1,57 @@
+-------------------------------------------------------------------------------
+-- Keep steps of treks (children of not deleted parents, ordered, with their
+-- previous and next steps) up to date
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.update_trek_steps(parent_ids integer[]) RETURNS void SECURITY DEFINER AS $$
+BEGIN
+    DELETE FROM trekking_trekstep WHERE parent_id = ANY(parent_ids);
+    INSERT INTO trekking_trekstep (parent_id, child_id, "order", previous_id, next_id)
+        SELECT o.parent_id, o.child_id, row_number() OVER w, lag(o.child_id) OVER w, lead(o.child_id) OVER w
+        FROM trekking_orderedtrekchild o
+            JOIN core_topology p ON p.id = o.parent_id
+            JOIN core_topology c ON c.id = o.child_id
+        WHERE o.parent_id = ANY(parent_ids) AND NOT p.deleted AND NOT c.deleted
+        WINDOW w AS (PARTITION BY o.parent_id ORDER BY o."order", o.id);
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE FUNCTION {{ schema_geotrek }}.ordered_trek_child_steps_iud() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM update_trek_steps(ARRAY[NEW.parent_id]);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM update_trek_steps(ARRAY[OLD.parent_id]);
+    ELSE
+        PERFORM update_trek_steps(ARRAY[OLD.parent_id, NEW.parent_id]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trekking_orderedtrekchild_steps_iud_tgr
+    AFTER INSERT OR UPDATE OR DELETE ON trekking_orderedtrekchild
+    FOR EACH ROW EXECUTE PROCEDURE ordered_trek_child_steps_iud();
+
+
+-- Deletion of parent or step trek
+
+CREATE FUNCTION {{ schema_geotrek }}.topology_trek_steps_u() RETURNS trigger SECURITY DEFINER AS $$
+BEGIN
+    PERFORM update_trek_steps(ARRAY[NEW.id] || ARRAY(
+        SELECT parent_id FROM trekking_orderedtrekchild WHERE child_id = NEW.id
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_topology_trek_steps_u_tgr
+    AFTER UPDATE OF deleted ON core_topology
+    FOR EACH ROW WHEN (NEW.kind = 'TREK' AND OLD.deleted IS DISTINCT FROM NEW.deleted)
+    EXECUTE PROCEDURE topology_trek_steps_u();
+
+
+-- Steps of existing treks
+
+SELECT update_trek_steps(ARRAY(SELECT DISTINCT parent_id FROM trekking_orderedtrekchild));
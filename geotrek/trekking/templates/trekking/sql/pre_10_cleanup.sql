@@ -13,4 +13,17 @@ DROP FUNCTION IF EXISTS cleanup_relationships_d() CASCADE;
 DROP VIEW IF EXISTS o_v_itineraire CASCADE;
 DROP VIEW IF EXISTS v_treks CASCADE;
 DROP VIEW IF EXISTS o_v_poi CASCADE;
-DROP VIEW IF EXISTS v_pois CASCADE;
\ No newline at end of file
+DROP VIEW IF EXISTS v_pois CASCADE;
+
+-- 50
+
+DROP FUNCTION IF EXISTS treks_visible_iu() CASCADE;
+DROP FUNCTION IF EXISTS update_treks_visible(integer[]) CASCADE;
+DROP FUNCTION IF EXISTS treks_children_visible_u() CASCADE;
+DROP FUNCTION IF EXISTS ordered_trek_child_visible_iud() CASCADE;
+
+-- 70
+
+DROP FUNCTION IF EXISTS update_trek_steps(integer[]) CASCADE;
+DROP FUNCTION IF EXISTS ordered_trek_child_steps_iud() CASCADE;
+DROP FUNCTION IF EXISTS topology_trek_steps_u() CASCADE;
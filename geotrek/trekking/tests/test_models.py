@@ -18,7 +18,7 @@ from geotrek.common.tests.factories import LabelFactory, AttachmentImageFactory,
 from geotrek.common.tests import TranslationResetMixin
 from geotrek.core.tests.factories import PathFactory
 from geotrek.trekking.models import (OrderedTrekChild, Rating, RatingScale,
-                                     Trek)
+                                     Trek, TrekStep)
 from geotrek.trekking.tests.factories import (POIFactory, PracticeFactory,
                                               RatingFactory,
                                               RatingScaleFactory,
@@ -489,6 +489,75 @@ class TrekItinerancyTest(TestCase):
         self.assertEqual(list(trekC.children_id), [trekA.id])
 
 
+class TrekVisibleTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = TrekFactory(published=False, published_en=False, published_fr=True)
+        cls.child = TrekFactory(published=False, published_en=False, published_fr=False)
+        OrderedTrekChild.objects.create(parent=cls.parent, child=cls.child)
+
+    def assertVisible(self, trek, en, fr):
+        self.assertEqual(Trek.objects.filter(pk=trek.pk).values_list('visible_en', 'visible_fr').get(), (en, fr))
+
+    def test_published_trek_is_visible(self):
+        self.assertVisible(self.parent, False, True)
+        self.parent.published_en = True
+        self.parent.save()
+        self.assertVisible(self.parent, True, True)
+
+    def test_child_of_published_trek_is_visible(self):
+        self.assertVisible(self.child, False, True)
+
+    def test_child_follows_parent_publication(self):
+        self.parent.published_en = True
+        self.parent.published_fr = False
+        self.parent.save()
+        self.assertVisible(self.child, True, False)
+
+    def test_child_of_deleted_parent_is_not_visible(self):
+        self.parent.delete()
+        self.assertVisible(self.child, False, False)
+
+    def test_removed_child_is_not_visible(self):
+        OrderedTrekChild.objects.filter(child=self.child).delete()
+        self.assertVisible(self.child, False, False)
+        OrderedTrekChild.objects.create(parent=self.parent, child=self.child)
+        self.assertVisible(self.child, False, True)
+
+    def test_saving_child_keeps_visible_flag(self):
+        self.child.name = "Child"
+        self.child.save()
+        self.assertVisible(self.child, False, True)
+
+
+class TrekStepTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = TrekFactory.create(name="Parent")
+        cls.children = [TrekFactory.create(name=name) for name in ("A", "B", "C")]
+        for order, child in enumerate(cls.children):
+            OrderedTrekChild.objects.create(parent=cls.parent, child=child, order=order)
+
+    def get_steps(self):
+        return list(TrekStep.objects.filter(parent=self.parent).values_list('child', 'order', 'previous', 'next'))
+
+    def test_steps_follow_children_order(self):
+        a, b, c = self.children
+        self.assertEqual(self.get_steps(), [(a.pk, 1, None, b.pk), (b.pk, 2, a.pk, c.pk), (c.pk, 3, b.pk, None)])
+        OrderedTrekChild.objects.filter(child=a).update(order=10)
+        self.assertEqual(self.get_steps(), [(b.pk, 1, None, c.pk), (c.pk, 2, b.pk, a.pk), (a.pk, 3, c.pk, None)])
+
+    def test_deleted_child_is_not_a_step(self):
+        a, b, c = self.children
+        b.delete()
+        self.assertEqual(self.get_steps(), [(a.pk, 1, None, c.pk), (c.pk, 2, a.pk, None)])
+
+    def test_deleted_parent_has_no_steps(self):
+        self.parent.delete()
+        self.assertEqual(self.get_steps(), [])
+        self.assertEqual(self.children[0].parents_id, [])
+
+
 class MapImageExtentTest(TestCase):
     @classmethod
     def setUpTestData(cls):
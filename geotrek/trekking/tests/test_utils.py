@@ -0,0 +1,49 @@
+from django.test import TestCase
+
+from geotrek.trekking.models import OrderedTrekChild, Trek
+from geotrek.trekking.tests.factories import TrekFactory
+from geotrek.trekking.utils import TrekStepsResolver
+
+
+class TrekStepsResolverTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = TrekFactory.create(name="Parent", published=True)
+        cls.unpublished_parent = TrekFactory.create(name="Unpublished parent", published=False)
+        cls.children = [TrekFactory.create(name=name) for name in ("C1", "C2", "C3")]
+        for order, child in zip((3, 1, 2), cls.children):
+            OrderedTrekChild.objects.create(parent=cls.parent, child=child, order=order)
+        OrderedTrekChild.objects.create(parent=cls.unpublished_parent, child=cls.children[0], order=1)
+        cls.treks = [cls.parent, cls.unpublished_parent] + cls.children
+
+    def test_steps_resolved_as_trek_properties(self):
+        expected = [(trek.children_id, trek.parents_id, trek.previous_id, trek.next_id) for trek in self.treks]
+        resolver = TrekStepsResolver(self.treks)
+        with self.assertNumQueries(1):
+            resolved = [(resolver.children_id(trek), resolver.parents_id(trek), resolver.previous_id(trek),
+                         resolver.next_id(trek)) for trek in self.treks]
+        self.assertEqual(resolved, expected)
+
+    def test_steps_of_published_parents(self):
+        resolver = TrekStepsResolver(self.treks)
+        c1, c2, c3 = self.children
+        self.assertEqual(resolver.children_id(self.parent), [c2.pk, c3.pk, c1.pk])
+        self.assertEqual(resolver.parents_id(c1), sorted([self.parent.pk, self.unpublished_parent.pk]))
+        self.assertEqual(resolver.previous_id(c1), {self.parent.pk: c3.pk})
+        self.assertEqual(resolver.next_id(c1), {self.parent.pk: None})
+        self.assertEqual(resolver.previous_id(c2), {self.parent.pk: None})
+
+    def test_trek_out_of_list_is_resolved_alone(self):
+        resolver = TrekStepsResolver([self.parent])
+        with self.assertNumQueries(1):
+            self.assertEqual(resolver.next_id(self.children[1]), {self.parent.pk: self.children[2].pk})
+
+    def test_children_steps_resolved_at_once(self):
+        resolver = TrekStepsResolver([self.parent, self.unpublished_parent])
+        with self.assertNumQueries(2):
+            children = resolver.get_children(self.parent, Trek.objects.all())
+            self.assertEqual(resolver.get_children(self.unpublished_parent, Trek.objects.all()), [self.children[0]])
+        self.assertEqual([child.name for child in children], ["C2", "C3", "C1"])
+        with self.assertNumQueries(1):
+            for child in children:
+                resolver.previous_id(child)
@@ -12,8 +12,8 @@ class TrekTO(TranslationOptions):
               'accessibility_infrastructure', 'advice', 'gear', 'accessibility_signage', 'accessibility_slope',
               'accessibility_covering', 'accessibility_exposure', 'accessibility_width',
               'accessibility_advice', 'advised_parking', 'public_transport', 'ratings_description') + (
-        ('published',) if settings.PUBLISHED_BY_LANG else tuple())
-    fallback_undefined = {'published': None}
+        ('published', 'visible') if settings.PUBLISHED_BY_LANG else tuple())
+    fallback_undefined = {'published': None, 'visible': None}
 
 
 class POITO(TranslationOptions):
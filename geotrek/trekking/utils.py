@@ -0,0 +1,66 @@
+from django.db.models import Q
+
+from geotrek.trekking.models import TrekStep
+
+
+class TrekStepsResolver:
+    """
+    Resolve parents, children, previous and next steps of a list of treks (a page of API results)
+    from their denormalized steps, with one query. Previous and next steps are given for parents
+    published in current language only, as Trek.previous_id and Trek.next_id.
+    Children treks read for a trek are added to the list, so that their own steps are resolved at once.
+    """
+
+    def __init__(self, treks):
+        self.treks = list(treks)
+        self.children = {}
+        self.parents = {}
+        self.children_treks = {}
+
+    def resolve(self, trek):
+        if trek.pk in self.parents:
+            return
+        pks = [item.pk for item in self.treks if item.pk not in self.parents]
+        if trek.pk not in pks:
+            pks = [trek.pk]
+        for pk in pks:
+            self.children[pk] = []
+            self.parents[pk] = []
+        steps = TrekStep.objects.filter(Q(parent__in=pks) | Q(child__in=pks)).values_list(
+            'parent_id', 'child_id', 'previous_id', 'next_id', TrekStep.objects.get_parent_published_lookup()
+        )
+        for parent_id, child_id, previous_id, next_id, published in steps:
+            if parent_id in self.children:
+                self.children[parent_id].append(child_id)
+            if child_id in self.parents:
+                self.parents[child_id].append((parent_id, previous_id, next_id, published))
+
+    def children_id(self, trek):
+        self.resolve(trek)
+        return self.children[trek.pk]
+
+    def parents_id(self, trek):
+        self.resolve(trek)
+        return sorted(parent_id for parent_id, previous_id, next_id, published in self.parents[trek.pk])
+
+    def previous_id(self, trek):
+        self.resolve(trek)
+        return {parent_id: previous_id for parent_id, previous_id, next_id, published in self.parents[trek.pk]
+                if published}
+
+    def next_id(self, trek):
+        self.resolve(trek)
+        return {parent_id: next_id for parent_id, previous_id, next_id, published in self.parents[trek.pk]
+                if published}
+
+    def get_children(self, trek, queryset):
+        """
+        Return children treks of trek, read from queryset with children of every resolved trek at once
+        """
+        self.resolve(trek)
+        missing = {pk for children in self.children.values() for pk in children if pk not in self.children_treks}
+        if missing:
+            children = list(queryset.filter(pk__in=missing))
+            self.children_treks.update({child.pk: child for child in children})
+            self.treks += children
+        return [self.children_treks[pk] for pk in self.children[trek.pk] if pk in self.children_treks]
@@ -1,10 +1,10 @@
 from django_filters import FilterSet
-from django.db.models import Q, Exists, OuterRef
 from django.utils.translation import gettext_lazy as _
 
 
 from geotrek.common.filters import RightFilter
 from geotrek.zoning.models import City, District, RestrictedArea, RestrictedAreaType
+from geotrek.zoning.utils import filter_intersecting
 
 
 class IntersectionFilter(RightFilter):
@@ -13,10 +13,9 @@ class IntersectionFilter(RightFilter):
     """
 
     def filter(self, qs, value):
-        q = Q()
-        for subvalue in value:
-            q |= Q(geom__intersects=subvalue.geom)
-        return qs.filter(q)
+        if not value:
+            return qs
+        return filter_intersecting(qs, self.model, pk__in=[subvalue.pk for subvalue in value])
 
 
 class IntersectionFilterCity(IntersectionFilter):
@@ -33,13 +32,14 @@ class IntersectionFilterRestrictedAreaType(RightFilter):
     def filter(self, qs, value):
         if not value:
             return qs
-        return qs.filter(Exists(RestrictedArea.objects.filter(area_type__in=value, geom__intersects=OuterRef('geom'))))
+        return filter_intersecting(qs, RestrictedArea, area_type__in=value)
 
     def get_queryset(self, request=None):
         return super().get_queryset().order_by("name")
 
 
 class IntersectionFilterRestrictedArea(IntersectionFilter):
+    model = RestrictedArea
     queryset = RestrictedArea.objects.all().select_related("area_type")
 
 
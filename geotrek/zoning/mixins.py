@@ -4,7 +4,8 @@ from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 
 from geotrek.common.utils import intersecting, uniquify
-from .models import RestrictedArea, District, City
+from .models import RestrictedArea, District, City, ZoningMembership
+from .utils import get_zonings_by_memberships
 
 
 class ZoningPropertiesMixin:
@@ -14,7 +15,23 @@ class ZoningPropertiesMixin:
     def zoning_property(self):
         return self
 
+    @property
+    def has_zoning_memberships(self):
+        """ Links to zoning layers are kept up to date by triggers """
+        return self.zoning_property.pk is not None and \
+            ZoningMembership.get_geometry_model(type(self.zoning_property)) is not None
+
+    def get_zonings_by_memberships(self, layer_model, select_related=()):
+        """ return objects of zoning layer linked to object, or None if its memberships are not maintained """
+        if not self.has_zoning_memberships:
+            return None
+        obj = self.zoning_property
+        return get_zonings_by_memberships(layer_model, type(obj), [obj.pk], select_related)[obj.pk]
+
     def get_areas(self):
+        areas = self.get_zonings_by_memberships(RestrictedArea, select_related=('area_type', ))
+        if areas is not None:
+            return areas
         return uniquify(intersecting(RestrictedArea,
                                      self.zoning_property,
                                      distance=0,
@@ -22,6 +39,8 @@ class ZoningPropertiesMixin:
 
     @property
     def areas(self):
+        if self.has_zoning_memberships:
+            return self.get_areas()
         last_update_and_count = RestrictedArea.last_update_and_count
         last_update_iso_format = last_update_and_count['last_update'].isoformat() if last_update_and_count[
             'last_update'] else 'no-data'
@@ -35,10 +54,15 @@ class ZoningPropertiesMixin:
         return areas
 
     def get_districts(self):
+        districts = self.get_zonings_by_memberships(District)
+        if districts is not None:
+            return districts
         return uniquify(intersecting(District, self.zoning_property, distance=0, defer=('geom',)))
 
     @property
     def districts(self):
+        if self.has_zoning_memberships:
+            return self.get_districts()
         last_update_and_count = District.last_update_and_count
         last_update_iso_format = last_update_and_count['last_update'].isoformat() if last_update_and_count['last_update'] else 'no-data'
         count = last_update_and_count['count']
@@ -51,10 +75,15 @@ class ZoningPropertiesMixin:
         return districts
 
     def get_cities(self):
+        cities = self.get_zonings_by_memberships(City)
+        if cities is not None:
+            return cities
         return uniquify(intersecting(City, self.zoning_property, distance=0, defer=('geom',)))
 
     @property
     def cities(self):
+        if self.has_zoning_memberships:
+            return self.get_cities()
         last_update_and_count = City.last_update_and_count
         last_update_iso_format = last_update_and_count['last_update'].isoformat() if last_update_and_count[
             'last_update'] else 'no-data'
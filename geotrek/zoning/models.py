@@ -5,8 +5,10 @@
 
 """
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db import models
 from django.contrib.postgres.indexes import GistIndex
+from django.core.exceptions import FieldDoesNotExist
 from django.utils.translation import gettext_lazy as _
 
 from geotrek.common.mixins.models import TimeStampedModelMixin
@@ -73,3 +75,67 @@ class District(TimeStampedModelMixin, models.Model):
 
     def __str__(self):
         return self.name
+
+
+class ZoningMembership(models.Model):
+    """
+    Link between an object and a zoning layer intersecting its geometry,
+    maintained by triggers on both sides (see zoning/sql/post_30_memberships.sql).
+    Objects are identified by the model holding their geometry column: treks, POIs... are linked as topologies.
+    """
+    # Models with geometry column maintained by triggers, as (app_label, model)
+    MODELS = (
+        ('core', 'topology'),
+        ('core', 'path'),
+        ('tourism', 'touristiccontent'),
+        ('tourism', 'touristicevent'),
+        ('outdoor', 'site'),
+        ('outdoor', 'course'),
+        ('diving', 'dive'),
+        ('feedback', 'report'),
+    )
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    # Position of intersection along linear geometries, to order layers as ZoningPropertiesMixin
+    position = models.FloatField(null=True)
+
+    class Meta:
+        abstract = True
+
+    @staticmethod
+    def get_geometry_model(model):
+        """ return model holding geometry column of given model, or None if its memberships are not maintained """
+        try:
+            geometry_model = model._meta.get_field('geom').model._meta.concrete_model
+        except FieldDoesNotExist:
+            return None
+        if (geometry_model._meta.app_label, geometry_model._meta.model_name) not in ZoningMembership.MODELS:
+            return None
+        return geometry_model
+
+    @classmethod
+    def for_model(cls, model):
+        """ memberships of given model objects, to be joined on object_id """
+        return cls.objects.filter(content_type=ContentType.objects.get_for_model(cls.get_geometry_model(model)))
+
+
+class CityMembership(ZoningMembership):
+    city = models.ForeignKey(City, related_name='memberships', on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'city')
+
+
+class DistrictMembership(ZoningMembership):
+    district = models.ForeignKey(District, related_name='memberships', on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'district')
+
+
+class RestrictedAreaMembership(ZoningMembership):
+    area = models.ForeignKey(RestrictedArea, related_name='memberships', on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'area')
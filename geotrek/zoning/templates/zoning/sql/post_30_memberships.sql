@@ -0,0 +1,178 @@
+-------------------------------------------------------------------------------
+-- Keep links between objects and cities / districts / restricted areas
+-- (ZoningMembership models) up to date, when either side geometry changes
+-------------------------------------------------------------------------------
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_position(object_geom geometry, zoning_geom geometry) RETURNS float AS $$
+-- Position of first intersection along linear objects, NULL for other geometries
+BEGIN
+    IF GeometryType(object_geom) != 'LINESTRING' THEN
+        RETURN NULL;
+    END IF;
+    RETURN (SELECT min(ST_LineLocatePoint(object_geom, ST_StartPoint(part.geom)))
+            FROM ST_Dump(ST_Intersection(object_geom, zoning_geom)) AS part);
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_membership_sources() RETURNS TABLE (object_table text, app_label text, model text) AS $$
+-- Tables with geometry linked to zoning layers (see ZoningMembership.MODELS)
+    VALUES
+        ('core_topology', 'core', 'topology'),
+        ('core_path', 'core', 'path')
+        {% if 'geotrek.tourism' in INSTALLED_APPS %},
+        ('tourism_touristiccontent', 'tourism', 'touristiccontent'),
+        ('tourism_touristicevent', 'tourism', 'touristicevent')
+        {% endif %}{% if 'geotrek.outdoor' in INSTALLED_APPS %},
+        ('outdoor_site', 'outdoor', 'site'),
+        ('outdoor_course', 'outdoor', 'course')
+        {% endif %}{% if 'geotrek.diving' in INSTALLED_APPS %},
+        ('diving_dive', 'diving', 'dive')
+        {% endif %}{% if 'geotrek.feedback' in INSTALLED_APPS %},
+        ('feedback_report', 'feedback', 'report')
+        {% endif %};
+$$ LANGUAGE sql;
+
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_update_object_memberships(ct integer, obj_id integer, obj_geom geometry) RETURNS void AS $$
+BEGIN
+    DELETE FROM zoning_citymembership WHERE content_type_id = ct AND object_id = obj_id;
+    DELETE FROM zoning_districtmembership WHERE content_type_id = ct AND object_id = obj_id;
+    DELETE FROM zoning_restrictedareamembership WHERE content_type_id = ct AND object_id = obj_id;
+    IF obj_geom IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO zoning_citymembership (content_type_id, object_id, city_id, position)
+        SELECT ct, obj_id, z.code, zoning_position(obj_geom, z.geom)
+        FROM zoning_city z WHERE ST_Intersects(z.geom, obj_geom);
+    INSERT INTO zoning_districtmembership (content_type_id, object_id, district_id, position)
+        SELECT ct, obj_id, z.id, zoning_position(obj_geom, z.geom)
+        FROM zoning_district z WHERE ST_Intersects(z.geom, obj_geom);
+    INSERT INTO zoning_restrictedareamembership (content_type_id, object_id, area_id, position)
+        SELECT ct, obj_id, z.id, zoning_position(obj_geom, z.geom)
+        FROM zoning_restrictedarea z WHERE ST_Intersects(z.geom, obj_geom);
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_update_layer_memberships(membership_table text, layer_column text, layer_id text, layer_geom geometry) RETURNS void AS $$
+DECLARE
+    source record;
+BEGIN
+    EXECUTE format('DELETE FROM %I WHERE %I = %L', membership_table, layer_column, layer_id);
+    IF layer_geom IS NULL THEN
+        RETURN;
+    END IF;
+    FOR source IN SELECT s.object_table, ct.id AS content_type_id
+                  FROM zoning_membership_sources() s
+                  JOIN django_content_type ct ON ct.app_label = s.app_label AND ct.model = s.model LOOP
+        EXECUTE format('INSERT INTO %I (content_type_id, object_id, %I, position)
+                        SELECT %s, o.id, %L, zoning_position(o.geom, $1)
+                        FROM %I o WHERE ST_Intersects(o.geom, $1)',
+                       membership_table, layer_column, source.content_type_id, layer_id, source.object_table)
+        USING layer_geom;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_object_memberships_iu() RETURNS trigger SECURITY DEFINER AS $$
+-- TG_ARGV: app label and model of object table
+BEGIN
+    PERFORM zoning_update_object_memberships(
+        (SELECT id FROM django_content_type WHERE app_label = TG_ARGV[0] AND model = TG_ARGV[1]),
+        NEW.id, NEW.geom);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_object_memberships_d() RETURNS trigger SECURITY DEFINER AS $$
+-- TG_ARGV: app label and model of object table
+BEGIN
+    PERFORM zoning_update_object_memberships(
+        (SELECT id FROM django_content_type WHERE app_label = TG_ARGV[0] AND model = TG_ARGV[1]),
+        OLD.id, NULL);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE FUNCTION {{ schema_geotrek }}.zoning_layer_memberships_iu() RETURNS trigger SECURITY DEFINER AS $$
+-- TG_ARGV: membership table, its column referencing layer, and layer primary key column
+BEGIN
+    PERFORM zoning_update_layer_memberships(TG_ARGV[0], TG_ARGV[1], to_jsonb(NEW) ->> TG_ARGV[2], NEW.geom);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Objects side (geometry may also be changed by other triggers)
+
+DO $$
+DECLARE
+    source record;
+BEGIN
+    FOR source IN SELECT * FROM zoning_membership_sources() LOOP
+        EXECUTE format('CREATE TRIGGER zoning_memberships_i_tgr
+                        AFTER INSERT ON %I
+                        FOR EACH ROW EXECUTE PROCEDURE zoning_object_memberships_iu(%L, %L)',
+                       source.object_table, source.app_label, source.model);
+        EXECUTE format('CREATE TRIGGER zoning_memberships_u_tgr
+                        AFTER UPDATE ON %I
+                        FOR EACH ROW WHEN (OLD.geom IS DISTINCT FROM NEW.geom)
+                        EXECUTE PROCEDURE zoning_object_memberships_iu(%L, %L)',
+                       source.object_table, source.app_label, source.model);
+        EXECUTE format('CREATE TRIGGER zoning_memberships_d_tgr
+                        AFTER DELETE ON %I
+                        FOR EACH ROW EXECUTE PROCEDURE zoning_object_memberships_d(%L, %L)',
+                       source.object_table, source.app_label, source.model);
+    END LOOP;
+END;
+$$;
+
+
+-- Zoning layers side
+
+CREATE TRIGGER zoning_city_memberships_i_tgr
+AFTER INSERT ON zoning_city
+FOR EACH ROW EXECUTE PROCEDURE zoning_layer_memberships_iu('zoning_citymembership', 'city_id', 'code');
+
+CREATE TRIGGER zoning_city_memberships_u_tgr
+AFTER UPDATE ON zoning_city
+FOR EACH ROW WHEN (OLD.geom IS DISTINCT FROM NEW.geom)
+EXECUTE PROCEDURE zoning_layer_memberships_iu('zoning_citymembership', 'city_id', 'code');
+
+CREATE TRIGGER zoning_district_memberships_i_tgr
+AFTER INSERT ON zoning_district
+FOR EACH ROW EXECUTE PROCEDURE zoning_layer_memberships_iu('zoning_districtmembership', 'district_id', 'id');
+
+CREATE TRIGGER zoning_district_memberships_u_tgr
+AFTER UPDATE ON zoning_district
+FOR EACH ROW WHEN (OLD.geom IS DISTINCT FROM NEW.geom)
+EXECUTE PROCEDURE zoning_layer_memberships_iu('zoning_districtmembership', 'district_id', 'id');
+
+CREATE TRIGGER zoning_restrictedarea_memberships_i_tgr
+AFTER INSERT ON zoning_restrictedarea
+FOR EACH ROW EXECUTE PROCEDURE zoning_layer_memberships_iu('zoning_restrictedareamembership', 'area_id', 'id');
+
+CREATE TRIGGER zoning_restrictedarea_memberships_u_tgr
+AFTER UPDATE ON zoning_restrictedarea
+FOR EACH ROW WHEN (OLD.geom IS DISTINCT FROM NEW.geom)
+EXECUTE PROCEDURE zoning_layer_memberships_iu('zoning_restrictedareamembership', 'area_id', 'id');
+
+
+-- Fill memberships on first install
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM zoning_citymembership)
+       AND NOT EXISTS (SELECT 1 FROM zoning_districtmembership)
+       AND NOT EXISTS (SELECT 1 FROM zoning_restrictedareamembership) THEN
+        PERFORM zoning_update_layer_memberships('zoning_citymembership', 'city_id', code, geom) FROM zoning_city;
+        PERFORM zoning_update_layer_memberships('zoning_districtmembership', 'district_id', id::text, geom) FROM zoning_district;
+        PERFORM zoning_update_layer_memberships('zoning_restrictedareamembership', 'area_id', id::text, geom) FROM zoning_restrictedarea;
+    END IF;
+END;
+$$;
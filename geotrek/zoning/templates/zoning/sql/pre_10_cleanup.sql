@@ -19,3 +19,13 @@ DROP VIEW IF EXISTS f_v_secteur CASCADE;
 DROP VIEW IF EXISTS v_districts CASCADE;
 DROP VIEW IF EXISTS f_v_zonage CASCADE;
 DROP VIEW IF EXISTS v_restrictedareas CASCADE;
+
+-- 30
+
+DROP FUNCTION IF EXISTS zoning_position(geometry, geometry) CASCADE;
+DROP FUNCTION IF EXISTS zoning_membership_sources() CASCADE;
+DROP FUNCTION IF EXISTS zoning_update_object_memberships(integer, integer, geometry) CASCADE;
+DROP FUNCTION IF EXISTS zoning_update_layer_memberships(text, text, text, geometry) CASCADE;
+DROP FUNCTION IF EXISTS zoning_object_memberships_iu() CASCADE;
+DROP FUNCTION IF EXISTS zoning_object_memberships_d() CASCADE;
+DROP FUNCTION IF EXISTS zoning_layer_memberships_iu() CASCADE;
@@ -3,10 +3,14 @@ from django.test import TestCase
 from django.conf import settings
 from django.contrib.gis.geos import LineString, Polygon, Point, MultiPolygon
 
+from geotrek.core.models import Path
 from geotrek.core.tests.factories import PathFactory
 from geotrek.signage.tests.factories import SignageFactory
-from geotrek.zoning.models import City
+from geotrek.tourism.models import TouristicContent
+from geotrek.tourism.tests.factories import TouristicContentFactory
+from geotrek.zoning.models import City, CityMembership
 from geotrek.zoning.tests.factories import CityFactory, DistrictFactory, RestrictedAreaFactory, RestrictedAreaTypeFactory
+from geotrek.zoning.utils import filter_intersecting
 
 
 class PathUpdateTest(TestCase):
@@ -301,3 +305,49 @@ class ZoningModelsTest(TestCase):
                                                        geom=MultiPolygon(Polygon(((201, 0), (300, 0), (300, 100), (200, 100), (201, 0)),
                                                                                  srid=settings.SRID)))
         self.assertEqual(str(restricted_area), "Test - Tel")
+
+
+class ZoningMembershipTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.city = City.objects.create(code='005177', name='Trifouillis-les-oies',
+                                       geom=MultiPolygon(Polygon(((0, 0), (2, 0), (2, 2), (0, 2), (0, 0)),
+                                                                 srid=settings.SRID)))
+
+    def test_memberships_follow_object_geometry(self):
+        path = PathFactory.create(geom=LineString((1, 1), (1, 3), srid=settings.SRID))
+        memberships = CityMembership.for_model(Path).filter(object_id=path.pk)
+        self.assertQuerySetEqual(memberships.values_list('city', flat=True), [self.city.pk])
+        path.geom = LineString((3, 3), (3, 4), srid=settings.SRID)
+        path.save()
+        self.assertFalse(memberships.exists())
+
+    def test_memberships_follow_zoning_geometry(self):
+        content = TouristicContentFactory.create(geom=Point(3, 3, srid=settings.SRID))
+        memberships = CityMembership.for_model(TouristicContent).filter(object_id=content.pk)
+        self.assertFalse(memberships.exists())
+        self.city.geom = MultiPolygon(Polygon(((0, 0), (4, 0), (4, 4), (0, 4), (0, 0)), srid=settings.SRID))
+        self.city.save()
+        self.assertTrue(memberships.exists())
+
+    def test_memberships_kept_on_zoning_save_without_geometry_change(self):
+        content = TouristicContentFactory.create(geom=Point(1, 1, srid=settings.SRID))
+        memberships = CityMembership.for_model(TouristicContent).filter(object_id=content.pk)
+        memberships.delete()
+        self.city.name = 'Trifouillis'
+        self.city.save()
+        # memberships are not computed again
+        self.assertFalse(memberships.exists())
+
+    def test_memberships_deleted_with_object(self):
+        path = PathFactory.create(geom=LineString((1, 1), (1, 3), srid=settings.SRID))
+        pk = path.pk
+        path.delete()
+        self.assertFalse(CityMembership.for_model(Path).filter(object_id=pk).exists())
+
+    def test_filter_joins_memberships(self):
+        path = PathFactory.create(geom=LineString((1, 1), (1, 3), srid=settings.SRID))
+        PathFactory.create(geom=LineString((3, 3), (3, 4), srid=settings.SRID))
+        qs = filter_intersecting(Path.objects.all(), City, pk__in=[self.city.pk])
+        self.assertNotIn('ST_Intersects', str(qs.query))
+        self.assertQuerySetEqual(qs, [path])
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.test import TestCase
+
+from geotrek.core.tests.factories import PathFactory
+from geotrek.trekking.tests.factories import TrekFactory
+from geotrek.zoning.tests.factories import CityFactory, DistrictFactory
+from geotrek.zoning.utils import ZoningResolver
+
+
+class ZoningResolverTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        geom_1_wkt = 'SRID=2154;MULTIPOLYGON(((200000 300000, 900000 300000, 900000 1200000, 200000 1200000, ' \
+                     '200000 300000)))'
+        geom_2_wkt = 'SRID=2154;MULTIPOLYGON(((900000 300000, 1100000 300000, 1100000 1200000, 900000 1200000, ' \
+                     '900000 300000)))'
+        cls.city_1 = CityFactory.create(name="B", geom=geom_1_wkt)
+        cls.city_2 = CityFactory.create(name="A", geom=geom_2_wkt, published=False)
+        cls.district_1 = DistrictFactory.create(geom=geom_1_wkt)
+        cls.district_2 = DistrictFactory.create(geom=geom_2_wkt)
+        cls.treks = []
+        for wkt in ('SRID=2154;LINESTRING(200000 300000, 1100000 1200000)',
+                    'SRID=2154;LINESTRING(1000000 1150000, 300000 1150000)'):
+            if settings.TREKKING_TOPOLOGY_ENABLED:
+                cls.treks.append(TrekFactory.create(paths=[PathFactory.create(geom=wkt)]))
+            else:
+                cls.treks.append(TrekFactory.create(geom=wkt))
+
+    def test_cities_ordered_as_zoning_properties(self):
+        expected = [trek.published_cities for trek in self.treks]
+        resolver = ZoningResolver(self.treks)
+        with self.assertNumQueries(1):
+            self.assertListEqual([resolver.published_cities(trek) for trek in self.treks], expected)
+        self.assertListEqual(expected[0], [self.city_1])
+
+    def test_districts_ordered_as_zoning_properties(self):
+        expected = [trek.published_districts for trek in self.treks]
+        resolver = ZoningResolver(self.treks)
+        with self.assertNumQueries(1):
+            self.assertListEqual([resolver.published_districts(trek) for trek in self.treks], expected)
+        self.assertListEqual(expected[0], [self.district_1, self.district_2])
+        self.assertListEqual(expected[1], [self.district_2, self.district_1])
+
+    def test_unpublished_zonings_for_unpublishable_objects(self):
+        path = PathFactory.create(geom='SRID=2154;LINESTRING(1000000 400000, 1000000 500000)')
+        resolver = ZoningResolver([path])
+        self.assertListEqual(resolver.published_cities(path), [self.city_2])
+
+    def test_departure_city(self):
+        resolver = ZoningResolver(self.treks)
+
+        def get_departure(trek):
+            return Point(trek.geom[0], srid=settings.SRID)
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(resolver.departure_city(self.treks[0], get_departure))
+            self.assertEqual(resolver.departure_city(self.treks[1], get_departure), self.city_2)
+
+    def test_object_not_resolved(self):
+        resolver = ZoningResolver(self.treks[:1])
+        self.assertListEqual(resolver.published_districts(self.treks[1]), self.treks[1].published_districts)
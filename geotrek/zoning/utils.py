@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, F, OuterRef
+
+from .models import City, District, ZoningMembership
+
+INTERSECTING_SQL = """
+    SELECT {columns}, objects.id AS zoning_object_id
+    FROM (VALUES {values}) AS objects (id, geom)
+    JOIN {table} AS zoning ON ST_Intersects(objects.geom, zoning.geom)
+    JOIN LATERAL (
+        SELECT min(ST_LineLocatePoint(objects.geom, ST_StartPoint(part.geom))) AS position
+        FROM ST_Dump(ST_Intersection(objects.geom, zoning.geom)) AS part
+        WHERE GeometryType(objects.geom) = 'LINESTRING'
+    ) AS positions ON true
+    ORDER BY objects.id, positions.position, {ordering}
+"""
+
+CONTAINING_SQL = """
+    SELECT DISTINCT ON (objects.id) {columns}, objects.id AS zoning_object_id
+    FROM (VALUES {values}) AS objects (id, geom)
+    JOIN {table} AS zoning ON ST_Contains(zoning.geom, objects.geom)
+    ORDER BY objects.id, {ordering}
+"""
+
+
+def get_zonings_by_memberships(layer_model, model, pks, select_related=()):
+    """
+    return objects of zoning layer linked to each object of model given by pks, through memberships
+    maintained by triggers, ordered along linear geometries, then as layer
+    """
+    field = layer_model.memberships.field.name
+    memberships = layer_model.memberships.rel.related_model.for_model(model) \
+        .filter(object_id__in=pks) \
+        .select_related(field, *(f'{field}__{name}' for name in select_related)) \
+        .defer(f'{field}__geom') \
+        .order_by(F('position').asc(nulls_last=True), *(f'{field}__{name}' for name in layer_model._meta.ordering))
+    results = {pk: [] for pk in pks}
+    for membership in memberships:
+        results[membership.object_id].append(getattr(membership, field))
+    return results
+
+
+def filter_intersecting(queryset, layer_model, **lookups):
+    """
+    Filter queryset on objects intersecting zonings of layer_model matching lookups,
+    joining memberships maintained by triggers if available, else with spatial predicate
+    """
+    if ZoningMembership.get_geometry_model(queryset.model) is None:
+        return queryset.filter(Exists(layer_model.objects.filter(geom__intersects=OuterRef('geom'), **lookups)))
+    field = layer_model.memberships.field.name
+    memberships = layer_model.memberships.rel.related_model.for_model(queryset.model).filter(
+        object_id=OuterRef('pk'),
+        **{f'{field}__{lookup}': value for lookup, value in lookups.items()}
+    )
+    return queryset.filter(Exists(memberships))
+
+
+class ZoningResolver:
+    """
+    Resolve cities and districts of a list of objects (a page of API results) with one query per layer,
+    joining zoning memberships if they are maintained for these objects, else with spatial predicates.
+    Zonings are ordered as ZoningPropertiesMixin ones: along linear geometries, else by name.
+    Each layer is resolved on first lookup only.
+    """
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.resolved = {}
+
+    def _get_sql(self, template, model, geoms):
+        quote = connection.ops.quote_name
+        columns = ', '.join(f'zoning.{quote(field.column)}' for field in model._meta.concrete_fields
+                            if field.name != 'geom')
+        ordering = ', '.join(f'zoning.{quote(model._meta.get_field(name).column)}' for name in model._meta.ordering)
+        values = ', '.join(['(%s, ST_GeomFromWKB(%s, %s))'] * len(geoms))
+        params = []
+        for pk, geom in geoms.items():
+            params += [pk, bytes(geom.wkb), settings.SRID]
+        return template.format(columns=columns, values=values, table=quote(model._meta.db_table),
+                               ordering=ordering), params
+
+    def _resolve_by_sql(self, template, model, get_geom):
+        geoms = {}
+        for obj in self.objects:
+            geom = get_geom(obj)
+            if geom:
+                geoms[obj.pk] = geom
+        results = {pk: [] for pk in geoms}
+        if geoms:
+            for zoning in model.objects.raw(*self._get_sql(template, model, geoms)):
+                results[zoning.zoning_object_id].append(zoning)
+        return results
+
+    def _resolve_by_memberships(self, model):
+        """ use links maintained by triggers if available for every object, else return None """
+        zoning_objects = {obj.pk: obj.zoning_property for obj in self.objects}
+        if not zoning_objects or len({type(o) for o in zoning_objects.values()}) > 1 \
+                or not all(obj.has_zoning_memberships for obj in self.objects):
+            return None
+        zoning_model = type(next(iter(zoning_objects.values())))
+        results = get_zonings_by_memberships(model, zoning_model, [o.pk for o in zoning_objects.values()])
+        return {pk: results[o.pk] for pk, o in zoning_objects.items()}
+
+    def _intersecting(self, model, obj):
+        """ return zonings intersecting obj, or None if obj is not part of resolved objects """
+        if model not in self.resolved:
+            results = self._resolve_by_memberships(model)
+            if results is None:
+                results = self._resolve_by_sql(INTERSECTING_SQL, model, lambda o: o.zoning_property.geom)
+            self.resolved[model] = results
+        results = self.resolved[model]
+        if obj.pk in results:
+            return results[obj.pk]
+        return [] if not obj.zoning_property.geom else None
+
+    def _published(self, zonings, obj):
+        if not hasattr(obj, 'published'):
+            return zonings
+        return [zoning for zoning in zonings if zoning.published]
+
+    def published_cities(self, obj):
+        cities = self._intersecting(City, obj)
+        if cities is None:
+            return obj.published_cities
+        return self._published(cities, obj)
+
+    def published_districts(self, obj):
+        districts = self._intersecting(District, obj)
+        if districts is None:
+            return obj.published_districts
+        return self._published(districts, obj)
+
+    def departure_city(self, obj, get_geom):
+        """ return first city (by name) containing departure geometry given by get_geom(obj) """
+        if 'departure_city' not in self.resolved:
+            self.resolved['departure_city'] = self._resolve_by_sql(CONTAINING_SQL, City, get_geom)
+        results = self.resolved['departure_city']
+        if obj.pk in results:
+            cities = results[obj.pk]
+            return cities[0] if cities else None
+        geom = get_geom(obj)
+        return City.objects.filter(geom__contains=geom).first() if geom else None